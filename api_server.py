@@ -1,25 +1,154 @@
-from flask import Flask, request, jsonify, abort, Response
+from flask import Flask, request, jsonify, abort, Response, g, has_app_context, has_request_context, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timezone
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event, select, delete, update, insert, text
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeout
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone, timedelta
 from flask_cors import CORS
 from flask import send_from_directory
 import zipfile
 from flask import send_file
-from werkzeug.utils import secure_filename
 import os
 import shutil
 import hashlib
+import bisect
+import heapq
+import itertools
+import unicodedata
+import secrets
+import gzip
+import json
 import queue
 import time
 import threading
+import zlib
+import ctypes
+import errno
+import io
+import operator
+import sqlite3
+import click
+import atexit
+import math
+import struct
+import re
+import gc
+import tracemalloc
+from collections import deque, OrderedDict
+
+try:
+    import orjson  # 可选依赖：更快的 JSON 序列化
+except ImportError:
+    orjson = None
+try:
+    import brotli  # 可选依赖：brotli 压缩
+except ImportError:
+    brotli = None
+try:
+    import zstandard  # 可选依赖：zstd 压缩
+except ImportError:
+    zstandard = None
+try:
+    import fcntl  # 分片上传的文件锁，Windows 上没有（单进程部署不需要）
+except ImportError:
+    fcntl = None
+
+# === JSON 序列化 ===
+class FastJSONProvider(DefaultJSONProvider):
+    """安装了 orjson 时使用 orjson 序列化，否则回退到标准库 json。
+    输出与标准库一致：UTF-8 不转义中文、键排序、datetime 交给 Flask 默认处理。
+    """
+    ensure_ascii = False
+
+    def _orjson_dumps(self, obj):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._orjson_dumps(obj).decode('utf-8')
+        except TypeError:
+            # orjson 不支持的值（如超出 64 位的整数）交给标准库
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # 调试模式下保留缩进输出
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._orjson_dumps(obj)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+# === 读写分离 ===
+# 所有写操作经过唯一的写连接（SQLite 写本身串行，多个写连接只会互相等锁）；
+# 标记为只读的 GET 接口使用独立的只读连接池，WAL 模式下读不阻塞写。
+READER_POOL_SIZE = 8
+WRITER_POOL_TIMEOUT = 5  # 秒：等待写连接超过该时间返回 503，而不是让请求线程长时间排队
+
+class RoutingSession(FlaskSession):
+    """请求（或后台任务的应用上下文）标记了 use_reader 时查询走只读连接池，flush 始终走写连接"""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('use_reader'):
+            return self._db.engines['reader']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def use_reader(func):
+    """装饰器：该请求的查询使用只读连接"""
+    from functools import wraps
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        g.use_reader = True
+        return func(*args, **kwargs)
+    return wrapper
+
+def set_sqlite_pragmas(dbapi_conn, read_only):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
 
 # === Flask 初始化 ===
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app, supports_credentials=True)
 DB_PATH = 'database.db'
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 1, 'max_overflow': 0, 'pool_timeout': WRITER_POOL_TIMEOUT}
+app.config['SQLALCHEMY_BINDS'] = {
+    'reader': {'url': f'sqlite:///{DB_PATH}', 'pool_size': READER_POOL_SIZE, 'max_overflow': READER_POOL_SIZE}
+}
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+with app.app_context():
+    event.listen(db.engines[None], 'connect', lambda conn, record: set_sqlite_pragmas(conn, False))
+    event.listen(db.engines['reader'], 'connect', lambda conn, record: set_sqlite_pragmas(conn, True))
+
+@app.errorhandler(PoolTimeout)
+def database_busy(e):
+    """等待写连接超时：返回 503，客户端稍后重试"""
+    response = jsonify({"status": "Fail", "reason": "Database busy"})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 def get_utc_now():
     """获取当前 UTC 时间"""
     return datetime.now(timezone.utc)
@@ -28,6 +157,12 @@ def get_utc_now():
 # === 模型定义 ===
 class Submission(db.Model):
     __tablename__ = 'submissions'
+    __table_args__ = (
+        db.Index('ix_submissions_status_id', 'status', 'id'),
+        db.Index('ix_submissions_fingerprint', 'fingerprint', 'created_at'),
+        # AUTOINCREMENT（仅新建的库）：id 不复用；旧库由归档任务保留高水位行，见 archive_posts
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True) 
     content = db.Column(db.Text, nullable=False)
     status = db.Column(db.Enum('Pass', 'Pending', 'Deny'), default='Pending')
@@ -35,29 +170,43 @@ class Submission(db.Model):
     updated_at = db.Column(db.DateTime, default=get_utc_now, onupdate=get_utc_now)
     upvotes = db.Column(db.Integer, default=0)
     downvotes = db.Column(db.Integer, default=0)
+    fingerprint = db.Column(db.String(32), nullable=True)  # 归一化内容哈希，用于重复检测
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 冗余的评论数，随评论增删维护
 
-    comments = db.relationship('Comment', backref='submission', lazy=True, cascade='all, delete-orphan')
+    # passive_deletes：删除投稿时不加载评论，由 delete_submission_tree 集合式删除
+    comments = db.relationship('Comment', backref='submission', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_submission_id', 'submission_id'),
+        db.Index('ix_comments_parent_comment_id', 'parent_comment_id'),
+        db.Index('ix_comments_fingerprint', 'fingerprint', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id'), nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'), nullable=False)
     nickname = db.Column(db.String(50), default='匿名用户')
     content = db.Column(db.Text, nullable=False)
     parent_comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), default=0)
     created_at = db.Column(db.DateTime, default=get_utc_now)
+    fingerprint = db.Column(db.String(32), nullable=True)  # 归一化内容哈希，用于重复检测
 
     replies = db.relationship(
         'Comment',
         backref=db.backref('parent', remote_side=[id]),
         lazy=True,
-        cascade='all, delete-orphan'
+        cascade='all, delete-orphan',
+        passive_deletes=True
     )
 
 
 class Report(db.Model):
     __tablename__ = 'reports'
+    __table_args__ = (
+        db.Index('ix_reports_status', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     submission_id = db.Column(db.Integer, nullable=True)
     title = db.Column(db.String(200), nullable=False)
@@ -82,6 +231,61 @@ class Notice(db.Model):
     updated_at = db.Column(db.DateTime, default=get_utc_now, onupdate=get_utc_now)
 
 
+class ArchivedSubmission(db.Model):
+    """归档的旧投稿，结构与 submissions 相同，只读"""
+    __tablename__ = 'submissions_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum('Pass', 'Pending', 'Deny'), default='Pending')
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    upvotes = db.Column(db.Integer, default=0)
+    downvotes = db.Column(db.Integer, default=0)
+    fingerprint = db.Column(db.String(32), nullable=True)
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class ArchivedComment(db.Model):
+    """归档投稿下的评论"""
+    __tablename__ = 'comments_archive'
+    __table_args__ = (
+        db.Index('ix_comments_archive_submission_id', 'submission_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    submission_id = db.Column(db.Integer, nullable=False)
+    nickname = db.Column(db.String(50), default='匿名用户')
+    content = db.Column(db.Text, nullable=False)
+    parent_comment_id = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime)
+    fingerprint = db.Column(db.String(32), nullable=True)
+
+
+class ImageRef(db.Model):
+    """投稿、评论内容中 /img/ 链接引用的图片；comment_id 为 0 表示投稿正文"""
+    __tablename__ = 'image_refs'
+    __table_args__ = (
+        db.Index('ix_image_refs_owner', 'submission_id', 'comment_id'),
+    )
+    filename = db.Column(db.String(100), primary_key=True)
+    submission_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    comment_id = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)
+
+
+class ChangeStamp(db.Model):
+    """数据变更版本戳，用于生成 ETag（feed、post:<id>、notice 等）"""
+    __tablename__ = 'change_stamps'
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+
+class SchemaMigration(db.Model):
+    """已应用的数据库迁移版本"""
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=get_utc_now)
+
+
 
 # === 工具函数 ===
 def get_config(key, default=None):
@@ -122,6 +326,170 @@ def get_current_notice():
     return {"type": n.type, "content": n.content, "version": int(n.version)}
 
 
+IMAGE_URL_PATTERN = re.compile(r'/img/([A-Za-z0-9_\-]+\.[A-Za-z0-9]+)')
+
+def image_ref_rows(submission_id, comment_id, content):
+    """内容中引用的图片，返回 image_refs 的行"""
+    if '/img/' not in content:
+        return []
+    return [
+        {"filename": name, "submission_id": submission_id, "comment_id": comment_id}
+        for name in set(IMAGE_URL_PATTERN.findall(content))
+    ]
+
+def sync_image_refs(submission_id, comment_id, content):
+    """按内容重写一条投稿或评论的图片引用；由调用方 commit"""
+    db.session.execute(delete(ImageRef).where(
+        ImageRef.submission_id == submission_id, ImageRef.comment_id == comment_id
+    ))
+    rows = image_ref_rows(submission_id, comment_id, content)
+    if rows:
+        db.session.execute(insert(ImageRef), rows)
+
+def delete_submission_tree(submission_id):
+    """集合式删除投稿及其全部评论，不把评论加载进内存；由调用方在同一事务中 commit"""
+    db.session.execute(delete(ImageRef).where(ImageRef.submission_id == submission_id))
+    live = db.session.scalar(select(Submission.id).where(Submission.id == submission_id)) is not None
+    if live:
+        db.session.execute(
+            delete(Comment).where(Comment.submission_id == submission_id),
+            execution_options={"synchronize_session": False}
+        )
+        db.session.execute(
+            delete(Submission).where(Submission.id == submission_id),
+            execution_options={"synchronize_session": False}
+        )
+    else:
+        # 只有热表中不存在时才删除同 id 的归档投稿
+        db.session.execute(delete(ArchivedComment).where(ArchivedComment.submission_id == submission_id))
+        db.session.execute(delete(ArchivedSubmission).where(ArchivedSubmission.id == submission_id))
+    bump_stamps(f"post:{submission_id}", "feed", "archive")
+
+
+def delete_comment_tree(comment_id):
+    """集合式删除评论及其全部子孙回复，返回被删除的评论 id 列表；由调用方 commit"""
+    # UNION 去重，即使回复关系被改成环也能终止
+    tree = select(Comment.id).where(Comment.id == comment_id).cte(name='comment_tree', recursive=True)
+    tree = tree.union(select(Comment.id).where(Comment.parent_comment_id == tree.c.id))
+    ids = db.session.scalars(select(tree.c.id)).all()
+    db.session.execute(delete(ImageRef).where(
+        ImageRef.submission_id == select(Comment.submission_id).where(Comment.id == comment_id).scalar_subquery(),
+        ImageRef.comment_id.in_(select(tree.c.id))
+    ))
+    db.session.execute(
+        delete(Comment).where(Comment.id.in_(select(tree.c.id))),
+        execution_options={"synchronize_session": False}
+    )
+    return ids
+
+
+# 公告及显示开关的进程内缓存，以 notice 版本戳对应的 ETag 作为版本
+notice_cache = {"etag": None, "data": None}
+notice_cache_lock = threading.Lock()
+
+def get_cached_notice(etag):
+    """版本未变时直接返回缓存的公告，否则从数据库重新加载"""
+    with notice_cache_lock:
+        if notice_cache["etag"] == etag:
+            return notice_cache["data"]
+    notice_data = get_current_notice()
+    # 获取显示状态，默认为开启
+    notice_data["display"] = get_config("show_notice", "true")
+    with notice_cache_lock:
+        notice_cache["etag"] = etag
+        notice_cache["data"] = notice_data
+    return notice_data
+
+
+# === 变更版本戳与 ETag ===
+STAMP_TTL = 1.0  # 秒：进程内缓存有效期，即其他进程的写入最长多久后可见
+STAMP_CACHE_SIZE = 4096
+stamp_cache = OrderedDict()  # key -> (value, 读取时间)
+stamp_lock = threading.Lock()
+
+def bump_stamps(*keys):
+    """在当前事务中递增版本戳，随写操作一起提交；提交后清除进程内缓存"""
+    for key in keys:
+        db.session.execute(
+            text("INSERT INTO change_stamps (key, value) VALUES (:key, 1) "
+                 "ON CONFLICT(key) DO UPDATE SET value = value + 1"),
+            {"key": key}
+        )
+    db.session.info.setdefault('bumped_stamps', set()).update(keys)
+
+@event.listens_for(Session, "after_commit")
+def invalidate_bumped_stamps(session):
+    keys = session.info.pop('bumped_stamps', None)
+    if keys:
+        with stamp_lock:
+            for key in keys:
+                stamp_cache.pop(key, None)
+
+@event.listens_for(Session, "after_rollback")
+def discard_bumped_stamps(session):
+    session.info.pop('bumped_stamps', None)
+
+def get_stamps(*keys):
+    """读取版本戳，优先使用进程内缓存；未命中时一次查询取回，不经过 ORM 会话"""
+    now = time.monotonic()
+    values = {}
+    missing = []
+    with stamp_lock:
+        for key in keys:
+            entry = stamp_cache.get(key)
+            if entry is not None and now - entry[1] < STAMP_TTL:
+                values[key] = entry[0]
+            else:
+                missing.append(key)
+    if missing:
+        # 使用只读连接：请求可能正占用唯一的写连接
+        with db.engines['reader'].connect() as conn:
+            rows = conn.execute(select(ChangeStamp.key, ChangeStamp.value).where(ChangeStamp.key.in_(missing)))
+            fetched = dict(rows.all())
+        with stamp_lock:
+            for key in missing:
+                values[key] = fetched.get(key, 0)
+                stamp_cache[key] = (values[key], now)
+                stamp_cache.move_to_end(key)
+            while len(stamp_cache) > STAMP_CACHE_SIZE:
+                stamp_cache.popitem(last=False)
+    return [values[key] for key in keys]
+
+def reset_stamp_epoch():
+    """更换数据库纪元（如恢复备份后），使之前发出的 ETag 全部失效"""
+    epoch = db.session.get(ChangeStamp, 'epoch')
+    if epoch is None:
+        db.session.add(ChangeStamp(key='epoch', value=secrets.randbelow(2 ** 31)))
+    else:
+        epoch.value = secrets.randbelow(2 ** 31)
+    db.session.info.setdefault('bumped_stamps', set()).add('epoch')
+    db.session.commit()
+
+def stamp_etag(key):
+    """由版本戳生成强 ETag。应在读取数据之前调用，数据只可能比 ETag 新，不会误判未修改"""
+    value, epoch = get_stamps(key, 'epoch')
+    return f"{key}-{value}-{epoch}"
+
+def not_modified(etag):
+    """If-None-Match 命中时返回 304 响应，否则返回 None"""
+    # 压缩后的响应 ETag 带有编码后缀（见 compress_response），也视为命中；
+    # 304 返回命中的那个 ETag，与客户端缓存的表示（压缩或未压缩）保持一致
+    candidates = [etag] + [f"{etag}-{encoding}" for encoding in supported_encodings()]
+    matched = next((tag for tag in candidates if request.if_none_match.contains(tag)), None)
+    if matched is None:
+        return None
+    response = Response(status=304)
+    response.set_etag(matched)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 # === 变量 ===
 DEFAULT_BANNED_KEYWORDS = [
     "default"
@@ -133,14 +501,28 @@ DEFAULT_UPLOAD_FOLDER = "img"
 DEFAULT_ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
 DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 DEFAULT_RATE_LIMIT = 10  # 次/分钟，0为无限制
+# 独立限流桶的每分钟额度（default 桶即 RATE_LIMIT）；upload 桶按上传字节计。
+# 0 为不单独限流：该桶的路由与其他路由一样按次计入 default 桶，未设置时行为与 RATE_LIMIT 一致
+DEFAULT_RATE_LIMIT_BUCKETS = {"report": 0, "upload": 0}
+# 各路由单次请求的消耗权重，未列出的为 1；上传的消耗为 权重 x 请求字节数
+DEFAULT_RATE_LIMIT_COSTS = {"/post": 1, "/comment": 1, "/up": 1, "/down": 1, "/report": 1, "/upload_pic": 1, "/upload_pic/init": 1}
+DEFAULT_ADMISSION_THREADS = 0  # WSGI 服务器的工作线程数（准入控制按此预留管理端线程），0 为不按线程数限制
 
 CONFIG = {}
-INIT = False
+CONFIG_SIGNATURE = None  # 已加载的 config.json (mtime, size)
+INIT = False  # 配置已加载
+READY = False  # 配置已加载且数据库已初始化
+RESTORING = False  # 正在从备份恢复（READY 同时为 False），请求返回 503
 NEED_AUDIT = False
 
 # === SSE 相关变量 ===
 sse_clients = []  # 存储所有 SSE 客户端的队列列表
-sse_lock = threading.Lock()  # 保护 sse_clients 的线程锁
+sse_topics = {}  # 主题（如 post_state:1）-> 订阅该主题的客户端队列集合
+sse_lock = threading.Lock()  # 保护 sse_clients 与 sse_topics 的线程锁
+SSE_MAX_TOPIC_IDS = 50  # 单个连接最多订阅的 id 数
+
+# 与 /get/post_state、/get/report_state 一致的状态名
+STATE_NAMES = {"Pass": "Approved", "Deny": "Rejected", "Pending": "Pending", None: "Deleted or Not Found"}
 
 def notify_new_post():
     """通知所有 SSE 客户端有新的审核通过的投稿"""
@@ -151,6 +533,44 @@ def notify_new_post():
             except Exception:
                 pass
 
+def publish(topic, payload):
+    """向订阅了该主题的 SSE 客户端推送 JSON 消息，开销只与该主题的订阅者数量有关"""
+    with sse_lock:
+        subscribers = sse_topics.get(topic)
+        if not subscribers:
+            return
+        message = app.json.dumps(payload)
+        for client_queue in subscribers:
+            client_queue.put(message)
+
+def publish_post_state(submission_id, status):
+    """推送投稿状态变化，status 为 None 表示已删除"""
+    publish(f"post_state:{submission_id}", {"type": "post_state", "id": submission_id, "status": STATE_NAMES[status]})
+
+def publish_report_state(report_id, status):
+    publish(f"report_state:{report_id}", {"type": "report_state", "id": report_id, "status": STATE_NAMES[status]})
+
+def serialize_comment(comment):
+    return {
+        "id": comment.id,
+        "nickname": comment.nickname,
+        "content": comment.content,
+        "parent_comment_id": comment.parent_comment_id
+    }
+
+def publish_comment_event(submission_id, event_type, **fields):
+    """向正在查看该投稿的客户端推送评论增量（comment_added / comment_edited / comment_deleted）"""
+    publish(f"comments:{submission_id}", {"type": event_type, "post": submission_id, **fields})
+
+def parse_id_list(value):
+    """解析逗号分隔的 id 列表，忽略非法值"""
+    ids = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if part.isdigit():
+            ids.append(int(part))
+    return ids[:SSE_MAX_TOPIC_IDS]
+
 # 运行时使用的变量，初始为默认值
 ADMIN_TOKEN_HASH = DEFAULT_ADMIN_TOKEN_HASH
 UPLOAD_FOLDER = DEFAULT_UPLOAD_FOLDER
@@ -158,10 +578,15 @@ ALLOWED_EXTENSIONS = set(DEFAULT_ALLOWED_EXTENSIONS)
 MAX_FILE_SIZE = DEFAULT_MAX_FILE_SIZE
 BANNED_KEYWORDS = list(DEFAULT_BANNED_KEYWORDS)
 RATE_LIMIT = DEFAULT_RATE_LIMIT
+RATE_LIMIT_BUCKETS = dict(DEFAULT_RATE_LIMIT_BUCKETS)
+RATE_LIMIT_COSTS = dict(DEFAULT_RATE_LIMIT_COSTS)
+ADMISSION_THREADS = DEFAULT_ADMISSION_THREADS
 
 DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'database.db')
 IMG_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), UPLOAD_FOLDER)
 BACKUP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backups')
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+LEGACY_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.py')
 os.makedirs(BACKUP_FOLDER, exist_ok=True)
 
 ALLOWED_BACKUP_EXTENSIONS = {'zip'}
@@ -171,99 +596,305 @@ def allowed_backup_file(filename):
 
 def apply_config_to_globals():
     global ADMIN_TOKEN_HASH, UPLOAD_FOLDER, ALLOWED_EXTENSIONS, MAX_FILE_SIZE, IMG_FOLDER, BANNED_KEYWORDS, RATE_LIMIT
+    global RATE_LIMIT_BUCKETS, RATE_LIMIT_COSTS, ADMISSION_THREADS
     ADMIN_TOKEN_HASH = CONFIG.get('ADMIN_TOKEN_HASH', DEFAULT_ADMIN_TOKEN_HASH)
     UPLOAD_FOLDER = CONFIG.get('UPLOAD_FOLDER', DEFAULT_UPLOAD_FOLDER)
     ALLOWED_EXTENSIONS = set(CONFIG.get('ALLOWED_EXTENSIONS', DEFAULT_ALLOWED_EXTENSIONS))
     MAX_FILE_SIZE = int(CONFIG.get('MAX_FILE_SIZE', DEFAULT_MAX_FILE_SIZE))
     BANNED_KEYWORDS = list(CONFIG.get('BANNED_KEYWORDS', DEFAULT_BANNED_KEYWORDS))
     RATE_LIMIT = int(CONFIG.get('RATE_LIMIT', DEFAULT_RATE_LIMIT))
+    RATE_LIMIT_BUCKETS = dict(CONFIG.get('RATE_LIMIT_BUCKETS', DEFAULT_RATE_LIMIT_BUCKETS))
+    RATE_LIMIT_COSTS = dict(CONFIG.get('RATE_LIMIT_COSTS', DEFAULT_RATE_LIMIT_COSTS))
+    ADMISSION_THREADS = int(CONFIG.get('ADMISSION_THREADS', DEFAULT_ADMISSION_THREADS))
     IMG_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), UPLOAD_FOLDER)
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def load_config():
-    global CONFIG, INIT
+def normalize_rate_limit_map(value, defaults):
+    """合并限流桶额度 / 路由权重配置，值必须为非负整数"""
+    merged = dict(defaults)
+    for key, amount in (value or {}).items():
+        amount = int(amount)
+        if amount < 0:
+            raise ValueError(f"{key} must be >= 0")
+        merged[str(key)] = amount
+    return merged
+
+def normalize_config(data):
+    """将配置字典归一化为运行时格式（同时也是 config.json 的存储格式）"""
+    # 归一化扩展名为小写且唯一
+    exts = sorted(set(str(e).strip().lower() for e in data['ALLOWED_EXTENSIONS'] if str(e).strip()))
+    # 归一化敏感词为去空格的字符串列表
+    banned = data.get('BANNED_KEYWORDS')
+    if banned is None:
+        banned = DEFAULT_BANNED_KEYWORDS
+    banned = [str(w).strip() for w in banned if str(w).strip()]
+    return {
+        'ADMIN_TOKEN_HASH': str(data['ADMIN_TOKEN_HASH']),
+        'UPLOAD_FOLDER': str(data['UPLOAD_FOLDER']),
+        'ALLOWED_EXTENSIONS': exts,
+        'MAX_FILE_SIZE': int(data['MAX_FILE_SIZE']),
+        'BANNED_KEYWORDS': banned,
+        'RATE_LIMIT': int(data.get('RATE_LIMIT', DEFAULT_RATE_LIMIT)),
+        'RATE_LIMIT_BUCKETS': normalize_rate_limit_map(data.get('RATE_LIMIT_BUCKETS'), DEFAULT_RATE_LIMIT_BUCKETS),
+        'RATE_LIMIT_COSTS': normalize_rate_limit_map(data.get('RATE_LIMIT_COSTS'), DEFAULT_RATE_LIMIT_COSTS),
+        'ADMISSION_THREADS': max(int(data.get('ADMISSION_THREADS', DEFAULT_ADMISSION_THREADS)), 0),
+    }
+
+def read_legacy_config():
+    """读取旧版 /init 生成的 config.py，兼容只有明文 ADMIN_TOKEN 的情况"""
+    import runpy
+    cfg = runpy.run_path(LEGACY_CONFIG_PATH)
+    admin_token_hash = cfg.get('ADMIN_TOKEN_HASH')
+    if admin_token_hash is None and cfg.get('ADMIN_TOKEN') is not None:
+        admin_token_hash = hashlib.sha256(str(cfg['ADMIN_TOKEN']).encode('utf-8')).hexdigest()
+    return normalize_config({
+        'ADMIN_TOKEN_HASH': admin_token_hash,
+        'UPLOAD_FOLDER': cfg.get('UPLOAD_FOLDER', DEFAULT_UPLOAD_FOLDER),
+        'ALLOWED_EXTENSIONS': cfg.get('ALLOWED_EXTENSIONS', DEFAULT_ALLOWED_EXTENSIONS),
+        'MAX_FILE_SIZE': cfg.get('MAX_FILE_SIZE', DEFAULT_MAX_FILE_SIZE),
+        'BANNED_KEYWORDS': cfg.get('BANNED_KEYWORDS', DEFAULT_BANNED_KEYWORDS),
+        'RATE_LIMIT': cfg.get('RATE_LIMIT', DEFAULT_RATE_LIMIT),
+    })
+
+def write_config(**values):
+    """写入 config.json，未提供的字段沿用当前配置；先写临时文件再原子替换，避免其他进程读到半个文件"""
+    merged = dict(CONFIG)
+    merged.update(values)
+    data = normalize_config(merged)
+    tmp_path = f"{CONFIG_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, CONFIG_PATH)
+
+def config_signature():
+    """config.json 的 (mtime, size)，文件不存在时返回 None"""
     try:
-        import importlib, sys
-        importlib.invalidate_caches()
-        if 'config' in sys.modules:
-            cfg = importlib.reload(sys.modules['config'])
-        else:
-            cfg = importlib.import_module('config')
-
-        # 兼容性处理：如果只有 ADMIN_TOKEN 没有 ADMIN_TOKEN_HASH，则迁移
-        admin_token_hash = getattr(cfg, 'ADMIN_TOKEN_HASH', None)
-        if admin_token_hash is None:
-            # 尝试从旧的 ADMIN_TOKEN 迁移
-            old_token = getattr(cfg, 'ADMIN_TOKEN', None)
-            if old_token is not None:
-                # 对旧token做哈希
-                admin_token_hash = hashlib.sha256(old_token.encode('utf-8')).hexdigest()
-                # 重写配置文件，使用哈希值
-                upload_folder = getattr(cfg, 'UPLOAD_FOLDER', DEFAULT_UPLOAD_FOLDER)
-                allowed_extensions = set(getattr(cfg, 'ALLOWED_EXTENSIONS', DEFAULT_ALLOWED_EXTENSIONS))
-                max_file_size = int(getattr(cfg, 'MAX_FILE_SIZE', DEFAULT_MAX_FILE_SIZE))
-                banned_keywords = list(getattr(cfg, 'BANNED_KEYWORDS', DEFAULT_BANNED_KEYWORDS))
-                rate_limit = int(getattr(cfg, 'RATE_LIMIT', DEFAULT_RATE_LIMIT))
-                write_config_py(admin_token_hash, upload_folder, allowed_extensions, max_file_size, banned_keywords, rate_limit)
-                # 重新加载配置
-                importlib.invalidate_caches()
-                cfg = importlib.reload(sys.modules['config'])
-                admin_token_hash = getattr(cfg, 'ADMIN_TOKEN_HASH')
-
-        CONFIG = {
-            'ADMIN_TOKEN_HASH': admin_token_hash,
-            'UPLOAD_FOLDER': getattr(cfg, 'UPLOAD_FOLDER'),
-            'ALLOWED_EXTENSIONS': set(getattr(cfg, 'ALLOWED_EXTENSIONS')),
-            'MAX_FILE_SIZE': int(getattr(cfg, 'MAX_FILE_SIZE')),
-            'BANNED_KEYWORDS': list(getattr(cfg, 'BANNED_KEYWORDS', DEFAULT_BANNED_KEYWORDS)),
-            'RATE_LIMIT': int(getattr(cfg, 'RATE_LIMIT', DEFAULT_RATE_LIMIT)),
-        }
+        st = os.stat(CONFIG_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def load_config(force=False):
+    """加载 config.json；文件未变化（mtime/size 相同）时直接返回，不重复解析"""
+    global CONFIG, INIT, CONFIG_SIGNATURE
+    try:
+        signature = config_signature()
+        if signature is None and os.path.isfile(LEGACY_CONFIG_PATH):
+            # 兼容性处理：旧版 config.py 迁移为 config.json
+            CONFIG = {}
+            write_config(**read_legacy_config())
+            signature = config_signature()
+        if signature is None:
+            INIT = False
+            CONFIG = {}
+            CONFIG_SIGNATURE = None
+            return
+        if not force and signature == CONFIG_SIGNATURE:
+            return
+
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            CONFIG = normalize_config(json.load(f))
+        CONFIG_SIGNATURE = signature
         INIT = True
         apply_config_to_globals()
-    except Exception:
-        INIT = False
-        CONFIG = {}
+    except Exception as e:
+        if INIT and CONFIG:
+            # 热重载失败时保留上一次有效配置
+            app.logger.warning(f"Reload config.json failed: {e}")
+        else:
+            INIT = False
+            CONFIG = {}
+
+# === 后台维护任务 ===
+MAINTENANCE_INTERVAL = 1  # 秒
+maintenance_tasks = []  # [任务函数, 间隔秒数, 下次运行时间]
+
+def register_maintenance(func, interval):
+    """注册周期性后台任务，由单个守护线程统一调度"""
+    maintenance_tasks.append([func, interval, time.monotonic() + interval])
+
+def maintenance_loop():
+    while True:
+        time.sleep(MAINTENANCE_INTERVAL)
+        now = time.monotonic()
+        for task in list(maintenance_tasks):
+            func, interval, next_run = task
+            if now < next_run:
+                continue
+            task[2] = now + interval
+            try:
+                func()
+            except Exception as e:
+                app.logger.warning(f"Maintenance task {func.__name__} failed: {e}")
+
+maintenance_thread = None
+maintenance_thread_lock = threading.Lock()
+
+def start_maintenance():
+    """服务开始处理请求时启动维护线程（每个进程一次）；flask CLI 命令不处理请求，不会与之并发归档或清理"""
+    global maintenance_thread
+    with maintenance_thread_lock:
+        if maintenance_thread is None:
+            maintenance_thread = threading.Thread(target=maintenance_loop, name='maintenance', daemon=True)
+            maintenance_thread.start()
+
+# 配置文件热重载：仅在 mtime/size 变化时重新解析（兼容多进程修改配置）
+register_maintenance(load_config, 2)
 
 # 启动时尝试加载配置
 load_config()
 
+# === 准入控制 ===
+# 按类别（公开读、公开写、SSE）限制同时处理的请求数，满额时最多排队等待 wait 秒，
+# 仍无空位则立即返回 503 + Retry-After，避免请求无限排队拖慢所有接口。
+# 管理端（/admin）不受限制。公开请求（处理中与排队中的都占用一个线程）合计不超过
+# ADMISSION_THREADS - ADMISSION_ADMIN_RESERVE，超出时直接拒绝而不排队，保证管理操作总有线程可用。
+# ADMISSION_THREADS 在 config.json 中配置，应与 WSGI 服务器的工作线程数一致。
+# 默认关闭：线程数为 0 且各类别上限为 0（不限制）时不做任何准入检查。
+ADMISSION_RETRY_AFTER = 2  # 秒
+ADMISSION_ADMIN_RESERVE = 4  # 为管理端保留的线程数
+ADMISSION_MAX_WAIT = 10  # 秒：排队时间上限，排队的请求同样占用线程
+
+class AdmissionClass:
+    def __init__(self, limit, wait):
+        self.limit = limit  # 同时处理的请求上限，0 为不限制
+        self.wait = wait  # 满额时的最长排队时间（秒）
+        self.active = 0
+        self.shed = 0  # 累计拒绝数
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            if self.limit and self.active >= self.limit:
+                deadline = time.monotonic() + self.wait
+                while self.limit and self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self.cond.wait(remaining)
+            self.active += 1
+            return True
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+ADMISSION_CLASSES = {
+    "read": AdmissionClass(0, 0.5),
+    "write": AdmissionClass(0, 2.0),
+    "sse": AdmissionClass(0, 0),  # SSE 连接长期占用线程，满额时不排队
+}
+ADMISSION_CLASS_LIMITED = False  # 是否有类别设置了上限，随设置更新
+admission_lock = threading.Lock()
+admission_stats = {"inflight": 0, "shed": 0}  # 占用线程的公开请求数（处理中 + 排队中）、因线程预留被拒绝的累计数
+
+def public_thread_capacity():
+    """公开请求可占用的线程数，None 表示不限制"""
+    if not ADMISSION_THREADS:
+        return None
+    return max(ADMISSION_THREADS - ADMISSION_ADMIN_RESERVE, 0)
+
+def refresh_admission_limited():
+    global ADMISSION_CLASS_LIMITED
+    ADMISSION_CLASS_LIMITED = any(cls.limit for cls in ADMISSION_CLASSES.values())
+
+def release_admission_slot(name):
+    ADMISSION_CLASSES[name].release()
+    with admission_lock:
+        admission_stats["inflight"] -= 1
+
+def server_busy():
+    response = jsonify({"status": "Fail", "reason": "Server busy"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER)
+    return response
+
+def admission_class():
+    """请求所属类别，管理端返回 None（不限制）"""
+    if request.path.startswith('/admin') or request.path == '/init':
+        return None
+    if request.endpoint == 'stream':
+        return "sse"
+    return "read" if request.method in ('GET', 'HEAD', 'OPTIONS') else "write"
+
+def admit_request():
+    # 未启用准入控制时仅两次判断
+    if not ADMISSION_THREADS and not ADMISSION_CLASS_LIMITED:
+        return None
+    name = admission_class()
+    if name is None:
+        return None
+    capacity = public_thread_capacity()
+    with admission_lock:
+        if capacity is not None and admission_stats["inflight"] >= capacity:
+            admission_stats["shed"] += 1
+            return server_busy()
+        admission_stats["inflight"] += 1
+    if not ADMISSION_CLASSES[name].acquire():
+        with admission_lock:
+            admission_stats["inflight"] -= 1
+        return server_busy()
+    g.admission = name
+    return None
+
+@app.after_request
+def defer_admission_release(response):
+    # 流式响应（SSE）在视图返回后仍占用线程，连接关闭时才释放名额
+    name = g.pop('admission', None)
+    if name is not None:
+        if response.is_streamed:
+            response.call_on_close(lambda: release_admission_slot(name))
+        else:
+            g.admission = name
+    return response
+
+@app.teardown_request
+def release_admission(exc):
+    name = g.pop('admission', None)
+    if name is not None:
+        release_admission_slot(name)
+
+def load_admission_settings():
+    """类别上限与管理端预留线程数保存在数据库；线程数 ADMISSION_THREADS 来自 config.json"""
+    global ADMISSION_ADMIN_RESERVE
+    try:
+        ADMISSION_ADMIN_RESERVE = int(get_config("admission_admin_reserve", ADMISSION_ADMIN_RESERVE))
+        for name, cls in ADMISSION_CLASSES.items():
+            cls.limit = int(get_config(f"admission_{name}_limit", cls.limit))
+            cls.wait = min(float(get_config(f"admission_{name}_wait", cls.wait)), ADMISSION_MAX_WAIT)
+    except Exception:
+        pass
+    refresh_admission_limited()
+
 # 全部接口在初始化完成前返回 503（仅 /init 允许）
 @app.before_request
 def gate_uninitialized():
+    # 稳定状态下仅一次布尔判断
+    if READY:
+        return None
+    if RESTORING:
+        return jsonify({"status": "Fail", "reason": "Restoring"}), 503
     if request.path == '/init':
         return None
-    global INIT
-    # 若未初始化，尝试动态加载配置（兼容多进程/热重载场景）
+    # 若未初始化，检查配置文件是否出现（兼容多进程场景），文件未变化时只有一次 stat
     if not INIT:
-        try:
-            load_config()
-        except Exception:
-            pass
+        load_config()
     if not INIT:
         return jsonify({"status": "Fail", "reason": "Uninitialized"}), 503
+    ensure_db_and_audit()
+    if not READY:
+        return jsonify({"status": "Fail", "reason": "Database not ready"}), 503
 
-def write_config_py(token_hash, upload_folder, allowed_exts, max_file_size, banned_keywords=None, rate_limit=DEFAULT_RATE_LIMIT):
-    # 归一化扩展名为小写且唯一
-    exts = sorted(set(str(e).strip().lower() for e in allowed_exts if str(e).strip()))
-    # 归一化敏感词为去空格的字符串列表
-    banned = banned_keywords if banned_keywords is not None else DEFAULT_BANNED_KEYWORDS
-    banned = [str(w).strip() for w in banned if str(w).strip()]
-    content = (
-        "# Auto-generated by /init\n"
-        f"ADMIN_TOKEN_HASH = {repr(token_hash)}\n"
-        f"UPLOAD_FOLDER = {repr(upload_folder)}\n"
-        f"ALLOWED_EXTENSIONS = {repr(exts)}\n"
-        f"MAX_FILE_SIZE = {int(max_file_size)}\n"
-        f"BANNED_KEYWORDS = {repr(banned)}\n"
-        f"RATE_LIMIT = {int(rate_limit)}\n"
-    )
-    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.py')
-    with open(config_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+# 准入检查在初始化检查之后：未初始化时请求直接返回 503，不占用准入名额
+app.before_request(admit_request)
 
 @app.route('/init', methods=['POST'])
 def init_service():
-    global INIT
+    global READY
+    # 其他进程可能已完成初始化
+    load_config()
     if INIT:
         return jsonify({"status": "Fail", "reason": "Already initialized"}), 403
     data = request.get_json() or {}
@@ -298,6 +929,13 @@ def init_service():
     except Exception:
         return jsonify({"status": "Fail", "reason": "RATE_LIMIT must be int"}), 400
 
+    # 可选的 RATE_LIMIT_BUCKETS / RATE_LIMIT_COSTS（按路由分桶与计费）
+    try:
+        rate_limit_buckets = normalize_rate_limit_map(data.get("RATE_LIMIT_BUCKETS"), DEFAULT_RATE_LIMIT_BUCKETS)
+        rate_limit_costs = normalize_rate_limit_map(data.get("RATE_LIMIT_COSTS"), DEFAULT_RATE_LIMIT_COSTS)
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "RATE_LIMIT_BUCKETS and RATE_LIMIT_COSTS must map to int >= 0"}), 400
+
     # 可选的 BANNED_KEYWORDS
     bk = data.get("BANNED_KEYWORDS", DEFAULT_BANNED_KEYWORDS)
     if isinstance(bk, str):
@@ -308,14 +946,25 @@ def init_service():
         return jsonify({"status": "Fail", "reason": "BANNED_KEYWORDS must be list or comma string"}), 400
 
     try:
-        write_config_py(token_hash, upload_folder, allowed_exts, max_file_size, banned_keywords, rate_limit)
-        load_config()
+        write_config(
+            ADMIN_TOKEN_HASH=token_hash,
+            UPLOAD_FOLDER=upload_folder,
+            ALLOWED_EXTENSIONS=allowed_exts,
+            MAX_FILE_SIZE=max_file_size,
+            BANNED_KEYWORDS=banned_keywords,
+            RATE_LIMIT=rate_limit,
+            RATE_LIMIT_BUCKETS=rate_limit_buckets,
+            RATE_LIMIT_COSTS=rate_limit_costs,
+        )
+        load_config(force=True)
         initialize_database()
         try:
             global NEED_AUDIT
             NEED_AUDIT = get_config("need_audit", "false").lower() == "true"
         except Exception:
             NEED_AUDIT = False
+        READY = True
+        start_maintenance()
         return jsonify({"status": "OK"}), 200
     except Exception as e:
         return jsonify({"status": "Fail", "reason": str(e)}), 500
@@ -341,48 +990,853 @@ def get_client_ip():
         ip = ip.strip()
     return ip
 
-def rate_limit_exceeded() -> bool:
-    """返回是否超过限流。0 表示无限制。窗口从首次请求开始，持续 60 秒。"""
-    if RATE_LIMIT == 0:
+# 路由 -> 限流桶，未列出的路由使用 default 桶
+RATE_LIMIT_ROUTES = {"/report": "report", "/upload_pic": "upload", "/upload_pic/init": "upload"}
+RATE_LIMIT_WINDOW = 60  # 秒
+
+def rate_limit_bucket(bucket=None):
+    """当前请求计入的桶（默认按路由）：桶未设置额度时并入 default 桶"""
+    bucket = bucket or RATE_LIMIT_ROUTES.get(request.path, "default")
+    return bucket if RATE_LIMIT_BUCKETS.get(bucket, 0) else "default"
+
+def rate_limit_budget(bucket):
+    """桶每个窗口的额度，0 表示无限制"""
+    if bucket == "default":
+        return RATE_LIMIT
+    return RATE_LIMIT_BUCKETS.get(bucket, 0)
+
+def rate_limit_cost(bucket, size=None):
+    """当前请求的消耗：路由权重，上传再乘以字节数（默认取请求体长度，读取请求体之前即可判断）。
+    分块传输（Transfer-Encoding: chunked）没有 Content-Length，先按 1 字节计费，读完后由调用方补计实际字节数
+    """
+    cost = RATE_LIMIT_COSTS.get(request.path, 1)
+    if bucket == "upload":
+        cost *= max(request.content_length or 0, 1) if size is None else size
+    return cost
+
+def rate_limit_exceeded(size=None, prepaid=0, bucket=None) -> bool:
+    """返回是否超过限流。0 表示无限制。每个 (客户端, 桶) 的窗口从首次请求开始，持续 60 秒。
+    超额的请求不计入消耗，避免一次被拒的大文件上传占满额度；窗口内的第一个请求总是放行，
+    即使单次消耗超过额度（否则大于额度的上传永远无法完成）。size 只对按字节计的 upload 桶有效，
+    prepaid 为同一请求先前已预计的字节数，补计时先退回再按 size 整体计费。bucket 指定计入的桶，默认按路由。
+    """
+    bucket = rate_limit_bucket(bucket)
+    budget = rate_limit_budget(bucket)
+    if budget == 0:
         return False
+    cost = rate_limit_cost(bucket, size)
     ip = get_client_ip()
-    ip_hash = hashlib.sha256(ip.encode('utf-8')).hexdigest()
-    now = datetime.now(timezone.utc)
-    rec = RATE_LIMIT_STORE.get(ip_hash)
-    if rec is None:
-        RATE_LIMIT_STORE[ip_hash] = {'count': 1, 'start': now}
-        return False
-    # 窗口超过 60 秒则重置
-    if (now - rec['start']).total_seconds() >= 60:
-        rec['count'] = 1
-        rec['start'] = now
-        return False
-    # 累加计数并判断是否超过
-    rec['count'] += 1
-    return rec['count'] > RATE_LIMIT
-
-def guard_rate_limit():
-    """超过限流则返回 403，否则返回 None。"""
-    if rate_limit_exceeded():
+    key = (hashlib.sha256(ip.encode('utf-8')).hexdigest(), bucket)
+    now = time.monotonic()
+    rec = RATE_LIMIT_STORE.get(key)
+    if rec is None or now - rec['start'] >= RATE_LIMIT_WINDOW:
+        # 首次请求或窗口已过，重新开始计数
+        rec = RATE_LIMIT_STORE[key] = {'used': 0, 'start': now}
+    used = max(rec['used'] - rate_limit_cost(bucket, prepaid), 0) if prepaid else rec['used']
+    if used and used + cost > budget:
+        return True
+    rec['used'] = used + cost
+    return False
+
+def prune_rate_limit_store():
+    """清理窗口已过期的记录，避免限流表随客户端数量无限增长"""
+    cutoff = time.monotonic() - RATE_LIMIT_WINDOW
+    for key in [k for k, rec in list(RATE_LIMIT_STORE.items()) if rec['start'] < cutoff]:
+        RATE_LIMIT_STORE.pop(key, None)
+
+register_maintenance(prune_rate_limit_store, RATE_LIMIT_WINDOW)
+
+def guard_rate_limit(size=None, prepaid=0, bucket=None):
+    """超过限流则返回 403，否则返回 None。size 为上传类请求按字节计费时的字节数，prepaid、bucket 见 rate_limit_exceeded。"""
+    if rate_limit_exceeded(size, prepaid, bucket):
         return jsonify({"status": "Fail", "reason": "Rate Limit Exceeded"}), 403
     return None
 
 
-# 在服务收到请求且已配置后，确保数据库表创建并加载审核状态
+# === 投票去重 ===
+# 同一客户端（IP）对同一投稿只计一次票（赞或踩），用两代轮换的布隆过滤器记录 (IP, 投稿) 对：
+# 每代容量 VOTE_FILTER_CAPACITY、误判率 VOTE_FILTER_ERROR_RATE，约 1.8 MB；
+# 当前代满或超过 VOTE_FILTER_WINDOW 秒时轮换，记录至少保留一个窗口。误判只会让极少数正常投票被拒，不会放过重复票。
+# 开关、容量与窗口可通过 /admin/vote_dedup 修改并保存在数据库。
+VOTE_DEDUP_ENABLED = True
+VOTE_FILTER_CAPACITY = 1_000_000
+VOTE_FILTER_ERROR_RATE = 0.001
+VOTE_FILTER_WINDOW = 30 * 24 * 3600
+VOTE_FILTER_MAX_CAPACITY = 50_000_000  # 每代约 90 MB
+VOTE_FILTER_PATH = os.path.join(os.path.dirname(DB_FILE), 'vote_filter.bin')
+
+class BloomFilter:
+    def __init__(self, num_bits, num_hashes, bits=None, count=0, started=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        self.count = count
+        self.started = time.time() if started is None else started
+
+    def positions(self, digest):
+        # 双重哈希：h1 + i * h2
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, digest):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self.positions(digest))
+
+    def add(self, digest):
+        bits = self.bits
+        for p in self.positions(digest):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class RotatingBloomFilter:
+    """当前代 + 上一代布隆过滤器，查询两代，只写当前代"""
+    HEADER = struct.Struct('<4sIIQdQd')  # 魔数, 位数, 哈希数, 当前代计数, 当前代开始时间, 上一代计数, 上一代开始时间
+    MAGIC = b'VBF1'
+
+    def __init__(self, capacity, error_rate, window):
+        self.capacity = capacity
+        self.window = window
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.current = BloomFilter(self.num_bits, self.num_hashes)
+        self.previous = BloomFilter(self.num_bits, self.num_hashes)
+        self.pending = set()  # 正在处理的投票，防止并发的同一请求同时通过检查
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def _rotate_if_needed(self):
+        if self.current.count >= self.capacity or time.time() - self.current.started >= self.window:
+            self.previous = self.current
+            self.current = BloomFilter(self.num_bits, self.num_hashes)
+            self.dirty = True
+
+    def begin(self, digest):
+        """检查并占用一次投票，已投过或正在处理时返回 False"""
+        with self.lock:
+            if digest in self.pending or digest in self.current or digest in self.previous:
+                return False
+            self.pending.add(digest)
+            return True
+
+    def finish(self, digest, recorded):
+        """投票处理结束，写入成功时记录到当前代"""
+        with self.lock:
+            self.pending.discard(digest)
+            if recorded:
+                self._rotate_if_needed()
+                self.current.add(digest)
+                self.dirty = True
+
+    def dumps(self):
+        with self.lock:
+            header = self.HEADER.pack(
+                self.MAGIC, self.num_bits, self.num_hashes,
+                self.current.count, self.current.started, self.previous.count, self.previous.started
+            )
+            return header + bytes(self.current.bits) + bytes(self.previous.bits)
+
+    def loads(self, data):
+        """从快照恢复；参数（容量、误判率）变化后旧快照不兼容，直接丢弃"""
+        size = (self.num_bits + 7) // 8
+        if len(data) != self.HEADER.size + 2 * size:
+            return False
+        magic, num_bits, num_hashes, cur_count, cur_started, prev_count, prev_started = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or num_bits != self.num_bits or num_hashes != self.num_hashes:
+            return False
+        offset = self.HEADER.size
+        with self.lock:
+            self.current = BloomFilter(num_bits, num_hashes, bytearray(data[offset:offset + size]), cur_count, cur_started)
+            self.previous = BloomFilter(num_bits, num_hashes, bytearray(data[offset + size:]), prev_count, prev_started)
+            self._rotate_if_needed()
+        return True
+
+vote_filter = RotatingBloomFilter(VOTE_FILTER_CAPACITY, VOTE_FILTER_ERROR_RATE, VOTE_FILTER_WINDOW)
+
+def parse_post_id(value):
+    """投票接口的投稿 id 转为 int（接受整数或十进制整数字符串），非法时返回 None。
+    统一为 int 后再去重，避免 "01"、" 1" 等写法绕过同一投稿的去重。
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdecimal():
+        return int(value.strip())
+    return None
+
+def vote_digest(post_id):
+    """(客户端 IP, 投稿 id) 的哈希，post_id 须已由 parse_post_id 规范化；过滤器与快照中不保存明文 IP"""
+    key = f"{get_client_ip()}\0{post_id}".encode('utf-8')
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+def save_vote_filter():
+    """有变化时原子写入快照文件（先写临时文件再替换）"""
+    if not vote_filter.dirty:
+        return
+    vote_filter.dirty = False
+    try:
+        os.makedirs(os.path.dirname(VOTE_FILTER_PATH), exist_ok=True)
+        tmp_path = f"{VOTE_FILTER_PATH}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(vote_filter.dumps())
+        os.replace(tmp_path, VOTE_FILTER_PATH)
+    except Exception:
+        vote_filter.dirty = True
+        raise
+
+def load_vote_filter():
+    try:
+        with open(VOTE_FILTER_PATH, 'rb') as f:
+            if not vote_filter.loads(f.read()):
+                app.logger.warning("Vote filter snapshot incompatible, starting empty")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        app.logger.warning(f"Load vote filter failed: {e}")
+
+def configure_vote_filter(capacity, window):
+    """应用新的容量与窗口：窗口直接生效；容量决定位数，变化时按新参数重建过滤器，
+    先尝试读取（其他进程已按新参数保存的）快照，不兼容则从空开始，已记录的投票随之清空
+    """
+    global vote_filter, VOTE_FILTER_CAPACITY, VOTE_FILTER_WINDOW
+    VOTE_FILTER_WINDOW = window
+    vote_filter.window = window
+    if capacity == VOTE_FILTER_CAPACITY:
+        return
+    VOTE_FILTER_CAPACITY = capacity
+    vote_filter = RotatingBloomFilter(capacity, VOTE_FILTER_ERROR_RATE, window)
+    load_vote_filter()
+    vote_filter.dirty = True
+
+def load_vote_dedup_settings():
+    global VOTE_DEDUP_ENABLED
+    try:
+        VOTE_DEDUP_ENABLED = get_config("vote_dedup_enabled", "true").lower() == "true"
+        configure_vote_filter(
+            int(get_config("vote_dedup_capacity", VOTE_FILTER_CAPACITY)),
+            int(get_config("vote_dedup_window", VOTE_FILTER_WINDOW))
+        )
+    except Exception:
+        pass
+
+load_vote_filter()
+register_maintenance(save_vote_filter, 60)
+atexit.register(save_vote_filter)
+
+
+# === SQL 性能分析（慢查询日志） ===
+SQL_PROFILE_ENABLED = False  # 运行时可通过 /admin/sql_profile 开关
+SQL_PROFILE_MAX_QUERIES = 20  # 单个请求查询次数阈值
+SQL_PROFILE_MAX_MS = 500  # 单个请求总耗时阈值（毫秒）
+SLOW_REQUESTS = deque(maxlen=50)  # 最近的慢请求记录
+
+@event.listens_for(Engine, "before_cursor_execute")
+def profile_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if SQL_PROFILE_ENABLED and context is not None:
+        context._profile_start = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def profile_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profile_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    # 只统计请求线程内的查询，后台线程的查询不计入
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries.append((statement, elapsed))
+
 @app.before_request
+def start_sql_profile():
+    if SQL_PROFILE_ENABLED:
+        g.sql_queries = []
+        g.request_start = time.perf_counter()
+
+@app.after_request
+def finish_sql_profile(response):
+    queries = g.pop('sql_queries', None)
+    if queries is None:
+        return response
+    total_ms = (time.perf_counter() - g.pop('request_start')) * 1000
+    db_ms = sum(elapsed for _, elapsed in queries) * 1000
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={db_ms:.2f};desc="{len(queries)} queries", app;dur={max(total_ms - db_ms, 0):.2f}'
+    )
+    if len(queries) > SQL_PROFILE_MAX_QUERIES or total_ms > SQL_PROFILE_MAX_MS:
+        record = {
+            "method": request.method,
+            "path": request.full_path.rstrip('?'),
+            "status": response.status_code,
+            "total_ms": round(total_ms, 2),
+            "db_ms": round(db_ms, 2),
+            "queries": [{"sql": stmt, "ms": round(elapsed * 1000, 2)} for stmt, elapsed in queries],
+        }
+        SLOW_REQUESTS.append(record)
+        app.logger.warning(
+            "Slow request %s %s: %d queries, %.2f ms total, %.2f ms db\n%s",
+            record["method"], record["path"], len(queries), total_ms, db_ms,
+            "\n".join(f"  [{q['ms']} ms] {q['sql']}" for q in record["queries"])
+        )
+    return response
+
+
+# === 内存诊断 ===
+# tracemalloc 只在通过 /admin/mem_profile 开启后运行，关闭时停止追踪并丢弃快照，不产生额外开销
+MEM_PROFILE_FRAMES = 1  # 每个分配记录的调用栈深度
+MEM_PROFILE_LIMIT = 20  # 默认返回的分配位置数量
+mem_profile_baseline = None  # 用于对比的基准快照
+mem_profile_lock = threading.Lock()
+
+def take_mem_snapshot():
+    """获取快照并去掉 tracemalloc 自身与导入机制的分配"""
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+def format_stat(stat):
+    record = {
+        "size": stat.size,
+        "count": stat.count,
+        "trace": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+    }
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        record["size_diff"] = stat.size_diff
+        record["count_diff"] = stat.count_diff
+    return record
+
+def process_rss():
+    """当前常驻内存（字节），非 Linux 时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def memory_structures():
+    """进程内主要数据结构的大小，只做计数，不需要开启 tracemalloc"""
+    with sse_lock:
+        depths = [client_queue.qsize() for client_queue in sse_clients]
+        topic_subscribers = sum(len(subscribers) for subscribers in sse_topics.values())
+    with compress_cache_lock:
+        compress_entries, compress_bytes = len(compress_cache), compress_cache_bytes
+    with stamp_lock:
+        stamp_entries = len(stamp_cache)
+    with near_dup_index.lock:
+        near_dup_entries, near_dup_buckets = len(near_dup_index.sketches), len(near_dup_index.buckets)
+    with vote_filter.lock:
+        vote_counts = (vote_filter.current.count, vote_filter.previous.count, len(vote_filter.pending))
+        vote_bytes = len(vote_filter.current.bits) + len(vote_filter.previous.bits)
+    # 各应用上下文的 Session；请求结束后会被移除，残留的说明有泄漏
+    sessions = list(db.session.registry.registry.values())
+    return {
+        "rate_limit_store": {"entries": len(RATE_LIMIT_STORE)},
+        "sse": {
+            "clients": len(depths),
+            "topics": len(sse_topics),
+            "topic_subscriptions": topic_subscribers,
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+        },
+        "compress_cache": {"entries": compress_entries, "bytes": compress_bytes},
+        "stamp_cache": {"entries": stamp_entries},
+        "notice_cache": {"cached": notice_cache["data"] is not None},
+        "near_dup_index": {"entries": near_dup_entries, "buckets": near_dup_buckets},
+        "vote_filter": {
+            "current": vote_counts[0], "previous": vote_counts[1], "pending": vote_counts[2], "bytes": vote_bytes,
+        },
+        "write_queue": {"pending": write_queue.qsize()},
+        "slow_requests": {"entries": len(SLOW_REQUESTS)},
+        "sessions": {
+            "active": len(sessions),
+            "identity_map": sum(len(session.identity_map) for session in sessions),
+        },
+    }
+
+def top_object_types(limit):
+    """gc 追踪的对象按类型计数，遍历所有对象，只在显式请求时执行"""
+    counts = {}
+    for obj in gc.get_objects():
+        name = type(obj).__qualname__
+        counts[name] = counts.get(name, 0) + 1
+    return [{"type": name, "count": count} for name, count in sorted(counts.items(), key=lambda item: -item[1])[:limit]]
+
+
+# === 响应压缩 ===
+COMPRESS_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+COMPRESS_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/event-stream'}
+COMPRESS_CACHE_MAX_BYTES = 8 * 1024 * 1024  # 压缩结果缓存上限
+compress_cache = OrderedDict()  # (编码, 原始内容摘要) -> 压缩后内容
+compress_cache_bytes = 0
+compress_cache_lock = threading.Lock()
+
+def supported_encodings():
+    """服务端支持的编码，按优先级排序"""
+    encodings = []
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+def negotiate_encoding():
+    """根据 Accept-Encoding 选择压缩编码，不接受压缩时返回 None"""
+    return request.accept_encodings.best_match(supported_encodings())
+
+def compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+def cached_compress(data, encoding):
+    """压缩并缓存结果，同一内容（如反复请求的同一页投稿）只压缩一次"""
+    global compress_cache_bytes
+    key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+    with compress_cache_lock:
+        body = compress_cache.get(key)
+        if body is not None:
+            compress_cache.move_to_end(key)
+            return body
+    body = compress_bytes(data, encoding)
+    if len(body) > COMPRESS_CACHE_MAX_BYTES // 16:
+        return body
+    with compress_cache_lock:
+        if key not in compress_cache:
+            compress_cache[key] = body
+            compress_cache_bytes += len(body)
+            while compress_cache_bytes > COMPRESS_CACHE_MAX_BYTES:
+                _, old = compress_cache.popitem(last=False)
+                compress_cache_bytes -= len(old)
+    return body
+
+class StreamCompressor:
+    """流式压缩器：每条消息后 flush，保证 SSE 事件能立即送达客户端"""
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._c = brotli.Compressor(quality=5)
+        elif encoding == 'zstd':
+            self._c = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            self._c = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 为 gzip 格式
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._c.process(data) + self._c.flush()
+        if self.encoding == 'zstd':
+            return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+@app.after_request
+def compress_response(response):
+    # 跳过文件（图片、备份等 direct_passthrough）、流式响应与已编码内容
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    if request.method == 'GET':
+        body = cached_compress(data, encoding)
+    else:
+        body = compress_bytes(data, encoding)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # 强 ETag 需区分不同编码的表示
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+# 配置加载后首次请求时，确保数据库表创建并加载审核状态（每个进程只执行一次）
+ready_lock = threading.Lock()
+DB_INIT_RETRY_INTERVAL = 5  # 秒：建表或迁移失败后，至少间隔该时间才由请求重试
+db_init_failed_at = None
+
 def ensure_db_and_audit():
-    global NEED_AUDIT
-    if not getattr(ensure_db_and_audit, "_has_run", False) and INIT:
+    global NEED_AUDIT, READY, db_init_failed_at
+    with ready_lock:
+        if READY or not INIT:
+            return
+        if db_init_failed_at is not None and time.monotonic() - db_init_failed_at < DB_INIT_RETRY_INTERVAL:
+            return
         try:
             initialize_database()
+        except Exception as e:
+            # 建表或迁移失败时保持未就绪，请求返回 503 直到重试成功，不在不完整的表结构上提供服务
+            db.session.rollback()
+            db_init_failed_at = time.monotonic()
+            app.logger.error(f"Database initialization failed: {e}")
+            return
+        db_init_failed_at = None
+        try:
             try:
                 NEED_AUDIT = get_config("need_audit", "false").lower() == "true"
             except Exception:
                 NEED_AUDIT = False
+            load_write_queue_settings()
+            load_duplicate_settings()
+            load_near_duplicate_settings()
+            rebuild_near_duplicate_index()
+            load_vote_dedup_settings()
+            load_archive_settings()
+            load_admission_settings()
+            load_image_gc_settings()
         except Exception:
             pass
         finally:
-            setattr(ensure_db_and_audit, "_has_run", True)
+            READY = True
+            start_maintenance()
+
+
+# === 批量写入队列（组提交） ===
+# 开启后投稿、评论、投诉由单个写线程按批提交：攒够 WRITE_BATCH_SIZE 条或等待 WRITE_BATCH_MS 毫秒，
+# 一批只需一次 commit（一次 fsync、一次写锁），调用方仍同步拿到分配的 id 与状态。
+WRITE_QUEUE_ENABLED = False
+WRITE_BATCH_SIZE = 64
+WRITE_BATCH_MS = 5
+WRITE_TIMEOUT = 10  # 秒：调用方等待写入结果的最长时间
+
+write_queue = queue.Queue()
+write_thread = None
+write_thread_lock = threading.Lock()
+write_stats = {"batches": 0, "rows": 0}
+
+class StaleWrite(Exception):
+    """写入时发现请求阶段的检查已失效（如投稿在排队期间被删除或归档），该条写入回滚，调用方返回 payload 与状态码"""
+    def __init__(self, payload, code):
+        super().__init__(payload.get("reason") or payload.get("status"))
+        self.payload = payload
+        self.code = code
+
+class PendingWrite:
+    """一条待写入记录。
+    apply() 在写入会话中添加 ORM 对象并返回它；describe(obj) 在 flush 后生成返回给调用方的结果；
+    notify 为 True 时提交后通知 SSE 客户端（每批只通知一次）。
+    state：queued -> running（写线程已取走）或 cancelled（调用方等待超时，不再写入）。
+    """
+    def __init__(self, apply, describe, notify=False):
+        self.apply = apply
+        self.describe = describe
+        self.notify = notify
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.state = "queued"
+        self.state_lock = threading.Lock()
+
+    def claim(self):
+        """写线程开始处理前调用，已被取消时返回 False"""
+        with self.state_lock:
+            if self.state == "cancelled":
+                return False
+            self.state = "running"
+            return True
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            with self.state_lock:
+                if self.state == "queued":
+                    # 尚未写入：取消后调用方可以安全重试，不会产生重复记录
+                    self.state = "cancelled"
+                    raise TimeoutError("Write queue timeout")
+            # 已在提交中，等待结果（受 SQLite 忙等待超时约束），避免返回失败后记录仍被写入
+            self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+def commit_writes(writes, notify=True):
+    """在一个事务中执行多条写入；整批失败时逐条重试，只让出错的那一条失败。
+    返回成功提交的记录；notify 为 False 时由调用方负责通知 SSE 客户端。
+    """
+    writes = [w for w in writes if w.state == "running" or w.claim()]
+    if not writes:
+        return []
+    try:
+        objs = [w.apply() for w in writes]
+        db.session.flush()  # 分配 id
+        results = [w.describe(obj) for w, obj in zip(writes, objs)]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if len(writes) == 1:
+            writes[0].error = e
+            writes[0].done.set()
+            return []
+        # 逐条重试，全部完成后最多通知一次
+        committed = [w for single in writes for w in commit_writes([single], notify=False)]
+        if notify and any(w.notify for w in committed):
+            notify_new_post()
+        return committed
+    for w, result in zip(writes, results):
+        w.result = result
+        w.done.set()
+    if notify and any(w.notify for w in writes):
+        notify_new_post()
+    return writes
+
+def write_loop():
+    while True:
+        batch = [write_queue.get()]
+        deadline = time.monotonic() + WRITE_BATCH_MS / 1000
+        while len(batch) < WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(write_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            with app.app_context():
+                commit_writes(batch)
+            write_stats["batches"] += 1
+            write_stats["rows"] += len(batch)
+        except Exception as e:
+            app.logger.warning(f"Write batch failed: {e}")
+            for w in batch:
+                if not w.done.is_set():
+                    w.error = e
+                    w.done.set()
+
+def submit_write(write):
+    """执行一条写入并返回 describe() 的结果；未开启写入队列时在当前会话中直接提交"""
+    global write_thread
+    if not WRITE_QUEUE_ENABLED:
+        commit_writes([write])
+        return write.wait()
+    # 等待期间不占用连接池中的连接，否则并发请求可能耗尽连接池使写线程无法提交
+    db.session.close()
+    if write_thread is None:
+        with write_thread_lock:
+            if write_thread is None:
+                write_thread = threading.Thread(target=write_loop, name='write-queue', daemon=True)
+                write_thread.start()
+    write_queue.put(write)
+    return write.wait(WRITE_TIMEOUT)
+
+def load_write_queue_settings():
+    global WRITE_QUEUE_ENABLED, WRITE_BATCH_SIZE, WRITE_BATCH_MS
+    try:
+        WRITE_QUEUE_ENABLED = get_config("write_queue", "false").lower() == "true"
+        WRITE_BATCH_SIZE = int(get_config("write_batch_size", WRITE_BATCH_SIZE))
+        WRITE_BATCH_MS = float(get_config("write_batch_ms", WRITE_BATCH_MS))
+    except Exception:
+        WRITE_QUEUE_ENABLED = False
+
+
+# === 重复内容检测 ===
+DUPLICATE_WINDOW = 3600  # 秒：窗口内出现相同内容视为重复，0 为关闭
+DUPLICATE_POLICY = "reject"  # reject：拒绝；collapse：直接返回已有记录
+DUPLICATE_MIN_LENGTH = 8  # 归一化后短于该长度的内容（如“哈哈”）不做检测
+
+def normalize_content(content):
+    """归一化内容：NFKC（全角转半角）、去除所有空白、大小写折叠"""
+    return ''.join(unicodedata.normalize('NFKC', content).split()).casefold()
+
+def content_fingerprint(content):
+    return hashlib.blake2b(normalize_content(content).encode('utf-8'), digest_size=16).hexdigest()
+
+def find_duplicate(model, content, fingerprint, *criteria):
+    """在去重窗口内按指纹查找已有记录（单次索引查询），返回 (id, 其余列...) 或 None"""
+    if DUPLICATE_WINDOW <= 0 or len(normalize_content(content)) < DUPLICATE_MIN_LENGTH:
+        return None
+    cutoff = get_utc_now() - timedelta(seconds=DUPLICATE_WINDOW)
+    columns = [model.id] + ([model.status] if model is Submission else [])
+    return db.session.execute(
+        select(*columns)
+        .where(model.fingerprint == fingerprint, model.created_at >= cutoff, *criteria)
+        .order_by(model.created_at.desc())
+        .limit(1)
+    ).first()
+
+def load_duplicate_settings():
+    global DUPLICATE_WINDOW, DUPLICATE_POLICY
+    try:
+        DUPLICATE_WINDOW = int(get_config("duplicate_window", DUPLICATE_WINDOW))
+        DUPLICATE_POLICY = get_config("duplicate_policy", DUPLICATE_POLICY)
+    except Exception:
+        pass
+
+
+# === 近似重复检测（MinHash + LSH） ===
+# 每条内容按 3 字符切片，取切片哈希中最小的 MINHASH_K 个作为 bottom-k MinHash 草图，
+# 两份草图可估算 Jaccard 相似度；前 MINHASH_LSH_KEYS 个最小值建立倒排索引，
+# 相似内容大概率共享其中至少一个值，查询时只需与这些候选比较。
+MINHASH_SHINGLE = 3  # 切片长度
+MINHASH_K = 32  # 草图大小
+MINHASH_LSH_KEYS = 8  # 参与倒排索引的最小值个数
+MINHASH_MAX_CANDIDATES = 1000  # 单次查询最多比较的候选数
+NEAR_DUP_ENABLED = False  # 默认关闭，通过 /admin/near_duplicate 开启
+NEAR_DUP_WINDOW = 24 * 3600  # 秒：只与该时间内的内容比较
+NEAR_DUP_MAX_ENTRIES = 100000  # 索引最多保留的条数
+NEAR_DUP_MIN_LENGTH = 20  # 归一化后短于该长度的内容不做检测
+NEAR_DUP_REJECT_DISTANCE = 0.2  # Jaccard 距离 <= 该值直接拒绝
+NEAR_DUP_PENDING_DISTANCE = 0.5  # Jaccard 距离 <= 该值的投稿进入待审核
+
+def shingle_hash(shingle):
+    """切片的 64 位稳定哈希；内置 hash() 按进程加盐，草图无法跨进程、跨重启比较"""
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def minhash_sketch(content):
+    """计算归一化内容的 bottom-k MinHash 草图（升序列表），相同内容在任何进程中得到相同的草图"""
+    text_ = normalize_content(content)
+    n = MINHASH_SHINGLE
+    shingles = {text_[i:i + n] for i in range(max(len(text_) - n + 1, 1))}
+    return sorted(map(shingle_hash, shingles))[:MINHASH_K]
+
+def sketch_distance(a, b, b_set):
+    """由两份草图估算 Jaccard 距离：只统计不超过两者第 k 小值中较小者的哈希，该范围内两份草图都是完整的"""
+    threshold = min(a[-1], b[-1])
+    a_count = bisect.bisect_right(a, threshold)
+    b_count = bisect.bisect_right(b, threshold)
+    shared = sum(1 for x in a[:a_count] if x in b_set)
+    return 1 - shared / (a_count + b_count - shared)
+
+class MinHashIndex:
+    """按时间与数量淘汰的 MinHash 近邻索引"""
+    def __init__(self, window, max_entries):
+        self.window = window
+        self.max_entries = max_entries
+        self.buckets = {}  # 哈希值 -> {key}
+        self.entries = deque()  # (时间戳, key)，按插入顺序
+        self.sketches = {}  # key -> (草图, 草图集合, 范围)
+        self.lock = threading.Lock()
+
+    def _remove_oldest(self):
+        _, key = self.entries.popleft()
+        entry = self.sketches.pop(key, None)
+        if entry is None:
+            return
+        for value in entry[0][:MINHASH_LSH_KEYS]:
+            keys = self.buckets.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.buckets[value]
+
+    def _expire(self, now):
+        while self.entries and (len(self.entries) > self.max_entries or self.entries[0][0] < now - self.window):
+            self._remove_oldest()
+
+    def add(self, key, sketch, ts=None, scope=None):
+        if not sketch:
+            return
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            if key in self.sketches:
+                return
+            self.sketches[key] = (sketch, set(sketch), scope)
+            self.entries.append((ts, key))
+            for value in sketch[:MINHASH_LSH_KEYS]:
+                self.buckets.setdefault(value, set()).add(key)
+            self._expire(time.time())
+
+    def nearest(self, sketch, scope=None):
+        """返回同一范围内与草图最相近的已有内容的 Jaccard 距离，无候选时返回 None"""
+        if not sketch:
+            return None
+        best = None
+        checked = 0
+        with self.lock:
+            self._expire(time.time())
+            seen = set()
+            for value in sketch[:MINHASH_LSH_KEYS]:
+                for key in self.buckets.get(value, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    other, other_set, other_scope = self.sketches[key]
+                    if other_scope != scope:
+                        continue
+                    distance = sketch_distance(sketch, other, other_set)
+                    if best is None or distance < best:
+                        best = distance
+                        if best == 0:
+                            return 0.0
+                    checked += 1
+                    if checked >= MINHASH_MAX_CANDIDATES:
+                        return best
+        return best
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+            self.entries.clear()
+            self.sketches.clear()
+
+near_dup_index = MinHashIndex(NEAR_DUP_WINDOW, NEAR_DUP_MAX_ENTRIES)
+
+def near_dup_scope(kind, submission_id=None):
+    """比较范围：投稿与所有投稿比较；评论只与同一投稿下的评论比较（与精确去重一致）"""
+    return "post" if kind == "post" else ("comment", submission_id)
+
+def near_duplicate_action(content, scope="post"):
+    """近似重复判定，返回 'reject'、'pending' 或 'allow'"""
+    if not NEAR_DUP_ENABLED or len(normalize_content(content)) < NEAR_DUP_MIN_LENGTH:
+        return "allow"
+    distance = near_dup_index.nearest(minhash_sketch(content), scope)
+    if distance is None:
+        return "allow"
+    if distance <= NEAR_DUP_REJECT_DISTANCE:
+        return "reject"
+    if distance <= NEAR_DUP_PENDING_DISTANCE:
+        return "pending"
+    return "allow"
+
+def remember_content(key, content, ts=None, scope="post"):
+    """将新内容加入近似重复索引，key 形如 ('post', id) 或 ('comment', id)，scope 见 near_dup_scope"""
+    if NEAR_DUP_ENABLED and len(normalize_content(content)) >= NEAR_DUP_MIN_LENGTH:
+        near_dup_index.add(key, minhash_sketch(content), ts, scope)
+
+def rebuild_near_duplicate_index():
+    """从数据库重建索引：取窗口内最新的内容，按时间顺序加入"""
+    near_dup_index.clear()
+    if not NEAR_DUP_ENABLED:
+        return 0
+    cutoff = get_utc_now() - timedelta(seconds=NEAR_DUP_WINDOW)
+    rows = []
+    for kind, model in (("post", Submission), ("comment", Comment)):
+        owner = model.id if model is Submission else model.submission_id
+        rows.extend(
+            (row.created_at, kind, row.id, row.content, row.owner)
+            for row in db.session.execute(
+                select(model.id, model.content, model.created_at, owner.label("owner"))
+                .where(model.created_at >= cutoff)
+                .order_by(model.created_at.desc())
+                .limit(NEAR_DUP_MAX_ENTRIES)
+            )
+        )
+    rows.sort(key=lambda row: row[0])
+    for created_at, kind, row_id, content, owner in rows[-NEAR_DUP_MAX_ENTRIES:]:
+        remember_content(
+            (kind, row_id), content, created_at.replace(tzinfo=timezone.utc).timestamp(), near_dup_scope(kind, owner)
+        )
+    return len(near_dup_index.sketches)
+
+def load_near_duplicate_settings():
+    global NEAR_DUP_ENABLED, NEAR_DUP_REJECT_DISTANCE, NEAR_DUP_PENDING_DISTANCE
+    try:
+        NEAR_DUP_ENABLED = get_config("near_dup_enabled", "false").lower() == "true"
+        NEAR_DUP_REJECT_DISTANCE = float(get_config("near_dup_reject_distance", NEAR_DUP_REJECT_DISTANCE))
+        NEAR_DUP_PENDING_DISTANCE = float(get_config("near_dup_pending_distance", NEAR_DUP_PENDING_DISTANCE))
+    except Exception:
+        pass
 
 
 # === 管理端文章状态修改工具函数 ===
@@ -394,7 +1848,9 @@ def admin_change_status(submission_id, from_status, to_status):
         return False, f"Post in wrong state"
     submission.status = to_status
     submission.updated_at = get_utc_now()
+    bump_stamps(f"post:{submission.id}", "feed")
     db.session.commit()
+    publish_post_state(submission_id, to_status)
     return True, None
 
 
@@ -417,15 +1873,51 @@ def require_admin(func):
 
 # === 路由 ===
 @app.route('/stream', methods=['GET'])
+@use_reader
 def stream():
-    """SSE 端点：推送新投稿通知和心跳"""
+    """SSE 端点：推送新投稿通知和心跳。
+    可选参数 posts=1,2 / reports=3 订阅这些投稿、投诉的审核状态变化，
+    订阅后先推送一次当前状态，之后仅在状态变化时推送。
+    可选参数 post=<id> 订阅该投稿的评论增量，客户端据此更新本地评论树而无需重新拉取。
+    """
+    encoding = negotiate_encoding()
+    post_ids = parse_id_list(request.args.get("posts"))
+    report_ids = parse_id_list(request.args.get("reports"))
+    topics = [f"post_state:{i}" for i in post_ids] + [f"report_state:{i}" for i in report_ids]
+
+    # 评论频道只对公开（已通过）的投稿开放，与 /get/comment 一致
+    comment_post_id = request.args.get("post", type=int)
+    if comment_post_id:
+        submission = db.session.get(Submission, comment_post_id)
+        if submission and submission.status == "Pass":
+            topics.append(f"comments:{comment_post_id}")
+
+    # 订阅时的当前状态，避免客户端错过订阅前发生的变化
+    initial = []
+    if post_ids:
+        states = dict(db.session.execute(
+            select(Submission.id, Submission.status).where(Submission.id.in_(post_ids))
+        ).all())
+        initial += [{"type": "post_state", "id": i, "status": STATE_NAMES[states.get(i)]} for i in post_ids]
+    if report_ids:
+        states = dict(db.session.execute(
+            select(Report.id, Report.status).where(Report.id.in_(report_ids))
+        ).all())
+        initial += [{"type": "report_state", "id": i, "status": STATE_NAMES[states.get(i)]} for i in report_ids]
+    # 长连接期间不占用数据库连接
+    db.session.close()
+
     def event_stream():
         # 为当前客户端创建一个队列
         client_queue = queue.Queue()
 
-        # 将队列注册到全局客户端列表
+        # 将队列注册到全局客户端列表与订阅的主题
         with sse_lock:
             sse_clients.append(client_queue)
+            for topic in topics:
+                sse_topics.setdefault(topic, set()).add(client_queue)
+        for payload in initial:
+            client_queue.put(app.json.dumps(payload))
 
         try:
             while True:
@@ -437,13 +1929,33 @@ def stream():
                 except queue.Empty:
                     # 超时则发送心跳
                     yield "data: heartbeat\n\n"
-        except GeneratorExit:
+        finally:
             # 客户端断开连接时清理
             with sse_lock:
                 if client_queue in sse_clients:
                     sse_clients.remove(client_queue)
+                for topic in topics:
+                    subscribers = sse_topics.get(topic)
+                    if subscribers is not None:
+                        subscribers.discard(client_queue)
+                        if not subscribers:
+                            del sse_topics[topic]
+
+    def compressed_stream():
+        compressor = StreamCompressor(encoding)
+        events = event_stream()
+        try:
+            for event in events:
+                yield compressor.compress(event.encode('utf-8'))
+        finally:
+            events.close()
 
-    return Response(event_stream(), mimetype='text/event-stream')
+    if encoding is None:
+        return Response(event_stream(), mimetype='text/event-stream')
+    response = Response(compressed_stream(), mimetype='text/event-stream')
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 @app.route('/post', methods=['POST'])
@@ -463,23 +1975,53 @@ def submit_post():
     if any(bad_word in content for bad_word in BANNED_KEYWORDS):
         return jsonify({"status": "Deny"}), 403
 
-    # --- 状态判断 ---
-    need_audit = get_config("need_audit", "false").lower() == "true"
-    status = "Pending" if need_audit else "Pass"
-
-    submission = Submission(
-        content=content,
-        status=status,
-        created_at=datetime.now(timezone.utc)
-    )
-    db.session.add(submission)
-    db.session.commit()
+    # --- 重复检测 ---
+    fingerprint = content_fingerprint(content)
+    duplicate = find_duplicate(Submission, content, fingerprint)
+    if duplicate is not None:
+        if DUPLICATE_POLICY == "collapse":
+            return jsonify({"id": duplicate.id, "status": duplicate.status}), 201
+        return jsonify({"status": "Deny", "reason": "Duplicate"}), 403
 
-    # 如果直接通过（关闭审核），通知 SSE 客户端
-    if status == "Pass":
-        notify_new_post()
+    # --- 近似重复检测 ---
+    near_dup = near_duplicate_action(content)
+    if near_dup == "reject":
+        return jsonify({"status": "Deny", "reason": "Duplicate"}), 403
 
-    return jsonify({"id": submission.id, "status": submission.status}), 201
+    # --- 状态判断 ---
+    need_audit = get_config("need_audit", "false").lower() == "true"
+    status = "Pending" if need_audit or near_dup == "pending" else "Pass"
+
+    def insert_submission():
+        submission = Submission(
+            content=content,
+            status=status,
+            created_at=datetime.now(timezone.utc),
+            fingerprint=fingerprint
+        )
+        db.session.add(submission)
+        if '/img/' in content:
+            db.session.flush()  # 引用表需要投稿 id
+            sync_image_refs(submission.id, 0, content)
+        if status == "Pass":
+            bump_stamps("feed")
+        return submission
+
+    # 如果直接通过（关闭审核），提交后通知 SSE 客户端
+    try:
+        result = submit_write(PendingWrite(
+            insert_submission,
+            lambda s: {"id": s.id, "status": s.status},
+            notify=(status == "Pass")
+        ))
+    except TimeoutError as e:
+        return jsonify({"status": "Fail", "reason": str(e)}), 503
+    except PoolTimeout as e:
+        return database_busy(e)
+    except Exception as e:
+        return jsonify({"status": "Fail", "reason": str(e)}), 500
+    remember_content(("post", result["id"]), content)
+    return jsonify(result), 201
 
 @app.route('/up', methods=['POST'])
 def upvote():
@@ -489,26 +2031,40 @@ def upvote():
     data = request.get_json()
     if not data or "id" not in data:
         return jsonify({"status": "Fail", "reason": "Value ID not found"}), 400
+    post_id = parse_post_id(data["id"])
+    if post_id is None:
+        return jsonify({"status": "Fail", "reason": "Invalid ID"}), 400
+
+    # 重复投票在访问数据库之前拒绝
+    digest = vote_digest(post_id) if VOTE_DEDUP_ENABLED else None
+    if digest is not None and not vote_filter.begin(digest):
+        return jsonify({"status": "Fail", "reason": "Already voted"}), 403
+    recorded = False
+    try:
+        submission = db.session.get(Submission, post_id)
+        if not submission:
+            return jsonify({"status": "Fail", "reason": "Post not found"}), 404
 
-    submission = db.session.get(Submission, data["id"])
-    if not submission:
-        return jsonify({"status": "Fail", "reason": "Post not found"}), 404
-
-    submission.upvotes += 1
-    db.session.commit()
-    return jsonify({"status": "OK"}), 200
+        submission.upvotes += 1
+        bump_stamps(f"post:{submission.id}", "feed")
+        db.session.commit()
+        recorded = True
+        return jsonify({"status": "OK"}), 200
+    finally:
+        if digest is not None:
+            vote_filter.finish(digest, recorded)
 
 
 @app.route('/get/notice', methods=['GET'])
+@use_reader
 def get_notice():
     """公开接口：获取当前公告内容与版本"""
     try:
-        ensure_default_notice()
-        notice_data = get_current_notice()
-        # 获取显示状态，默认为开启
-        display = get_config("show_notice", "true")
-        notice_data["display"] = display
-        return jsonify(notice_data), 200
+        etag = stamp_etag("notice")
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        return with_etag(jsonify(get_cached_notice(etag)), etag), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -523,6 +2079,7 @@ def admin_notice_switch():
         if val not in ['true', 'false']:
             return jsonify({"status": "Fail", "reason": "Invalid value"}), 400
         
+        bump_stamps("notice")
         set_config("show_notice", val)
         return jsonify({"status": "OK"}), 200
     except Exception as e:
@@ -557,6 +2114,7 @@ def admin_modify_notice():
                     n.version = int(version)
                 except Exception:
                     return jsonify({"status": "Fail", "reason": "version must be integer"}), 400
+        bump_stamps("notice")
         db.session.commit()
         return jsonify({"status": "OK", "version": int(n.version)}), 200
     except Exception as e:
@@ -572,14 +2130,28 @@ def downvote():
     data = request.get_json()
     if not data or "id" not in data:
         return jsonify({"status": "Fail", "reason": "Value ID not found"}), 400
+    post_id = parse_post_id(data["id"])
+    if post_id is None:
+        return jsonify({"status": "Fail", "reason": "Invalid ID"}), 400
+
+    # 重复投票在访问数据库之前拒绝
+    digest = vote_digest(post_id) if VOTE_DEDUP_ENABLED else None
+    if digest is not None and not vote_filter.begin(digest):
+        return jsonify({"status": "Fail", "reason": "Already voted"}), 403
+    recorded = False
+    try:
+        submission = db.session.get(Submission, post_id)
+        if not submission:
+            return jsonify({"status": "Fail", "reason": "Post not found"}), 404
 
-    submission = db.session.get(Submission, data["id"])
-    if not submission:
-        return jsonify({"status": "Fail", "reason": "Post not found"}), 404
-
-    submission.downvotes += 1
-    db.session.commit()
-    return jsonify({"status": "OK"}), 200
+        submission.downvotes += 1
+        bump_stamps(f"post:{submission.id}", "feed")
+        db.session.commit()
+        recorded = True
+        return jsonify({"status": "OK"}), 200
+    finally:
+        if digest is not None:
+            vote_filter.finish(digest, recorded)
 
 @app.route('/comment', methods=['POST'])
 def post_comment():
@@ -611,18 +2183,62 @@ def post_comment():
         if not reply_comment or reply_comment.submission_id != submission_id:
             return jsonify({"id": None, "status": "Wrong_Reply"}), 400
 
-    # 创建评论
-    comment = Comment(
-        submission_id=submission_id,
-        parent_comment_id=parent_comment_id,
-        nickname=nickname,
-        content=content,
-        created_at=get_utc_now()
-    )
-    db.session.add(comment)
-    db.session.commit()
+    # 同一投稿下的重复评论
+    fingerprint = content_fingerprint(content)
+    duplicate = find_duplicate(Comment, content, fingerprint, Comment.submission_id == submission_id)
+    if duplicate is not None:
+        if DUPLICATE_POLICY == "collapse":
+            return jsonify({"id": duplicate.id, "status": "Pass"}), 200
+        return jsonify({"id": None, "status": "Deny"}), 403
+    # 评论没有待审核状态，近似重复只在达到拒绝阈值时拦截
+    if near_duplicate_action(content, near_dup_scope("comment", submission_id)) == "reject":
+        return jsonify({"id": None, "status": "Deny"}), 403
 
-    return jsonify({"id": comment.id, "status": "Pass"}), 200
+    # 创建评论；开启写入队列时检查与写入不在同一事务中，写入前在写事务内重新确认投稿与回复目标仍然存在
+    def insert_comment():
+        updated = db.session.execute(
+            update(Submission).where(Submission.id == submission_id)
+            .values(comment_count=Submission.comment_count + 1)
+        ).rowcount
+        if updated != 1:
+            raise StaleWrite({"id": None, "status": "Fail"}, 404)
+        if parent_comment_id != 0 and db.session.scalar(
+            select(Comment.submission_id).where(Comment.id == parent_comment_id)
+        ) != submission_id:
+            raise StaleWrite({"id": None, "status": "Wrong_Reply"}, 400)
+        comment = Comment(
+            submission_id=submission_id,
+            parent_comment_id=parent_comment_id,
+            nickname=nickname,
+            content=content,
+            created_at=get_utc_now(),
+            fingerprint=fingerprint
+        )
+        db.session.add(comment)
+        if '/img/' in content:
+            db.session.flush()  # 引用表需要评论 id
+            sync_image_refs(submission_id, comment.id, content)
+        bump_stamps(f"post:{submission_id}", "feed")
+        return comment
+
+    try:
+        result = submit_write(PendingWrite(insert_comment, lambda c: {"id": c.id, "status": "Pass"}))
+    except StaleWrite as e:
+        return jsonify(e.payload), e.code
+    except TimeoutError as e:
+        return jsonify({"status": "Fail", "reason": str(e)}), 503
+    except PoolTimeout as e:
+        return database_busy(e)
+    except Exception as e:
+        return jsonify({"status": "Fail", "reason": str(e)}), 500
+    remember_content(("comment", result["id"]), content, scope=near_dup_scope("comment", submission_id))
+    publish_comment_event(submission_id, "comment_added", comment={
+        "id": result["id"],
+        "nickname": nickname,
+        "content": content,
+        "parent_comment_id": parent_comment_id
+    })
+    return jsonify(result), 200
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -651,10 +2267,14 @@ def upload_pic():
     file.seek(0)
     if file_length >= MAX_FILE_SIZE:
         return jsonify({"status": "Too_Large", "url": None}), 400
+    if request.content_length is None and rate_limit_bucket() == "upload":
+        # 分块上传事先只计了 1 字节，按实际读到的大小重新计费
+        guard = guard_rate_limit(file_length, prepaid=1)
+        if guard is not None:
+            return guard
 
     ext = file.filename.rsplit('.', 1)[1].lower()
-    date_str = datetime.now().strftime("%y%m%d")
-    filename = f"{date_str}_{random_string()}.{ext}"
+    filename = new_image_filename(ext)
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     file.save(filepath)
 
@@ -662,6 +2282,233 @@ def upload_pic():
     url = f"/img/{filename}"
     return jsonify({"status": "OK", "url": url}), 201
 
+# === 分片上传 ===
+# 断点续传：init 声明文件名、大小与 sha256 → 按 offset PUT 分片写入临时文件 → finalize 校验后移入图片目录。
+# 每个上传的状态只保存在磁盘（<id>.json 元数据 + <id>.part 数据），多进程共享，不需要全局锁；
+# 分片直接流式写入文件，不在内存中拼接。超过 UPLOAD_EXPIRE 秒未活动的上传会被清理。
+# finalize 先把元数据改名为 <id>.json.finalizing 认领上传，写分片与 finalize 对数据文件加 flock 互斥，
+# 并发的第二次 finalize、finalize 期间的 PUT 得到 404，不会写入已移走的文件。
+# upload_id 的前 8 位是客户端标记，用于限制每个客户端同时进行的上传数。
+UPLOAD_TMP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'upload_tmp')
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 建议的分片大小
+UPLOAD_EXPIRE = 24 * 3600
+UPLOAD_COPY_BUFFER = 64 * 1024
+UPLOAD_MAX_OPEN = 8  # 每个客户端同时进行的分片上传数
+
+def new_image_filename(ext):
+    date_str = datetime.now().strftime("%y%m%d")
+    return f"{date_str}_{random_string()}.{ext}"
+
+# new_image_filename 生成的文件名格式，孤儿图片清理只处理这种文件
+IMAGE_FILENAME_PATTERN = re.compile(r'\d{6}_[A-Za-z0-9]{5}\.[A-Za-z0-9]+')
+
+def upload_paths(upload_id):
+    """返回 (元数据路径, 数据路径)；upload_id 非法时返回 None，防止路径穿越"""
+    if len(upload_id) != 32 or any(ch not in '0123456789abcdef' for ch in upload_id):
+        return None
+    base = os.path.join(UPLOAD_TMP_FOLDER, upload_id)
+    return f"{base}.json", f"{base}.part"
+
+def upload_client_tag():
+    """当前客户端的 upload_id 前缀"""
+    return hashlib.blake2b(get_client_ip().encode('utf-8'), digest_size=4).hexdigest()
+
+def count_open_uploads(tag):
+    try:
+        names = os.listdir(UPLOAD_TMP_FOLDER)
+    except FileNotFoundError:
+        return 0
+    return sum(1 for name in names if name.startswith(tag) and name.endswith('.part'))
+
+def lock_upload_file(f):
+    """对数据文件加排他锁，随文件关闭释放"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+def load_upload(upload_id):
+    """读取上传的元数据，不存在时返回 None"""
+    paths = upload_paths(upload_id)
+    if paths is None:
+        return None, None
+    try:
+        with open(paths[0], 'r', encoding='utf-8') as f:
+            return json.load(f), paths[1]
+    except (OSError, ValueError):
+        return None, None
+
+def upload_received(part_path):
+    try:
+        return os.path.getsize(part_path)
+    except OSError:
+        return 0
+
+@app.route('/upload_pic/init', methods=['POST'])
+def init_chunked_upload():
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get("filename", ""))
+    sha256 = str(data.get("sha256", "")).lower()
+    try:
+        size = int(data["size"])
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "size must be int"}), 400
+    if not allowed_file(filename):
+        return jsonify({"status": "Wrong_Format", "upload_id": None}), 400
+    if size <= 0 or size >= MAX_FILE_SIZE:
+        return jsonify({"status": "Too_Large", "upload_id": None}), 400
+    if len(sha256) != 64 or any(ch not in '0123456789abcdef' for ch in sha256):
+        return jsonify({"status": "Fail", "reason": "sha256 must be hex digest"}), 400
+    # 每次 init 计入 default 桶一次；upload 桶按声明大小计费，至少一个分片大小，
+    # 避免声明极小的 size 廉价地开出大量上传。分片只在重传已写入的字节时计费
+    guard = guard_rate_limit(bucket="default")
+    if guard is None and rate_limit_bucket() == "upload":
+        guard = guard_rate_limit(max(size, UPLOAD_CHUNK_SIZE))
+    if guard is not None:
+        return guard
+    tag = upload_client_tag()
+    if count_open_uploads(tag) >= UPLOAD_MAX_OPEN:
+        return jsonify({"status": "Fail", "reason": "Too many open uploads"}), 403
+
+    upload_id = tag + secrets.token_hex(12)
+    meta_path, part_path = upload_paths(upload_id)
+    os.makedirs(UPLOAD_TMP_FOLDER, exist_ok=True)
+    open(part_path, 'wb').close()
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({"ext": filename.rsplit('.', 1)[1].lower(), "size": size, "sha256": sha256}, f)
+    return jsonify({"status": "OK", "upload_id": upload_id, "chunk_size": UPLOAD_CHUNK_SIZE}), 201
+
+@app.route('/upload_pic/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """已接收的字节数，客户端断线后从该位置继续上传"""
+    meta, part_path = load_upload(upload_id)
+    if meta is None:
+        return jsonify({"status": "Fail", "reason": "Upload not found"}), 404
+    return jsonify({"status": "OK", "received": upload_received(part_path), "size": meta["size"]}), 200
+
+@app.route('/upload_pic/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    """写入一个分片：?offset=N，请求体为分片数据。offset 不能超过已接收的字节数（允许重传已写入的部分）"""
+    meta, part_path = load_upload(upload_id)
+    if meta is None:
+        return jsonify({"status": "Fail", "reason": "Upload not found"}), 404
+    offset = request.args.get("offset", type=int)
+    length = request.content_length
+    if offset is None or offset < 0 or length is None:
+        return jsonify({"status": "Fail", "reason": "offset and Content-Length required"}), 400
+    if offset > upload_received(part_path):
+        return jsonify({"status": "Fail", "reason": "offset beyond received data"}), 409
+    if offset + length > meta["size"]:
+        return jsonify({"status": "Too_Large", "reason": "Chunk exceeds declared size"}), 400
+    # 正常的分片已在 init 时按声明大小计费，重传已写入的字节另计（未设置 upload 桶时按次计入 default 桶）
+    resent = max(min(upload_received(part_path), offset + length) - offset, 0)
+    if resent:
+        guard = guard_rate_limit(resent, bucket="upload")
+        if guard is not None:
+            return guard
+
+    # 按块从请求流复制到文件对应位置，不整体读入内存
+    try:
+        with open(part_path, 'r+b') as f:
+            lock_upload_file(f)
+            # 等锁期间上传可能已被 finalize 认领或删除
+            if not os.path.exists(upload_paths(upload_id)[0]):
+                return jsonify({"status": "Fail", "reason": "Upload not found"}), 404
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                block = request.stream.read(min(UPLOAD_COPY_BUFFER, remaining))
+                if not block:
+                    break
+                f.write(block)
+                remaining -= len(block)
+    except FileNotFoundError:
+        return jsonify({"status": "Fail", "reason": "Upload not found"}), 404
+    return jsonify({"status": "OK", "received": upload_received(part_path)}), 200
+
+@app.route('/upload_pic/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    """校验大小、哈希、扩展名后移入图片目录，返回与 /upload_pic 相同的结果"""
+    meta, part_path = load_upload(upload_id)
+    if meta is None:
+        return jsonify({"status": "Fail", "url": None}), 404
+    # 改名认领：并发的 finalize 中只有一个能成功，其余得到 404
+    meta_path = upload_paths(upload_id)[0]
+    try:
+        os.rename(meta_path, meta_path + '.finalizing')
+    except FileNotFoundError:
+        return jsonify({"status": "Fail", "url": None}), 404
+
+    def release():
+        """未完成的上传交还给客户端，可以继续上传后再次 finalize"""
+        os.rename(meta_path + '.finalizing', meta_path)
+
+    try:
+        with open(part_path, 'rb') as f:
+            lock_upload_file(f)
+            received = upload_received(part_path)
+            if received != meta["size"]:
+                release()
+                return jsonify({"status": "Incomplete", "url": None, "received": received}), 409
+            # 配置可能在上传期间变化，按当前配置重新检查
+            if meta["ext"] not in ALLOWED_EXTENSIONS:
+                discard_upload(upload_id)
+                return jsonify({"status": "Wrong_Format", "url": None}), 400
+            if received >= MAX_FILE_SIZE:
+                discard_upload(upload_id)
+                return jsonify({"status": "Too_Large", "url": None}), 400
+            digest = hashlib.sha256()
+            for block in iter(lambda: f.read(UPLOAD_COPY_BUFFER), b''):
+                digest.update(block)
+            if digest.hexdigest() != meta["sha256"]:
+                release()
+                return jsonify({"status": "Hash_Mismatch", "url": None}), 400
+
+            filename = new_image_filename(meta["ext"])
+            shutil.move(part_path, os.path.join(UPLOAD_FOLDER, filename))
+            discard_upload(upload_id)
+    except FileNotFoundError:
+        discard_upload(upload_id)
+        return jsonify({"status": "Fail", "url": None}), 404
+    return jsonify({"status": "OK", "url": f"/img/{filename}"}), 201
+
+@app.route('/upload_pic/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    if load_upload(upload_id)[0] is None:
+        return jsonify({"status": "Fail", "reason": "Upload not found"}), 404
+    discard_upload(upload_id)
+    return jsonify({"status": "OK"}), 200
+
+def discard_upload(upload_id):
+    paths = upload_paths(upload_id)
+    for path in (paths[0], paths[0] + '.finalizing', paths[1]) if paths else ():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def collect_stale_uploads():
+    """删除超过 UPLOAD_EXPIRE 秒没有新分片写入的上传（以数据文件的修改时间为准）"""
+    cutoff = time.time() - UPLOAD_EXPIRE
+    try:
+        names = os.listdir(UPLOAD_TMP_FOLDER)
+    except FileNotFoundError:
+        return
+    for name in names:
+        # 进程在 finalize 中途退出时留下的 .json.finalizing 也按过期清理
+        upload_id, _, ext = name.partition('.')
+        if ext not in ('json', 'json.finalizing'):
+            continue
+        meta_path, part_path = upload_paths(upload_id) or (None, None)
+        if meta_path is None:
+            continue
+        try:
+            last_active = max(os.path.getmtime(os.path.join(UPLOAD_TMP_FOLDER, name)), os.path.getmtime(part_path) if os.path.exists(part_path) else 0)
+        except OSError:
+            continue
+        if last_active < cutoff:
+            discard_upload(upload_id)
+
+register_maintenance(collect_stale_uploads, 600)
+
 
 @app.route('/img/<filename>', methods=['GET'])
 def serve_image(filename):
@@ -691,29 +2538,39 @@ def submit_report():
     if not submission:
         return jsonify({"status": "Fail", "reason": "Post not found"}), 404
 
-    report = Report(
-        submission_id=data["id"],
-        title=data["title"].strip(),
-        content=data["content"].strip(),
-        status="Pending",  # 投诉默认Pending
-        created_at=get_utc_now()
-    )
+    def insert_report():
+        if db.session.scalar(select(Submission.id).where(Submission.id == data["id"])) is None:
+            raise StaleWrite({"status": "Fail", "reason": "Post not found"}, 404)
+        report = Report(
+            submission_id=data["id"],
+            title=data["title"].strip(),
+            content=data["content"].strip(),
+            status="Pending",  # 投诉默认Pending
+            created_at=get_utc_now()
+        )
+        db.session.add(report)
+        return report
 
     try:
-        db.session.add(report)
-        db.session.commit()
-        return jsonify({"id": report.id, "status": "OK"}), 201
+        result = submit_write(PendingWrite(insert_report, lambda r: {"id": r.id, "status": "OK"}))
+        return jsonify(result), 201
+    except StaleWrite as e:
+        return jsonify(e.payload), e.code
+    except TimeoutError as e:
+        return jsonify({"status": "Fail", "reason": str(e)}), 503
+    except PoolTimeout as e:
+        return database_busy(e)
     except Exception as e:
-        db.session.rollback()
         return jsonify({"status": "Fail", "reason": str(e)}), 500
 
 @app.route('/get/post_state', methods=['GET'])
+@use_reader
 def get_post_state():
     post_id = request.args.get("id")
     if not post_id:
         return jsonify({"status": "Fail", "reason": "ID not provided"}), 400
 
-    submission = db.session.get(Submission, post_id)
+    submission = get_submission_any(post_id)
     if not submission:
         return jsonify({"status": "Deleted or Not Found"}), 200
 
@@ -725,6 +2582,7 @@ def get_post_state():
         return jsonify({"status": "Pending"}), 200
 
 @app.route('/get/report_state', methods=['GET'])
+@use_reader
 def get_report_state():
     report_id = request.args.get("id")
     if not report_id:
@@ -743,31 +2601,39 @@ def get_report_state():
 
 
 @app.route('/get/post_info', methods=['GET'])
+@use_reader
 def get_post_info():
     post_id = request.args.get("id", type=int)
     if not post_id:
         return jsonify({"status": "Fail", "reason": "ID missing"}), 400
 
-    submission = db.session.get(Submission, post_id)
+    etag = stamp_etag(f"post:{post_id}")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    submission = get_submission_any(post_id)
     if not submission or submission.status != "Pass":
         return jsonify({"status": "Fail", "reason": "Not found"}), 404
 
-    return jsonify({
+    return with_etag(jsonify({
         "id": submission.id,
         "content": submission.content,
         "upvotes": submission.upvotes,
-        "downvotes": submission.downvotes
-    }), 200
+        "downvotes": submission.downvotes,
+        "comment_count": submission.comment_count
+    }), etag), 200
 
 
 @app.route('/admin/get/post_info', methods=['GET'])
 @require_admin
+@use_reader
 def get_admin_post_info():
     post_id = request.args.get("id", type=int)
     if not post_id:
         return jsonify({"status": "Fail", "reason": "ID missing"}), 400
 
-    submission = db.session.get(Submission, post_id)
+    submission = get_submission_any(post_id)
     if not submission:
         return jsonify({"status": "Fail", "reason": "Not found"}), 404
 
@@ -783,60 +2649,65 @@ def get_admin_post_info():
 
 
 @app.route('/get/comment', methods=['GET'])
+@use_reader
 def get_comments():
     post_id = request.args.get("id", type=int)
     if not post_id:
         return jsonify({"status": "Fail", "reason": "ID missing"}), 400
 
-    submission = db.session.get(Submission, post_id)
+    etag = stamp_etag(f"post:{post_id}")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    submission = get_submission_any(post_id)
     if not submission or submission.status != "Pass":
         return jsonify({"status": "Fail", "reason": "Post not found"}), 404
 
-    def serialize_comment(comment):
-        return {
-            "id": comment.id,
-            "nickname": comment.nickname,
-            "content": comment.content,
-            "parent_comment_id": comment.parent_comment_id
-        }
-
-    comments = [serialize_comment(c) for c in submission.comments]
-    return jsonify(comments), 200
+    if isinstance(submission, ArchivedSubmission):
+        comments = [serialize_comment(c) for c in ArchivedComment.query.filter_by(submission_id=post_id)]
+    else:
+        comments = [serialize_comment(c) for c in submission.comments]
+    return with_etag(jsonify(comments), etag), 200
 
 
 @app.route('/get/10_info', methods=['GET'])
+@use_reader
 def get_10_info():
     page = request.args.get("page", 1, type=int)
     if page < 1:
         page = 1
 
-    per_page = 10
-    # 排序 id 从大到小
-    all_posts = Submission.query.order_by(Submission.id.desc()).all()
-    result = []
+    etag = stamp_etag("feed")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
-    for submission in all_posts:
-        if submission.status == "Pass":
-            result.append(submission)
-        if len(result) >= page * per_page:
-            break
-
-    start = (page - 1) * per_page
-    end = start + per_page
-    page_posts = result[start:end]
-
-    return jsonify([{
+    per_page = 10
+    # 排序 id 从大到小，单条查询走 (status, id) 索引；评论数取自冗余列，无需逐条统计
+    page_posts = db.session.scalars(
+        select(Submission)
+        .where(Submission.status == "Pass")
+        .order_by(Submission.id.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+    ).all()
+
+    return with_etag(jsonify([{
         "id": s.id,
         "content": s.content,
         "upvotes": s.upvotes,
-        "downvotes": s.downvotes
-    } for s in page_posts]), 200
+        "downvotes": s.downvotes,
+        "comment_count": s.comment_count
+    } for s in page_posts]), etag), 200
 
 
 @app.route('/get/statics', methods=['GET'])
+@use_reader
 def get_statics():
-    num_posts = Submission.query.count()
-    num_comments = Comment.query.count()
+    archived_posts, archived_comments = get_archive_counts()
+    num_posts = Submission.query.count() + archived_posts
+    num_comments = Comment.query.count() + archived_comments
     num_images = len(os.listdir('img')) if os.path.exists('img') else 0
 
     return jsonify({
@@ -872,13 +2743,332 @@ def toggle_audit():
 
 @app.route('/admin/get/need_audit', methods=['GET'])
 @require_admin
+@use_reader
 def get_need_audit():
     global NEED_AUDIT
     return jsonify({"status": NEED_AUDIT}), 200
 
+@app.route('/admin/write_queue', methods=['POST'])
+@require_admin
+def admin_write_queue():
+    """管理员接口：开关批量写入队列并设置批大小与等待时间"""
+    global WRITE_QUEUE_ENABLED, WRITE_BATCH_SIZE, WRITE_BATCH_MS
+    data = request.get_json() or {}
+    enabled = data.get("enabled", WRITE_QUEUE_ENABLED)
+    if not isinstance(enabled, bool):
+        return jsonify({"status": "Fail", "reason": "enabled must be bool"}), 400
+    try:
+        batch_size = int(data.get("batch_size", WRITE_BATCH_SIZE))
+        batch_ms = float(data.get("batch_ms", WRITE_BATCH_MS))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "batch_size and batch_ms must be numbers"}), 400
+    if batch_size < 1 or batch_ms < 0:
+        return jsonify({"status": "Fail", "reason": "batch_size must be >= 1 and batch_ms >= 0"}), 400
+
+    set_config("write_queue", str(enabled).lower())
+    set_config("write_batch_size", batch_size)
+    set_config("write_batch_ms", batch_ms)
+    WRITE_QUEUE_ENABLED = enabled
+    WRITE_BATCH_SIZE = batch_size
+    WRITE_BATCH_MS = batch_ms
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/write_queue', methods=['GET'])
+@require_admin
+@use_reader
+def get_write_queue():
+    return jsonify({
+        "enabled": WRITE_QUEUE_ENABLED,
+        "batch_size": WRITE_BATCH_SIZE,
+        "batch_ms": WRITE_BATCH_MS,
+        "queued": write_queue.qsize(),
+        "batches": write_stats["batches"],
+        "rows": write_stats["rows"]
+    }), 200
+
+@app.route('/admin/admission', methods=['POST'])
+@require_admin
+def admin_admission():
+    """管理员接口：设置各类别的并发上限与排队时间，如 {"read": {"limit": 48, "wait": 0.5}}（limit 0 为不限制）；
+    "pool": {"threads": 64, "admin_reserve": 4} 设置工作线程数（写入 config.json，0 为关闭）与管理端预留线程数
+    """
+    global ADMISSION_ADMIN_RESERVE
+    data = request.get_json() or {}
+    pool = data.pop("pool", None)
+    threads, admin_reserve = ADMISSION_THREADS, ADMISSION_ADMIN_RESERVE
+    if pool is not None:
+        if not isinstance(pool, dict):
+            return jsonify({"status": "Fail", "reason": "pool must be object"}), 400
+        try:
+            threads = int(pool.get("threads", threads))
+            admin_reserve = int(pool.get("admin_reserve", admin_reserve))
+        except Exception:
+            return jsonify({"status": "Fail", "reason": "threads and admin_reserve must be int"}), 400
+        if admin_reserve < 1 or threads < 0 or (threads and threads <= admin_reserve):
+            return jsonify({"status": "Fail", "reason": "Need threads = 0 or threads > admin_reserve >= 1"}), 400
+    updates = {}
+    for name, value in data.items():
+        cls = ADMISSION_CLASSES.get(name)
+        if cls is None or not isinstance(value, dict):
+            return jsonify({"status": "Fail", "reason": f"Unknown class {name}"}), 400
+        try:
+            limit = int(value.get("limit", cls.limit))
+            wait = float(value.get("wait", cls.wait))
+        except Exception:
+            return jsonify({"status": "Fail", "reason": "limit and wait must be numbers"}), 400
+        if limit < 0 or wait < 0:
+            return jsonify({"status": "Fail", "reason": "limit and wait must be >= 0"}), 400
+        if wait > ADMISSION_MAX_WAIT:
+            return jsonify({"status": "Fail", "reason": f"wait must be <= {ADMISSION_MAX_WAIT}"}), 400
+        updates[name] = (limit, wait)
+    if pool is not None:
+        set_config("admission_admin_reserve", admin_reserve)
+        ADMISSION_ADMIN_RESERVE = admin_reserve
+        if threads != ADMISSION_THREADS:
+            # 线程数属于部署配置，写入配置文件，其他进程通过热重载同步
+            write_config(ADMISSION_THREADS=threads)
+            load_config(force=True)
+    for name, (limit, wait) in updates.items():
+        set_config(f"admission_{name}_limit", limit)
+        set_config(f"admission_{name}_wait", wait)
+        cls = ADMISSION_CLASSES[name]
+        with cls.cond:
+            cls.limit = limit
+            cls.wait = wait
+            cls.cond.notify_all()
+    refresh_admission_limited()
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/admission', methods=['GET'])
+@require_admin
+@use_reader
+def get_admission():
+    result = {
+        name: {"limit": cls.limit, "wait": cls.wait, "active": cls.active, "shed": cls.shed}
+        for name, cls in ADMISSION_CLASSES.items()
+    }
+    result["pool"] = {
+        "threads": ADMISSION_THREADS,
+        "admin_reserve": ADMISSION_ADMIN_RESERVE,
+        "capacity": public_thread_capacity(),
+        **admission_stats
+    }
+    return jsonify(result), 200
+
+@app.route('/admin/duplicate_filter', methods=['POST'])
+@require_admin
+def admin_duplicate_filter():
+    """管理员接口：设置重复内容检测窗口（秒，0 为关闭）与处理方式"""
+    global DUPLICATE_WINDOW, DUPLICATE_POLICY
+    data = request.get_json() or {}
+    try:
+        window = int(data.get("window", DUPLICATE_WINDOW))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "window must be int"}), 400
+    policy = str(data.get("policy", DUPLICATE_POLICY)).lower()
+    if window < 0:
+        return jsonify({"status": "Fail", "reason": "window must be >= 0"}), 400
+    if policy not in ["reject", "collapse"]:
+        return jsonify({"status": "Fail", "reason": "policy must be 'reject' or 'collapse'"}), 400
+
+    set_config("duplicate_window", window)
+    set_config("duplicate_policy", policy)
+    DUPLICATE_WINDOW = window
+    DUPLICATE_POLICY = policy
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/duplicate_filter', methods=['GET'])
+@require_admin
+@use_reader
+def get_duplicate_filter():
+    return jsonify({"window": DUPLICATE_WINDOW, "policy": DUPLICATE_POLICY}), 200
+
+@app.route('/admin/near_duplicate', methods=['POST'])
+@require_admin
+def admin_near_duplicate():
+    """管理员接口：设置近似重复检测开关与 Jaccard 距离阈值（0~1）"""
+    global NEAR_DUP_ENABLED, NEAR_DUP_REJECT_DISTANCE, NEAR_DUP_PENDING_DISTANCE
+    data = request.get_json() or {}
+    enabled = data.get("enabled", NEAR_DUP_ENABLED)
+    if not isinstance(enabled, bool):
+        return jsonify({"status": "Fail", "reason": "enabled must be bool"}), 400
+    try:
+        reject_distance = float(data.get("reject_distance", NEAR_DUP_REJECT_DISTANCE))
+        pending_distance = float(data.get("pending_distance", NEAR_DUP_PENDING_DISTANCE))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "Distances must be numbers"}), 400
+    if not (0 <= reject_distance <= pending_distance <= 1):
+        return jsonify({"status": "Fail", "reason": "Require 0 <= reject_distance <= pending_distance <= 1"}), 400
+
+    set_config("near_dup_enabled", str(enabled).lower())
+    set_config("near_dup_reject_distance", reject_distance)
+    set_config("near_dup_pending_distance", pending_distance)
+    was_enabled = NEAR_DUP_ENABLED
+    NEAR_DUP_ENABLED = enabled
+    NEAR_DUP_REJECT_DISTANCE = reject_distance
+    NEAR_DUP_PENDING_DISTANCE = pending_distance
+    if enabled and not was_enabled:
+        rebuild_near_duplicate_index()
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/near_duplicate', methods=['GET'])
+@require_admin
+@use_reader
+def get_near_duplicate():
+    return jsonify({
+        "enabled": NEAR_DUP_ENABLED,
+        "reject_distance": NEAR_DUP_REJECT_DISTANCE,
+        "pending_distance": NEAR_DUP_PENDING_DISTANCE,
+        "window": NEAR_DUP_WINDOW,
+        "entries": len(near_dup_index.sketches)
+    }), 200
+
+@app.route('/admin/vote_dedup', methods=['POST'])
+@require_admin
+def admin_vote_dedup():
+    """管理员接口：设置投票去重开关、每代容量与轮换窗口（秒）；修改容量会清空已记录的投票"""
+    global VOTE_DEDUP_ENABLED
+    data = request.get_json() or {}
+    enabled = data.get("enabled", VOTE_DEDUP_ENABLED)
+    if not isinstance(enabled, bool):
+        return jsonify({"status": "Fail", "reason": "enabled must be bool"}), 400
+    try:
+        capacity = int(data.get("capacity", VOTE_FILTER_CAPACITY))
+        window = int(data.get("window", VOTE_FILTER_WINDOW))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "capacity and window must be int"}), 400
+    if not (1000 <= capacity <= VOTE_FILTER_MAX_CAPACITY):
+        return jsonify({"status": "Fail", "reason": f"capacity must be between 1000 and {VOTE_FILTER_MAX_CAPACITY}"}), 400
+    if window < 3600:
+        return jsonify({"status": "Fail", "reason": "window must be >= 3600"}), 400
+
+    set_config("vote_dedup_enabled", str(enabled).lower())
+    set_config("vote_dedup_capacity", capacity)
+    set_config("vote_dedup_window", window)
+    VOTE_DEDUP_ENABLED = enabled
+    configure_vote_filter(capacity, window)
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/vote_dedup', methods=['GET'])
+@require_admin
+@use_reader
+def get_vote_dedup():
+    return jsonify({
+        "enabled": VOTE_DEDUP_ENABLED,
+        "capacity": VOTE_FILTER_CAPACITY,
+        "window": VOTE_FILTER_WINDOW,
+        "error_rate": VOTE_FILTER_ERROR_RATE,
+        "current": vote_filter.current.count,
+        "previous": vote_filter.previous.count
+    }), 200
+
+@app.route('/admin/sql_profile', methods=['POST'])
+@require_admin
+def admin_sql_profile():
+    """管理员接口：开关 SQL 性能分析并设置慢请求阈值"""
+    global SQL_PROFILE_ENABLED, SQL_PROFILE_MAX_QUERIES, SQL_PROFILE_MAX_MS
+    data = request.get_json() or {}
+    enabled = data.get("enabled")
+    if enabled is not None and not isinstance(enabled, bool):
+        return jsonify({"status": "Fail", "reason": "enabled must be bool"}), 400
+    try:
+        max_queries = int(data.get("max_queries", SQL_PROFILE_MAX_QUERIES))
+        max_ms = float(data.get("max_ms", SQL_PROFILE_MAX_MS))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "max_queries and max_ms must be numbers"}), 400
+    if max_queries < 0 or max_ms < 0:
+        return jsonify({"status": "Fail", "reason": "Thresholds must be >= 0"}), 400
+
+    if enabled is not None:
+        SQL_PROFILE_ENABLED = enabled
+    SQL_PROFILE_MAX_QUERIES = max_queries
+    SQL_PROFILE_MAX_MS = max_ms
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/sql_profile', methods=['GET'])
+@require_admin
+@use_reader
+def get_sql_profile():
+    """管理员接口：查看 SQL 性能分析状态与最近的慢请求"""
+    return jsonify({
+        "enabled": SQL_PROFILE_ENABLED,
+        "max_queries": SQL_PROFILE_MAX_QUERIES,
+        "max_ms": SQL_PROFILE_MAX_MS,
+        "slow_requests": list(SLOW_REQUESTS)
+    }), 200
+
+@app.route('/admin/mem_profile', methods=['POST'])
+@require_admin
+def admin_mem_profile():
+    """管理员接口：开关 tracemalloc，或记录当前快照作为后续对比的基准"""
+    global MEM_PROFILE_FRAMES, mem_profile_baseline
+    data = request.get_json() or {}
+    enabled = data.get("enabled")
+    if enabled is not None and not isinstance(enabled, bool):
+        return jsonify({"status": "Fail", "reason": "enabled must be bool"}), 400
+    try:
+        frames = int(data.get("frames", MEM_PROFILE_FRAMES))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "frames must be int"}), 400
+    if frames < 1:
+        return jsonify({"status": "Fail", "reason": "frames must be >= 1"}), 400
+
+    with mem_profile_lock:
+        if enabled is False:
+            tracemalloc.stop()
+            mem_profile_baseline = None
+        elif enabled and (not tracemalloc.is_tracing() or frames != MEM_PROFILE_FRAMES):
+            # 调用栈深度只能在启动时设置，修改时重新开始追踪
+            tracemalloc.stop()
+            tracemalloc.start(frames)
+            mem_profile_baseline = None
+        MEM_PROFILE_FRAMES = frames
+        if data.get("snapshot"):
+            if not tracemalloc.is_tracing():
+                return jsonify({"status": "Fail", "reason": "Profiling not enabled"}), 400
+            mem_profile_baseline = take_mem_snapshot()
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/mem_profile', methods=['GET'])
+@require_admin
+@use_reader
+def get_mem_profile():
+    """管理员接口：查看内存占用。
+    参数：limit 返回的分配位置数量；group_by 为 lineno/filename/traceback；objects=N 附带对象数量最多的 N 个类型
+    """
+    try:
+        limit = int(request.args.get("limit", MEM_PROFILE_LIMIT))
+        objects = int(request.args.get("objects", 0))
+    except ValueError:
+        return jsonify({"status": "Fail", "reason": "limit and objects must be int"}), 400
+    group_by = request.args.get("group_by", "lineno")
+    if group_by not in ("lineno", "filename", "traceback"):
+        return jsonify({"status": "Fail", "reason": "group_by must be lineno, filename or traceback"}), 400
+
+    result = {
+        "enabled": tracemalloc.is_tracing(),
+        "frames": MEM_PROFILE_FRAMES,
+        "rss": process_rss(),
+        "gc_counts": gc.get_count(),
+        "structures": memory_structures(),
+    }
+    if objects > 0:
+        result["object_types"] = top_object_types(objects)
+    with mem_profile_lock:
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = take_mem_snapshot()
+            result["traced"] = {"current": current, "peak": peak}
+            result["top"] = [format_stat(stat) for stat in snapshot.statistics(group_by)[:limit]]
+            if mem_profile_baseline is not None:
+                diff = snapshot.compare_to(mem_profile_baseline, group_by)
+                result["diff"] = [format_stat(stat) for stat in diff[:limit]]
+    return jsonify(result), 200
+
 # 动态敏感词配置
 @app.route('/admin/get/banned_keywords', methods=['GET'])
 @require_admin
+@use_reader
 def get_banned_keywords():
     return jsonify({"keywords": BANNED_KEYWORDS}), 200
 
@@ -900,8 +3090,46 @@ def set_banned_keywords():
     BANNED_KEYWORDS = new_keywords
     try:
         # 重写配置文件，确保重启后仍生效
-        write_config_py(ADMIN_TOKEN_HASH, UPLOAD_FOLDER, list(ALLOWED_EXTENSIONS), MAX_FILE_SIZE, BANNED_KEYWORDS)
-        load_config()
+        write_config(BANNED_KEYWORDS=BANNED_KEYWORDS)
+        load_config(force=True)
+        return jsonify({"status": "OK"}), 200
+    except Exception as e:
+        return jsonify({"status": "Fail", "reason": str(e)}), 500
+
+# 动态限流配置
+@app.route('/admin/get/rate_limit', methods=['GET'])
+@require_admin
+@use_reader
+def get_rate_limit():
+    return jsonify({
+        "RATE_LIMIT": RATE_LIMIT,
+        "RATE_LIMIT_BUCKETS": RATE_LIMIT_BUCKETS,
+        "RATE_LIMIT_COSTS": RATE_LIMIT_COSTS
+    }), 200
+
+@app.route('/admin/rate_limit', methods=['POST'])
+@require_admin
+def set_rate_limit():
+    """管理员接口：修改 default 桶额度 RATE_LIMIT、各桶额度与路由权重（只需提供要修改的项）"""
+    data = request.get_json() or {}
+    values = {}
+    try:
+        if "RATE_LIMIT" in data:
+            values["RATE_LIMIT"] = int(data["RATE_LIMIT"])
+            if values["RATE_LIMIT"] < 0:
+                return jsonify({"status": "Fail", "reason": "RATE_LIMIT must be >= 0"}), 400
+        if "RATE_LIMIT_BUCKETS" in data:
+            values["RATE_LIMIT_BUCKETS"] = normalize_rate_limit_map(data["RATE_LIMIT_BUCKETS"], RATE_LIMIT_BUCKETS)
+        if "RATE_LIMIT_COSTS" in data:
+            values["RATE_LIMIT_COSTS"] = normalize_rate_limit_map(data["RATE_LIMIT_COSTS"], RATE_LIMIT_COSTS)
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "Values must be int >= 0"}), 400
+    if not values:
+        return jsonify({"status": "Fail", "reason": "Nothing to update"}), 400
+    try:
+        # 写入配置文件，其他进程通过热重载同步
+        write_config(**values)
+        load_config(force=True)
         return jsonify({"status": "OK"}), 200
     except Exception as e:
         return jsonify({"status": "Fail", "reason": str(e)}), 500
@@ -958,8 +3186,15 @@ def admin_delete_comment():
         return jsonify({"status": "Fail", "reason": "Comment not found"}), 404
 
     try:
-        db.session.delete(comment)
+        submission_id = comment.submission_id
+        deleted_ids = delete_comment_tree(comment.id)
+        db.session.execute(
+            update(Submission).where(Submission.id == submission_id)
+            .values(comment_count=Submission.comment_count - len(deleted_ids))
+        )
+        bump_stamps(f"post:{submission_id}", "feed")
         db.session.commit()
+        publish_comment_event(submission_id, "comment_deleted", ids=deleted_ids)
         return jsonify({"status": "OK"}), 200
     except Exception as e:
         db.session.rollback()
@@ -990,9 +3225,14 @@ def admin_modify_comment():
     # --- 执行修改 ---
     try:
         comment.content = new_content
+        comment.fingerprint = content_fingerprint(new_content)
         comment.parent_comment_id = new_parent_id
         comment.nickname = new_nickname
+        sync_image_refs(comment.submission_id, comment.id, new_content)
+        bump_stamps(f"post:{comment.submission_id}")
+        payload = serialize_comment(comment)
         db.session.commit()
+        publish_comment_event(comment.submission_id, "comment_edited", comment=payload)
         return jsonify({"status": "OK"}), 200
     except Exception as e:
         db.session.rollback()
@@ -1005,13 +3245,15 @@ def admin_del_post():
     if not data or "id" not in data:
         return jsonify({"status": "Fail", "reason": "Value ID not found"}), 400
 
-    submission = db.session.get(Submission, data["id"])
+    submission = get_submission_any(data["id"])
     if not submission:
         return jsonify({"status": "Fail", "reason": "Post not found"}), 404
 
     try:
-        db.session.delete(submission)
+        submission_id = submission.id
+        delete_submission_tree(submission_id)
         db.session.commit()
+        publish_post_state(submission_id, None)
         return jsonify({"status": "OK"}), 200
     except Exception as e:
         db.session.rollback()
@@ -1030,7 +3272,10 @@ def admin_modify_post():
         return jsonify({"status": "Fail", "reason": "Post not found"}), 404
 
     submission.content = data["content"].strip()
+    submission.fingerprint = content_fingerprint(submission.content)
     submission.updated_at = get_utc_now()
+    sync_image_refs(submission.id, 0, submission.content)
+    bump_stamps(f"post:{submission.id}", "feed")
     db.session.commit()
 
     return jsonify({"status": "OK"}), 200
@@ -1050,6 +3295,8 @@ def admin_del_pic():
 
     try:
         os.remove(file_path)
+        db.session.execute(delete(ImageRef).where(ImageRef.filename == filename))
+        db.session.commit()
         return jsonify({"status": "OK"}), 200
     except Exception as e:
         return jsonify({"status": "Fail", "reason": str(e)}), 500
@@ -1066,15 +3313,15 @@ def approve_report():
         return jsonify({"status": "Fail", "reason": "Report not found"}), 404
 
     try:
-        # 先将投诉状态标记为 Pass
+        # 投诉状态标记为 Pass 与删除文章及其所有评论在同一事务中提交
         report.status = "Pass"
-        db.session.commit()  # <- 先提交状态
-
-        # 删除文章及其所有评论
-        submission = db.session.get(Submission, report.submission_id)
-        if submission:
-            db.session.delete(submission)
-            db.session.commit()
+        report_id, submission_id = report.id, report.submission_id
+        if submission_id is not None:
+            delete_submission_tree(submission_id)
+        db.session.commit()
+        publish_report_state(report_id, "Pass")
+        if submission_id is not None:
+            publish_post_state(submission_id, None)
 
         return jsonify({"status": "OK"}), 200
     except Exception as e:
@@ -1097,11 +3344,454 @@ def reject_report():
     try:
         report.status = "Deny"
         db.session.commit()
+        publish_report_state(report.id, "Deny")
         return jsonify({"status": "OK"}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"status": "Fail", "reason": str(e)}), 500
     
+# === 数据导出 ===
+# 以 NDJSON 流式导出投稿、评论与投诉，每行一个对象，"type" 字段区分类型；
+# 服务端游标分批读取（yield_per），内存占用与表大小无关。已归档的数据一并导出并标记 archived。
+EXPORT_BATCH_SIZE = 1000
+
+def export_post(row, archived):
+    return {
+        "type": "post",
+        "id": row.id,
+        "content": row.content,
+        "status": row.status,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        "upvotes": row.upvotes,
+        "downvotes": row.downvotes,
+        "comment_count": row.comment_count,
+        "archived": archived
+    }
+
+def export_comment(row, archived):
+    return {
+        "type": "comment",
+        "id": row.id,
+        "submission_id": row.submission_id,
+        "parent_comment_id": row.parent_comment_id,
+        "nickname": row.nickname,
+        "content": row.content,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "archived": archived
+    }
+
+def export_report(row, archived):
+    return {
+        "type": "report",
+        "id": row.id,
+        "submission_id": row.submission_id,
+        "title": row.title,
+        "content": row.content,
+        "status": row.status,
+        "created_at": row.created_at.isoformat() if row.created_at else None
+    }
+
+# 类型 -> (序列化函数, [(模型, 是否归档)])
+EXPORT_SOURCES = {
+    "posts": (export_post, [(Submission, False), (ArchivedSubmission, True)]),
+    "comments": (export_comment, [(Comment, False), (ArchivedComment, True)]),
+    "reports": (export_report, [(Report, False)]),
+}
+
+def export_source_rows(model, archived, after_id, until_id, since):
+    """按 id 升序逐行读取一个数据源，返回 (id, 行, 是否已归档)"""
+    table = model.__table__
+    stmt = select(table).order_by(table.c.id)
+    if after_id is not None:
+        stmt = stmt.where(table.c.id > after_id)
+    if until_id is not None:
+        stmt = stmt.where(table.c.id <= until_id)
+    if since is not None:
+        # 投稿按更新时间增量导出，评论与投诉没有更新时间，按创建时间
+        column = table.c.updated_at if 'updated_at' in table.c else table.c.created_at
+        stmt = stmt.where(column >= since)
+    for row in db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+        yield row.id, row, archived
+
+def export_lines(kinds, after_id=None, until_id=None, since=None):
+    """按类型依次导出，每批 EXPORT_BATCH_SIZE 行拼成一个 NDJSON 块。
+    同一类型的热表与归档表按 id 归并，保证输出按 id 递增，最后一个 id 可作为 after_id 续传
+    """
+    for kind in kinds:
+        serialize, sources = EXPORT_SOURCES[kind]
+        merged = heapq.merge(*(export_source_rows(model, archived, after_id, until_id, since)
+                               for model, archived in sources),
+                             key=operator.itemgetter(0))
+        while True:
+            batch = list(itertools.islice(merged, EXPORT_BATCH_SIZE))
+            if not batch:
+                break
+            yield ''.join(app.json.dumps(serialize(row, archived)) + '\n' for _, row, archived in batch).encode('utf-8')
+
+@app.route('/admin/export', methods=['GET'])
+@require_admin
+@use_reader
+def admin_export():
+    """管理员接口：流式导出 NDJSON。
+    参数：type=posts,comments,reports（默认全部）、after_id / until_id（id 范围，after_id 不含）、
+    since（ISO 时间，投稿按 updated_at，其余按 created_at）、gzip=1（下载 .ndjson.gz）
+    """
+    kinds = [k.strip() for k in request.args.get("type", ",".join(EXPORT_SOURCES)).split(',') if k.strip()]
+    unknown = [k for k in kinds if k not in EXPORT_SOURCES]
+    if not kinds or unknown:
+        return jsonify({"status": "Fail", "reason": f"type must be within {', '.join(EXPORT_SOURCES)}"}), 400
+    after_id = request.args.get("after_id", type=int)
+    until_id = request.args.get("until_id", type=int)
+    since = request.args.get("since")
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({"status": "Fail", "reason": "since must be ISO 8601 datetime"}), 400
+        # 数据库中保存的是不带时区的 UTC 时间
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    use_gzip = request.args.get("gzip", "0").lower() in ("1", "true")
+
+    def generate():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None  # wbits=31 为 gzip 格式
+        for chunk in export_lines(kinds, after_id, until_id, since or None):
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor is not None:
+            yield compressor.flush()
+
+    filename = f"export_{datetime.now().strftime('%y%m%d_%H%M%S')}.ndjson"
+    if use_gzip:
+        response = Response(stream_with_context(generate()), mimetype='application/gzip')
+        filename += '.gz'
+    else:
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# === 数据导入 ===
+# 批量导入 NDJSON（格式与 /admin/export 相同，按 "type" 区分 post / comment / report）：
+# 每 IMPORT_BATCH_SIZE 行在一个事务中 executemany 插入，导入的数据分配新的 id，
+# 评论的 submission_id / parent_comment_id 与投诉的 submission_id 按旧 id -> 新 id 映射改写，
+# 因此被引用的投稿、评论须出现在引用它的行之前（导出文件按 id 排序，满足该条件）。
+# 评论数、近似重复索引和统计信息在全部写入后统一重建；可选先删除二级索引，导入完成后重建。
+IMPORT_BATCH_SIZE = 20000
+IMPORT_MAX_ERRORS = 20  # 结果中保留的错误条数
+import_lock = threading.Lock()
+import_progress = {}  # 当前或最近一次导入的进度
+
+def parse_import_time(value, default):
+    """返回朴素的 UTC 时间（与数据库中的存储一致），缺失时返回 default"""
+    if not value:
+        return default
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.replace(tzinfo=None)
+
+def validate_import_row(row, now):
+    """校验并转换一行，返回 (类型, 待插入的字典)；缺失的时间取 now；非法时抛出 ValueError"""
+    kind = row.get("type")
+    content = row.get("content")
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError("content missing")
+    old_id = row.get("id")
+    if kind == "post":
+        status = row.get("status") or "Pass"
+        if status not in ("Pass", "Pending", "Deny"):
+            raise ValueError(f"invalid status {status}")
+        created_at = parse_import_time(row.get("created_at"), now)
+        return kind, old_id, {
+            "content": content,
+            "status": status,
+            "created_at": created_at,
+            "updated_at": parse_import_time(row.get("updated_at"), now) if row.get("updated_at") else created_at,
+            "upvotes": max(int(row.get("upvotes") or 0), 0),
+            "downvotes": max(int(row.get("downvotes") or 0), 0),
+            "comment_count": 0,
+            "fingerprint": content_fingerprint(content)
+        }
+    if kind == "comment":
+        return kind, old_id, {
+            "submission_id": int(row["submission_id"]),
+            "parent_comment_id": int(row.get("parent_comment_id") or 0),
+            "nickname": (str(row.get("nickname") or "").strip() or "匿名用户")[:50],
+            "content": content,
+            "created_at": parse_import_time(row.get("created_at"), now),
+            "fingerprint": content_fingerprint(content)
+        }
+    if kind == "report":
+        title = row.get("title")
+        if not isinstance(title, str) or not title.strip():
+            raise ValueError("title missing")
+        status = row.get("status") or "Pending"
+        if status not in ("Pass", "Pending", "Deny"):
+            raise ValueError(f"invalid status {status}")
+        submission_id = row.get("submission_id")
+        return kind, old_id, {
+            "submission_id": int(submission_id) if submission_id is not None else None,
+            "title": title[:200],
+            "content": content,
+            "status": status,
+            "created_at": parse_import_time(row.get("created_at"), now)
+        }
+    raise ValueError(f"unknown type {kind}")
+
+# SQLite 方言的 DateTime 存储格式，对朴素时间与 isoformat(' ', 'microseconds') 相同；
+# 直接调用 C 实现的 isoformat 比逐值调用方言的绑定处理器快一倍
+sqlite_datetime_text = operator.methodcaller('isoformat', ' ', 'microseconds')
+
+def bulk_insert(table, rows):
+    """直接 executemany 插入，省去逐行的参数编译；各列值按列转换（DateTime 需为朴素 UTC 时间），会就地修改 rows"""
+    conn = db.session.connection()
+    dialect = conn.dialect
+    columns = list(rows[0])
+    for name in columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, db.DateTime):
+            process = sqlite_datetime_text
+        else:
+            process = column_type.dialect_impl(dialect).bind_processor(dialect)
+        if process is None:
+            continue
+        for row in rows:
+            value = row[name]
+            if value is not None:
+                row[name] = process(value)
+    params = list(map(operator.itemgetter(*columns), rows))
+    if len(columns) == 1:
+        params = [(value,) for value in params]
+    conn.exec_driver_sql(
+        f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        params
+    )
+
+class NDJSONImporter:
+    """流式导入器：feed() 逐行接收，积累满一批后写入"""
+    def __init__(self, progress=None):
+        self.post_ids = {}  # 旧投稿 id -> 新 id
+        self.comment_ids = {}  # 旧评论 id -> 新 id
+        self.batch = []
+        self.counts = {"post": 0, "comment": 0, "report": 0, "skipped": 0}
+        self.errors = []
+        self.first_post_id = None
+        self.line_no = 0
+        self.started = time.monotonic()
+        self.now = get_utc_now().replace(tzinfo=None)  # 缺少时间的行统一使用导入开始时间
+        self.progress = progress if progress is not None else {}
+
+    def error(self, message, line_no=None):
+        self.counts["skipped"] += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(f"line {line_no or self.line_no}: {message}")
+
+    def feed(self, line):
+        self.line_no += 1
+        line = line.strip()
+        if not line:
+            return
+        try:
+            self.batch.append((self.line_no,) + validate_import_row(app.json.loads(line), self.now))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            self.error(str(e) or type(e).__name__)
+            return
+        if len(self.batch) >= IMPORT_BATCH_SIZE:
+            self.flush()
+
+    def next_id(self, model, archive):
+        """在热表、归档表与 AUTOINCREMENT 序列的最大值之后分配，不与已归档的 id 冲突"""
+        return max_allocated_id(model.__tablename__, archive) + 1
+
+    def flush(self):
+        """在一个事务中写入当前批：先投稿再评论、投诉，按输入顺序分配新 id 并改写引用"""
+        if not self.batch:
+            return
+        posts, comments, reports = [], [], []
+        next_post_id = self.next_id(Submission, 'submissions_archive')
+        next_comment_id = self.next_id(Comment, 'comments_archive')
+        for line_no, kind, old_id, values in self.batch:
+            if kind == "post":
+                values["id"] = next_post_id
+                if old_id is not None:
+                    self.post_ids[old_id] = next_post_id
+                next_post_id += 1
+                posts.append(values)
+        for line_no, kind, old_id, values in self.batch:
+            if kind == "comment":
+                submission_id = self.post_ids.get(values["submission_id"])
+                if submission_id is None:
+                    self.error("unknown submission_id", line_no)
+                    continue
+                parent_id = values["parent_comment_id"]
+                if parent_id != 0:
+                    parent_id = self.comment_ids.get(parent_id)
+                    if parent_id is None:
+                        self.error("unknown parent_comment_id", line_no)
+                        continue
+                values.update(id=next_comment_id, submission_id=submission_id, parent_comment_id=parent_id)
+                if old_id is not None:
+                    self.comment_ids[old_id] = next_comment_id
+                next_comment_id += 1
+                comments.append(values)
+            elif kind == "report":
+                values["submission_id"] = self.post_ids.get(values["submission_id"])
+                reports.append(values)
+        refs = [ref for row in posts for ref in image_ref_rows(row["id"], 0, row["content"])]
+        refs += [ref for row in comments for ref in image_ref_rows(row["submission_id"], row["id"], row["content"])]
+        for model, rows in ((Submission, posts), (Comment, comments), (Report, reports), (ImageRef, refs)):
+            if rows:
+                bulk_insert(model.__table__, rows)
+        db.session.commit()
+        if posts and self.first_post_id is None:
+            self.first_post_id = posts[0]["id"]
+        self.counts["post"] += len(posts)
+        self.counts["comment"] += len(comments)
+        self.counts["report"] += len(reports)
+        self.batch = []
+        elapsed = time.monotonic() - self.started
+        rows = self.counts["post"] + self.counts["comment"] + self.counts["report"]
+        self.progress.update(self.counts, lines=self.line_no, rows_per_second=int(rows / elapsed) if elapsed else 0)
+        app.logger.info(f"Import progress: {self.line_no} lines, {rows} rows, {self.progress['rows_per_second']} rows/s")
+
+    def finish(self):
+        """全部写入（且索引已重建）后重建评论数、统计信息与近似重复索引"""
+        if self.first_post_id is not None:
+            self.progress["stage"] = "counters"
+            db.session.execute(text(
+                "UPDATE submissions SET comment_count = "
+                "(SELECT COUNT(*) FROM comments WHERE comments.submission_id = submissions.id) "
+                "WHERE id >= :first_id"
+            ), {"first_id": self.first_post_id})
+            bump_stamps("feed")
+            db.session.commit()
+        self.progress["stage"] = "analyze"
+        # 近似统计即可，避免大库上 ANALYZE 全表扫描
+        db.session.execute(text("PRAGMA analysis_limit=1000"))
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        rebuild_near_duplicate_index_in_background()
+        elapsed = time.monotonic() - self.started
+        rows = self.counts["post"] + self.counts["comment"] + self.counts["report"]
+        return {
+            **self.counts,
+            "errors": self.errors,
+            "seconds": round(elapsed, 2),
+            "rows_per_second": int(rows / elapsed) if elapsed else 0
+        }
+
+def rebuild_near_duplicate_index_in_background():
+    """导入后在后台线程中经只读连接重建近似重复索引，不占用写连接，也不计入导入耗时"""
+    def run():
+        with app.app_context():
+            g.use_reader = True
+            try:
+                rebuild_near_duplicate_index()
+            except Exception as e:
+                app.logger.warning(f"Near-duplicate index rebuild failed: {e}")
+    threading.Thread(target=run, name='near-dup-rebuild', daemon=True).start()
+
+# 导入期间暂时删除的二级索引（主键除外）
+IMPORT_DEFERRED_TABLES = (Submission, Comment, Report)
+
+def import_ndjson(stream, defer_indexes=False):
+    """从二进制流导入 NDJSON，同一时间只允许一个导入"""
+    if not import_lock.acquire(blocking=False):
+        raise RuntimeError("Another import is running")
+    try:
+        import_progress.clear()
+        import_progress.update(stage="loading", started_at=get_utc_now().isoformat())
+        importer = NDJSONImporter(import_progress)
+        indexes = [index for model in IMPORT_DEFERRED_TABLES for index in model.__table__.indexes]
+        if defer_indexes:
+            for index in indexes:
+                db.session.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            db.session.commit()
+        try:
+            for line in stream:
+                importer.feed(line)
+            importer.flush()
+        finally:
+            # 即使导入中途失败也要恢复索引
+            if defer_indexes:
+                db.session.rollback()
+                import_progress["stage"] = "indexes"
+                for index in indexes:
+                    index.create(db.session.connection(), checkfirst=True)
+                db.session.commit()
+        result = importer.finish()
+        import_progress.update(stage="done", result=result)
+        return result
+    except Exception as e:
+        db.session.rollback()
+        import_progress.update(stage="failed", reason=str(e))
+        raise
+    finally:
+        import_lock.release()
+
+@app.cli.command('import-ndjson')
+@click.argument('path')
+@click.option('--defer-indexes/--keep-indexes', default=True, help='导入前删除二级索引，完成后重建（默认）；服务在线时可用 --keep-indexes')
+def import_command(path, defer_indexes):
+    """批量导入 NDJSON（支持 .gz）：flask --app api_server import-ndjson data.ndjson"""
+    app.logger.setLevel('INFO')  # 输出每批的进度
+    db.create_all()
+    run_migrations()
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        result = import_ndjson(f, defer_indexes)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+@app.route('/admin/import', methods=['POST'])
+@require_admin
+def admin_import():
+    """管理员接口：批量导入 NDJSON。可上传文件（file 字段）或直接以请求体发送；
+    .gz 文件、Content-Encoding: gzip 或 gzip=1 时按 gzip 解压；defer_indexes=1 时延后重建索引。
+    在线导入默认保留索引，约 4~5 万行/秒；大批量导入请停服后使用 CLI import-ndjson（默认延后重建索引，5 万行/秒以上）
+    """
+    if 'file' in request.files:
+        upload = request.files['file']
+        stream = upload.stream
+        compressed = upload.filename.endswith('.gz')
+    else:
+        # 请求体流逐行读取很慢，加一层缓冲
+        stream = io.BufferedReader(request.stream, 1024 * 1024)
+        compressed = request.headers.get('Content-Encoding', '').lower() == 'gzip'
+    if compressed or request.args.get("gzip", "0").lower() in ("1", "true"):
+        stream = gzip.GzipFile(fileobj=stream)
+    defer_indexes = request.args.get("defer_indexes", "0").lower() in ("1", "true")
+    if import_lock.locked():
+        return jsonify({"status": "Fail", "reason": "Another import is running"}), 409
+    try:
+        result = import_ndjson(stream, defer_indexes)
+        return jsonify({"status": "OK", **result}), 200
+    except Exception as e:
+        return jsonify({"status": "Fail", "reason": str(e)}), 500
+
+@app.route('/admin/get/import', methods=['GET'])
+@require_admin
+@use_reader
+def get_import_progress():
+    """管理员接口：当前或最近一次导入的进度"""
+    return jsonify(import_progress), 200
+
+
+def snapshot_database(dest_path):
+    """用 SQLite 在线备份接口从只读连接复制一致的快照（WAL 模式下数据库文件本身可能缺少未检查点的提交）"""
+    source = db.engines['reader'].raw_connection()
+    try:
+        target = sqlite3.connect(dest_path)
+        try:
+            source.driver_connection.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
 @app.route('/admin/get/backup', methods=['GET'])
 @require_admin
 def admin_get_backup():
@@ -1110,13 +3800,18 @@ def admin_get_backup():
         backup_path = os.path.join(BACKUP_FOLDER, backup_name)
         
         with zipfile.ZipFile(backup_path, 'w') as zipf:
-            # 添加数据库
+            # 添加数据库（数据库与配置文件压缩存储，图片本身已压缩则原样存储）
             if os.path.exists(DB_FILE):
-                zipf.write(DB_FILE, arcname=os.path.basename(DB_FILE))
+                snapshot_path = f"{backup_path}.db"
+                try:
+                    snapshot_database(snapshot_path)
+                    zipf.write(snapshot_path, arcname=os.path.basename(DB_FILE), compress_type=zipfile.ZIP_DEFLATED)
+                finally:
+                    if os.path.exists(snapshot_path):
+                        os.remove(snapshot_path)
             # 添加配置文件
-            config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.py')
-            if os.path.exists(config_path):
-                zipf.write(config_path, arcname='config.py')
+            if os.path.exists(CONFIG_PATH):
+                zipf.write(CONFIG_PATH, arcname='config.json', compress_type=zipfile.ZIP_DEFLATED)
             # 添加 img 文件夹
             if os.path.exists(IMG_FOLDER):
                 for root, dirs, files in os.walk(IMG_FOLDER):
@@ -1130,103 +3825,225 @@ def admin_get_backup():
         return jsonify({"status": "Fail", "reason": str(e)}), 500
 
 
+# === 在线恢复 ===
+# 直接从上传的压缩包中按成员流式读取，不整体解压：
+# 数据库先写入临时文件并通过 PRAGMA integrity_check 校验，再用 SQLite 在线备份接口经唯一的写连接写入正在使用的数据库，
+# 读请求（WAL 只读连接）在整个过程中照常应答，只会看到恢复前或恢复后的完整数据；
+# 图片先写入临时目录，再用目录重命名替换。
+RESTORE_COPY_BUFFER = 1024 * 1024
+
+def find_backup_db_member(names):
+    """压缩包中的数据库成员：优先与 DB_FILE 同名，否则取第一个常见数据库扩展名的文件"""
+    db_basename = os.path.basename(DB_FILE)
+    if db_basename in names:
+        return db_basename
+    for name in names:
+        if name.lower().endswith(('.db', '.sqlite', '.sqlite3')):
+            return name
+    return None
+
+def extract_member(zf, name, dest_path):
+    with zf.open(name) as src, open(dest_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, RESTORE_COPY_BUFFER)
+
+def check_restore_db(path):
+    """校验待恢复的数据库，页大小与在用数据库不同时先调整（WAL 模式下备份接口要求页大小一致）"""
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != 'ok':
+            raise ValueError(f"Integrity check failed: {result}")
+        target_page_size = db.session.execute(text("PRAGMA page_size")).scalar()
+        db.session.rollback()
+        if conn.execute("PRAGMA page_size").fetchone()[0] != target_page_size:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute(f"PRAGMA page_size={int(target_page_size)}")
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+def stage_images(zf, names):
+    """将压缩包中的图片解压到临时目录，返回该目录；备份中没有图片时返回 None"""
+    prefixes = {f"{os.path.basename(IMG_FOLDER)}/", "img/"}
+    members = [n for n in names if not n.endswith('/') and any(n.startswith(p) for p in prefixes)]
+    if not members:
+        return None
+    staging = f"{IMG_FOLDER}.restore"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in members:
+        relative = os.path.normpath(name.split('/', 1)[1])
+        if relative.startswith('..') or os.path.isabs(relative):
+            continue
+        dest = os.path.join(staging, relative)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        extract_member(zf, name, dest)
+    return staging
+
+RENAME_EXCHANGE = 2
+AT_FDCWD = -100
+
+def exchange_paths(a, b):
+    """用 renameat2(RENAME_EXCHANGE) 原子交换两个目录；平台不支持时返回 False"""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    if renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False
+    raise OSError(err, os.strerror(err), a)
+
+def swap_image_folder(staging):
+    """用临时目录替换 IMG_FOLDER，替换过程中上传目录始终存在"""
+    target = IMG_FOLDER
+    if not os.path.isdir(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.rename(staging, target)
+    elif exchange_paths(staging, target):
+        # 交换后 staging 中是旧图片
+        shutil.rmtree(staging, ignore_errors=True)
+    else:
+        # 不支持原子交换的平台只能两次重命名
+        retired = f"{target}.old"
+        shutil.rmtree(retired, ignore_errors=True)
+        os.rename(target, retired)
+        os.rename(staging, target)
+        shutil.rmtree(retired, ignore_errors=True)
+
+def stage_config(zf, names):
+    """把备份中的配置解压到临时文件，返回 (临时路径, 是否旧版 config.py)；没有配置时返回 None"""
+    if 'config.json' in names:
+        tmp_path = f"{CONFIG_PATH}.{os.getpid()}.tmp"
+        extract_member(zf, 'config.json', tmp_path)
+        return tmp_path, False
+    if 'config.py' in names:
+        tmp_path = f"{LEGACY_CONFIG_PATH}.{os.getpid()}.tmp"
+        extract_member(zf, 'config.py', tmp_path)
+        return tmp_path, True
+    return None
+
+def apply_config(staged):
+    """原子替换配置文件并重新加载"""
+    tmp_path, legacy = staged
+    if legacy:
+        # 旧版备份中的 config.py 转换为 config.json
+        os.replace(tmp_path, LEGACY_CONFIG_PATH)
+        write_config(**read_legacy_config())
+    else:
+        os.replace(tmp_path, CONFIG_PATH)
+    load_config(force=True)
+
+def discard_staged(staged_config, staged_images):
+    """删除已解压但尚未启用的配置和图片（已启用的临时路径不再存在）"""
+    if staged_config and os.path.exists(staged_config[0]):
+        os.remove(staged_config[0])
+    if staged_images:
+        shutil.rmtree(staged_images, ignore_errors=True)
+
+def restore_database(path):
+    """通过在线备份接口把数据库文件内容写入正在使用的数据库"""
+    db.session.remove()
+    source = sqlite3.connect(path)
+    target = db.engine.raw_connection()  # 唯一的写连接，等待进行中的写事务结束
+    try:
+        source.backup(target.driver_connection)
+    finally:
+        target.close()
+        source.close()
+
+def rebuild_after_restore():
+    """恢复后补齐迁移、更换 ETag 纪元并重建进程内缓存"""
+    global NEED_AUDIT
+    # 恢复的数据库可能与之前发出的 ETag 版本号重叠，更换纪元并清空版本戳缓存；
+    # 先于迁移执行（旧备份缺少的表由 create_all 补齐），迁移失败时旧的 ETag 也已失效
+    db.create_all()
+    reset_stamp_epoch()
+    with stamp_lock:
+        stamp_cache.clear()
+    archive_counts_cache["stamp"] = None
+    initialize_database()
+    NEED_AUDIT = get_config("need_audit", "false").lower() == "true"
+    load_write_queue_settings()
+    load_duplicate_settings()
+    load_near_duplicate_settings()
+    rebuild_near_duplicate_index()
+    load_vote_dedup_settings()
+    load_archive_settings()
+    load_admission_settings()
+    load_image_gc_settings()
+
 @app.route('/admin/recover', methods=['POST'])
 @require_admin
 def admin_recover():
+    global READY, RESTORING
     if 'file' not in request.files:
         return jsonify({"status": "Fail", "reason": "No file uploaded"}), 400
     
     file = request.files['file']
     if file.filename == '' or not allowed_backup_file(file.filename):
         return jsonify({"status": "Fail", "reason": "Wrong file type"}), 400
-    
-    filename = secure_filename(file.filename)
-    temp_path = os.path.join(BACKUP_FOLDER, filename)
-    file.save(temp_path)
 
+    restore_db_path = f"{DB_FILE}.restore"
+    staged_config = staged_images = None
     try:
-        # 1) 解压到临时目录，不直接覆盖源目录
-        extract_dir = os.path.join(BACKUP_FOLDER, f"extracted_{os.path.splitext(filename)[0]}")
-        if os.path.exists(extract_dir):
-            shutil.rmtree(extract_dir, ignore_errors=True)
-        os.makedirs(extract_dir, exist_ok=True)
-
-        with zipfile.ZipFile(temp_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-
-        # 2) 先恢复配置文件并重新加载配置
+        # 上传内容已在临时文件中（可随机访问），直接按成员读取
+        with zipfile.ZipFile(file.stream) as zf:
+            names = zf.namelist()
+            member = find_backup_db_member(names)
+            if member is None:
+                return jsonify({"status": "Fail", "reason": "DB file not found in backup"}), 400
+
+            # 1) 先取出并校验数据库，失败时不改动任何现有数据
+            os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+            extract_member(zf, member, restore_db_path)
+            try:
+                check_restore_db(restore_db_path)
+            except (ValueError, sqlite3.DatabaseError) as e:
+                return jsonify({"status": "Fail", "reason": str(e)}), 400
+
+            # 2) 配置和图片只解压到临时位置，数据库恢复成功后才启用
+            staged_config = stage_config(zf, names)
+            staged_images = stage_images(zf, names)
+
+        # 3) 数据库；失败时 finally 丢弃临时文件，现有配置和图片保持不变。
+        # 从这里到缓存重建完成，其他请求返回 503，不读写恢复到一半的数据或旧的缓存；
+        # 中途失败时 READY 保持 False，之后的请求经 ensure_db_and_audit 按当前数据库重新初始化
+        RESTORING = True
+        READY = False
         try:
-            src_config = os.path.join(extract_dir, 'config.py')
-            if os.path.isfile(src_config):
-                dest_config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.py')
-                shutil.copy2(src_config, dest_config)
-                # 重新加载配置以应用可能变化的上传目录等
-                try:
-                    load_config()
-                except Exception:
-                    pass
-        except Exception as e:
-            app.logger.warning(f"Recover config.py failed: {e}")
-
-        # 3) 恢复 img 文件夹到应用目录（根据当前配置中的上传目录）
-        src_img = os.path.join(extract_dir, 'img')
-        if os.path.isdir(src_img):
-            # 清空并复制
-            shutil.rmtree(IMG_FOLDER, ignore_errors=True)
-            shutil.copytree(src_img, IMG_FOLDER)
-
-        # 4) 恢复数据库到 DB_FILE
-        target_db = DB_FILE
-        db_basename = os.path.basename(target_db)
-        candidate = os.path.join(extract_dir, db_basename)
-        if not os.path.isfile(candidate):
-            # 兜底：在压缩包中搜索常见数据库文件扩展
-            candidate = None
-            for root, _, files in os.walk(extract_dir):
-                for f in files:
-                    if f.lower().endswith(('.db', '.sqlite', '.sqlite3')):
-                        candidate = os.path.join(root, f)
-                        break
-                if candidate:
-                    break
-        if not candidate:
-            return jsonify({"status": "Fail", "reason": "DB file not found in backup"}), 400
-
-        # 处理 SQLite WAL/SHM，避免增量日志合并新数据
-        wal = f"{target_db}-wal"
-        shm = f"{target_db}-shm"
-        for fpath in (wal, shm):
-            if os.path.exists(fpath):
+            restore_database(restore_db_path)
+
+            # 4) 启用配置（可能改变上传目录）和图片，之后重建缓存
+            if staged_config:
                 try:
-                    os.remove(fpath)
+                    apply_config(staged_config)
                 except Exception as e:
-                    app.logger.warning(f"Failed to remove {fpath}: {e}")
-
-        # 确保 instance 目录存在
-        os.makedirs(os.path.dirname(target_db), exist_ok=True)
-        # 覆盖数据库文件
-        shutil.copy2(candidate, target_db)
-
-        # 5) 释放 SQLAlchemy 连接（如果持有旧句柄）
-        try:
-            db.session.remove()
-            db.engine.dispose()
-        except Exception:
-            pass
-
-        # 6) 清理临时文件夹与压缩包
-        try:
-            os.remove(temp_path)
-        except Exception:
-            pass
-        shutil.rmtree(extract_dir, ignore_errors=True)
-
+                    app.logger.warning(f"Recover config failed: {e}")
+            if staged_images:
+                swap_image_folder(staged_images)
+            rebuild_after_restore()
+            READY = True
+        finally:
+            RESTORING = False
         return jsonify({"status": "OK"}), 200
+    except zipfile.BadZipFile:
+        return jsonify({"status": "Fail", "reason": "Bad zip file"}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({"status": "Fail", "reason": str(e)}), 500
+    finally:
+        discard_staged(staged_config, staged_images)
+        if os.path.exists(restore_db_path):
+            os.remove(restore_db_path)
 
 @app.route('/admin/get/pending_posts', methods=['GET'])
 @require_admin
+@use_reader
 def admin_pending_posts():
     posts = Submission.query.filter_by(status="Pending").all()
     return jsonify([{
@@ -1240,6 +4057,7 @@ def admin_pending_posts():
 
 @app.route('/admin/get/reject_posts', methods=['GET'])
 @require_admin
+@use_reader
 def admin_reject_posts():
     posts = Submission.query.filter_by(status="Deny").all()
     return jsonify([{
@@ -1253,6 +4071,7 @@ def admin_reject_posts():
 
 @app.route('/admin/get/pic_links', methods=['GET'])
 @require_admin
+@use_reader
 def admin_get_pic_links():
     page = request.args.get("page", 1, type=int)
     if page < 1:
@@ -1278,6 +4097,7 @@ def admin_get_pic_links():
 
 @app.route('/admin/get/pending_reports', methods=['GET'])
 @require_admin
+@use_reader
 def admin_pending_reports():
     reports = Report.query.filter_by(status="Pending").all()
     return jsonify([{
@@ -1295,10 +4115,475 @@ def admin_pending_reports():
 def admin_return_200():
     return 'Admin API OK!!!', 200
 
+# === 冷热数据归档 ===
+# 将旧投稿及其评论移入 submissions_archive / comments_archive，
+# 热表与索引保持小而常驻页缓存；归档数据通过 get_submission_any 透明读取（只读，不能再投票或评论）。
+ARCHIVE_AFTER_DAYS = 0  # 创建超过该天数的投稿归档，0 为不按时间归档
+ARCHIVE_KEEP_LATEST = 0  # 只保留最新的 N 条投稿在热表，0 为不按名次归档
+ARCHIVE_BATCH_SIZE = 500  # 每个事务归档的投稿数
+archive_lock = threading.Lock()
+archive_counts_cache = {"stamp": None, "counts": (0, 0)}
+
+def get_submission_any(post_id):
+    """按 id 读取投稿，热表没有时查归档表"""
+    submission = db.session.get(Submission, post_id)
+    if submission is None:
+        submission = db.session.get(ArchivedSubmission, post_id)
+    return submission
+
+def get_archive_counts():
+    """归档表的投稿与评论数，仅在归档变化（archive 版本戳变化）后重新统计"""
+    stamp, = get_stamps("archive")
+    if archive_counts_cache["stamp"] != stamp:
+        archive_counts_cache["counts"] = (ArchivedSubmission.query.count(), ArchivedComment.query.count())
+        archive_counts_cache["stamp"] = stamp
+    return archive_counts_cache["counts"]
+
+def max_allocated_id(table, archive):
+    """热表、归档表与 AUTOINCREMENT 序列（存在时）中最大的 id"""
+    queries = [f"SELECT MAX(id) AS m FROM {table}", f"SELECT MAX(id) FROM {archive}"]
+    if db.session.scalar(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'")):
+        queries.append(f"SELECT seq FROM sqlite_sequence WHERE name = '{table}'")
+    return db.session.scalar(text(f"SELECT MAX(m) FROM ({' UNION ALL '.join(queries)})")) or 0
+
+def has_autoincrement(table):
+    """表是否以 AUTOINCREMENT 建立（新库）；旧库的表由 SQLite 按 MAX(id)+1 分配 id"""
+    sql = db.session.scalar(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+    )
+    return sql is not None and 'AUTOINCREMENT' in sql.upper()
+
+def archive_columns(hot, cold):
+    """热表与归档表共有的列（迁移新增的列在两边都存在时一并归档）"""
+    cold_columns = set(table_columns(cold))
+    return [c for c in table_columns(hot) if c in cold_columns]
+
+def archive_posts(after_days=None, keep_latest=None):
+    """归档满足条件的投稿（不含待审核的），分批在各自事务中完成，返回归档的投稿数"""
+    after_days = ARCHIVE_AFTER_DAYS if after_days is None else after_days
+    keep_latest = ARCHIVE_KEEP_LATEST if keep_latest is None else keep_latest
+    if after_days <= 0 and keep_latest <= 0:
+        return 0
+    criteria = [Submission.status != "Pending"]
+    if after_days > 0:
+        criteria.append(Submission.created_at < get_utc_now() - timedelta(days=after_days))
+    if keep_latest > 0:
+        boundary = db.session.scalar(
+            select(Submission.id).order_by(Submission.id.desc()).offset(keep_latest - 1).limit(1)
+        )
+        if boundary is None:
+            return 0
+        criteria.append(Submission.id < boundary)
+    # 旧库的表没有 AUTOINCREMENT：持有最大 id 的投稿、最大 id 评论所属的投稿留在热表作为高水位，
+    # 热表的 MAX(id) 不会回落，已归档的 id 不会再分配给新投稿或评论
+    if not has_autoincrement('submissions'):
+        criteria.append(Submission.id < select(db.func.max(Submission.id)).scalar_subquery())
+    if not has_autoincrement('comments'):
+        newest = select(Comment.submission_id).order_by(Comment.id.desc()).limit(1).scalar_subquery()
+        criteria.append(Submission.id != db.func.coalesce(newest, 0))
+
+    total = 0
+    with archive_lock:
+        post_columns = ', '.join(archive_columns('submissions', 'submissions_archive'))
+        comment_columns = ', '.join(archive_columns('comments', 'comments_archive'))
+        while True:
+            ids = db.session.scalars(
+                select(Submission.id).where(*criteria).order_by(Submission.id).limit(ARCHIVE_BATCH_SIZE)
+            ).all()
+            if not ids:
+                break
+            id_list = ','.join(map(str, ids))
+            db.session.execute(text(
+                f"INSERT INTO submissions_archive ({post_columns}) "
+                f"SELECT {post_columns} FROM submissions WHERE id IN ({id_list})"
+            ))
+            db.session.execute(text(
+                f"INSERT INTO comments_archive ({comment_columns}) "
+                f"SELECT {comment_columns} FROM comments WHERE submission_id IN ({id_list})"
+            ))
+            db.session.execute(text(f"DELETE FROM comments WHERE submission_id IN ({id_list})"))
+            db.session.execute(text(f"DELETE FROM submissions WHERE id IN ({id_list})"))
+            bump_stamps("feed", "archive")
+            db.session.commit()
+            total += len(ids)
+    return total
+
+def load_archive_settings():
+    global ARCHIVE_AFTER_DAYS, ARCHIVE_KEEP_LATEST
+    try:
+        ARCHIVE_AFTER_DAYS = int(get_config("archive_after_days", ARCHIVE_AFTER_DAYS))
+        ARCHIVE_KEEP_LATEST = int(get_config("archive_keep_latest", ARCHIVE_KEEP_LATEST))
+    except Exception:
+        pass
+
+def run_scheduled_archive():
+    """定时归档任务（每小时），每次运行前重新读取设置，兼容多进程修改"""
+    if not READY:
+        return
+    with app.app_context():
+        load_archive_settings()
+        archived = archive_posts()
+        if archived:
+            app.logger.info(f"Archived {archived} posts")
+
+register_maintenance(run_scheduled_archive, 3600)
+
+@app.cli.command('archive')
+def archive_command():
+    """立即执行一次归档：flask --app api_server archive"""
+    load_archive_settings()
+    print(f"Archived {archive_posts()} posts")
+
+@app.route('/admin/archive', methods=['POST'])
+@require_admin
+def admin_archive():
+    """管理员接口：立即归档；可传 after_days / keep_latest 覆盖已保存的设置"""
+    data = request.get_json(silent=True) or {}
+    try:
+        after_days = int(data["after_days"]) if "after_days" in data else None
+        keep_latest = int(data["keep_latest"]) if "keep_latest" in data else None
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "after_days and keep_latest must be int"}), 400
+    try:
+        archived = archive_posts(after_days, keep_latest)
+        return jsonify({"status": "OK", "archived": archived}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "Fail", "reason": str(e)}), 500
+
+@app.route('/admin/archive_settings', methods=['POST'])
+@require_admin
+def admin_archive_settings():
+    """管理员接口：设置定时归档条件（0 为关闭对应条件）"""
+    global ARCHIVE_AFTER_DAYS, ARCHIVE_KEEP_LATEST
+    data = request.get_json() or {}
+    try:
+        after_days = int(data.get("after_days", ARCHIVE_AFTER_DAYS))
+        keep_latest = int(data.get("keep_latest", ARCHIVE_KEEP_LATEST))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "after_days and keep_latest must be int"}), 400
+    if after_days < 0 or keep_latest < 0:
+        return jsonify({"status": "Fail", "reason": "Values must be >= 0"}), 400
+    set_config("archive_after_days", after_days)
+    set_config("archive_keep_latest", keep_latest)
+    ARCHIVE_AFTER_DAYS = after_days
+    ARCHIVE_KEEP_LATEST = keep_latest
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/archive', methods=['GET'])
+@require_admin
+@use_reader
+def get_archive():
+    archived_posts, archived_comments = get_archive_counts()
+    return jsonify({
+        "after_days": ARCHIVE_AFTER_DAYS,
+        "keep_latest": ARCHIVE_KEEP_LATEST,
+        "archived_posts": archived_posts,
+        "archived_comments": archived_comments
+    }), 200
+
+
+# === 图片引用与清理 ===
+# 上传目录中由上传接口生成、超过宽限期、且没有任何投稿/评论（含归档）、公告或投诉引用的图片视为孤儿，定时删除。
+# 宽限期让刚上传、尚未发布的图片不被误删；0 表示关闭定时清理。
+IMAGE_GC_GRACE_HOURS = 24
+IMAGE_GC_QUERY_CHUNK = 500  # 每次查询引用的文件名数量
+image_gc_lock = threading.Lock()
+image_gc_stats = {"last_run": None, "deleted": 0}
+
+def referenced_images(filenames):
+    """filenames 中仍被引用的文件名"""
+    referenced = set()
+    for i in range(0, len(filenames), IMAGE_GC_QUERY_CHUNK):
+        chunk = filenames[i:i + IMAGE_GC_QUERY_CHUNK]
+        referenced.update(db.session.scalars(select(ImageRef.filename).where(ImageRef.filename.in_(chunk))))
+    # 公告与投诉（举证图片）不在引用表中，直接解析内容
+    contents = [get_current_notice()["content"]]
+    contents += db.session.scalars(
+        select(Report.title + " " + Report.content).where(
+            db.or_(Report.content.contains('/img/'), Report.title.contains('/img/'))
+        )
+    )
+    for content in contents:
+        referenced.update(row["filename"] for row in image_ref_rows(0, 0, content))
+    return referenced
+
+def find_orphan_images(grace_hours):
+    """只考虑由上传接口生成的图片（扩展名允许且文件名符合生成格式），上传目录被误配置时也不会删除其他文件"""
+    if not os.path.isdir(UPLOAD_FOLDER):
+        return []
+    cutoff = time.time() - grace_hours * 3600
+    candidates = []
+    with os.scandir(UPLOAD_FOLDER) as entries:
+        for entry in entries:
+            if not (allowed_file(entry.name) and IMAGE_FILENAME_PATTERN.fullmatch(entry.name)):
+                continue
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                candidates.append(entry.name)
+    if not candidates:
+        return []
+    referenced = referenced_images(candidates)
+    return sorted(name for name in candidates if name not in referenced)
+
+def collect_orphan_images(grace_hours=None, dry_run=False):
+    """删除孤儿图片，返回（将要）删除的文件名列表"""
+    grace_hours = IMAGE_GC_GRACE_HOURS if grace_hours is None else grace_hours
+    with image_gc_lock:
+        orphans = find_orphan_images(grace_hours)
+        db.session.rollback()  # 不在删除文件期间持有读事务
+        if dry_run:
+            return orphans
+        deleted = []
+        for name in orphans:
+            try:
+                os.remove(os.path.join(UPLOAD_FOLDER, name))
+                deleted.append(name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                app.logger.warning(f"Failed to delete orphan image {name}: {e}")
+        image_gc_stats["last_run"] = get_utc_now().isoformat()
+        image_gc_stats["deleted"] += len(deleted)
+        return deleted
+
+def load_image_gc_settings():
+    global IMAGE_GC_GRACE_HOURS
+    try:
+        IMAGE_GC_GRACE_HOURS = float(get_config("image_gc_grace_hours", IMAGE_GC_GRACE_HOURS))
+    except Exception:
+        pass
+
+def run_scheduled_image_gc():
+    """定时清理孤儿图片（每小时），每次运行前重新读取设置，兼容多进程修改"""
+    if not READY:
+        return
+    with app.app_context():
+        load_image_gc_settings()
+        if IMAGE_GC_GRACE_HOURS <= 0:
+            return
+        deleted = collect_orphan_images()
+        if deleted:
+            app.logger.info(f"Deleted {len(deleted)} orphan images")
+
+register_maintenance(run_scheduled_image_gc, 3600)
+
+@app.route('/admin/image_gc', methods=['POST'])
+@require_admin
+def admin_image_gc():
+    """管理员接口：立即清理孤儿图片；可传 grace_hours 覆盖宽限期，dry_run 为 true 时只列出不删除"""
+    data = request.get_json(silent=True) or {}
+    try:
+        grace_hours = float(data["grace_hours"]) if "grace_hours" in data else None
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "grace_hours must be number"}), 400
+    if grace_hours is not None and grace_hours < 0:
+        return jsonify({"status": "Fail", "reason": "grace_hours must be >= 0"}), 400
+    try:
+        files = collect_orphan_images(grace_hours, dry_run=bool(data.get("dry_run")))
+        return jsonify({"status": "OK", "files": files}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "Fail", "reason": str(e)}), 500
+
+@app.route('/admin/image_gc_settings', methods=['POST'])
+@require_admin
+def admin_image_gc_settings():
+    """管理员接口：设置孤儿图片的宽限期（小时，0 为关闭定时清理）"""
+    global IMAGE_GC_GRACE_HOURS
+    data = request.get_json() or {}
+    try:
+        grace_hours = float(data.get("grace_hours", IMAGE_GC_GRACE_HOURS))
+    except Exception:
+        return jsonify({"status": "Fail", "reason": "grace_hours must be number"}), 400
+    if grace_hours < 0:
+        return jsonify({"status": "Fail", "reason": "grace_hours must be >= 0"}), 400
+    set_config("image_gc_grace_hours", grace_hours)
+    IMAGE_GC_GRACE_HOURS = grace_hours
+    return jsonify({"status": "OK"}), 200
+
+@app.route('/admin/get/image_gc', methods=['GET'])
+@require_admin
+@use_reader
+def get_image_gc():
+    return jsonify({
+        "grace_hours": IMAGE_GC_GRACE_HOURS,
+        "referenced_images": db.session.scalar(select(db.func.count(db.distinct(ImageRef.filename)))),
+        **image_gc_stats
+    }), 200
+
+@app.route('/admin/get/image_refs', methods=['GET'])
+@require_admin
+@use_reader
+def get_image_refs():
+    """管理员接口：查看引用某张图片的投稿与评论（comment_id 为 0 表示投稿正文）"""
+    filename = request.args.get("filename", "")
+    refs = db.session.execute(
+        select(ImageRef.submission_id, ImageRef.comment_id).where(ImageRef.filename == filename)
+    ).all()
+    return jsonify([{"submission_id": r.submission_id, "comment_id": r.comment_id} for r in refs]), 200
+
+
+# === 数据库迁移 ===
+# 新表由 db.create_all() 创建；已有表的新增列与索引通过迁移补齐。
+# 迁移必须幂等（多个进程可能同时执行），新建数据库上执行时应为空操作。
+MIGRATIONS = []  # (版本号, 名称, 函数)
+MIGRATION_BATCH_SIZE = 2000  # 回填数据时每个事务处理的行数
+migration_lock = threading.Lock()
+
+def migration(version, name):
+    """装饰器：注册一个迁移"""
+    def decorator(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return decorator
+
+def table_columns(table):
+    return {row[1] for row in db.session.execute(text(f"PRAGMA table_info({table})"))}
+
+def add_column(table, column, ddl):
+    """列不存在时添加（SQLite 的 ADD COLUMN 只修改表结构，不重写数据）"""
+    if column not in table_columns(table):
+        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        db.session.commit()
+
+def create_index(name, table, columns):
+    db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    db.session.commit()
+
+def backfill_in_batches(table, where, update):
+    """按 id 分批回填数据，每批单独提交，避免长时间持有写锁。
+    update(ids) 负责处理一批行（不需要 commit），返回处理的行数合计。
+    """
+    last_id = 0
+    total = 0
+    while True:
+        ids = db.session.scalars(text(
+            f"SELECT id FROM {table} WHERE id > :last_id AND ({where}) ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": MIGRATION_BATCH_SIZE}).all()
+        if not ids:
+            return total
+        update(ids)
+        db.session.commit()
+        total += len(ids)
+        last_id = ids[-1]
+
+def run_migrations():
+    """按版本顺序执行尚未应用的迁移，返回本次应用的版本号列表"""
+    with migration_lock:
+        applied = set(db.session.scalars(select(SchemaMigration.version)))
+        done = []
+        for version, name, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+            app.logger.info(f"Applying migration {version}: {name}")
+            func()
+            try:
+                db.session.add(SchemaMigration(version=version, name=name))
+                db.session.commit()
+            except IntegrityError:
+                # 其他进程已记录该版本
+                db.session.rollback()
+            done.append(version)
+        if done:
+            # 更新查询规划器统计信息，让新索引生效
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+        return done
+
+def migration_status():
+    applied = {m.version: m for m in SchemaMigration.query.all()}
+    return [{
+        "version": version,
+        "name": name,
+        "applied_at": applied[version].applied_at.isoformat() if version in applied else None
+    } for version, name, _ in sorted(MIGRATIONS, key=lambda m: m[0])]
+
+@migration(1, "add core indexes")
+def migrate_add_core_indexes():
+    create_index('ix_submissions_status_id', 'submissions', ['status', 'id'])
+    create_index('ix_comments_submission_id', 'comments', ['submission_id'])
+    create_index('ix_comments_parent_comment_id', 'comments', ['parent_comment_id'])
+    create_index('ix_reports_status', 'reports', ['status'])
+
+@migration(2, "add content fingerprints")
+def migrate_add_fingerprints():
+    for table in ('submissions', 'comments'):
+        add_column(table, 'fingerprint', 'VARCHAR(32)')
+        create_index(f'ix_{table}_fingerprint', table, ['fingerprint', 'created_at'])
+
+        def fill(ids, table=table):
+            rows = db.session.execute(
+                text(f"SELECT id, content FROM {table} WHERE id IN ({','.join(map(str, ids))})")
+            ).all()
+            db.session.execute(
+                text(f"UPDATE {table} SET fingerprint = :fp WHERE id = :id"),
+                [{"id": row.id, "fp": content_fingerprint(row.content)} for row in rows]
+            )
+        backfill_in_batches(table, "fingerprint IS NULL", fill)
+
+@migration(3, "add comment counts")
+def migrate_add_comment_counts():
+    for table, comments in (('submissions', 'comments'), ('submissions_archive', 'comments_archive')):
+        add_column(table, 'comment_count', 'INTEGER NOT NULL DEFAULT 0')
+
+        def fill(ids, table=table, comments=comments):
+            db.session.execute(text(
+                f"UPDATE {table} SET comment_count = "
+                f"(SELECT COUNT(*) FROM {comments} WHERE {comments}.submission_id = {table}.id) "
+                f"WHERE id IN ({','.join(map(str, ids))})"
+            ))
+        backfill_in_batches(table, "comment_count = 0", fill)
+
+@migration(4, "add image references")
+def migrate_add_image_refs():
+    # image_refs 表由 create_all 创建，这里从已有内容回填
+    sources = (
+        ('submissions', "id, id AS submission_id, 0 AS comment_id, content"),
+        ('submissions_archive', "id, id AS submission_id, 0 AS comment_id, content"),
+        ('comments', "id, submission_id, id AS comment_id, content"),
+        ('comments_archive', "id, submission_id, id AS comment_id, content"),
+    )
+    for table, columns in sources:
+        def fill(ids, table=table, columns=columns):
+            rows = db.session.execute(
+                text(f"SELECT {columns} FROM {table} WHERE id IN ({','.join(map(str, ids))})")
+            ).all()
+            refs = [ref for row in rows for ref in image_ref_rows(row.submission_id, row.comment_id, row.content)]
+            if refs:
+                db.session.execute(insert(ImageRef).prefix_with("OR IGNORE"), refs)
+        backfill_in_batches(table, "content LIKE '%/img/%'", fill)
+
+@app.cli.command('migrate')
+def migrate_command():
+    """执行数据库迁移：flask --app api_server migrate"""
+    db.create_all()
+    done = run_migrations()
+    print(f"Applied migrations: {done}" if done else "Database is up to date")
+
+@app.route('/admin/migrate', methods=['POST'])
+@require_admin
+def admin_migrate():
+    """管理员接口：执行尚未应用的数据库迁移"""
+    try:
+        db.create_all()
+        done = run_migrations()
+        return jsonify({"status": "OK", "applied": done}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "Fail", "reason": str(e)}), 500
+
+@app.route('/admin/get/migrations', methods=['GET'])
+@require_admin
+@use_reader
+def get_migrations():
+    return jsonify(migration_status()), 200
+
+
 # === 数据库初始化 ===
 def initialize_database():
     """若数据库不存在则创建并初始化"""
     db.create_all()  # 安全创建表
+    run_migrations()  # 补齐已有数据库缺少的列与索引
 
     if not Config.query.filter_by(key="need_audit").first():
         default_config = Config(key="need_audit", value="false")
@@ -1308,6 +4593,10 @@ def initialize_database():
     # 确保公告表有默认记录
     ensure_default_notice()
 
+    # 数据库纪元，参与 ETag 生成
+    if not db.session.get(ChangeStamp, 'epoch'):
+        reset_stamp_epoch()
+
 
 # === 启动 ===
 if __name__ == '__main__':
@@ -0,0 +1,31 @@
+"""请求入口（before_request）的耗时基准：python tests/bench_request_gate.py
+
+分别测量未初始化与已初始化（READY 快路径）时每个请求预处理的耗时。
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from conftest import INIT_CONFIG, load_module  # noqa: E402
+
+
+def per_request_us(app, number):
+    with app.test_request_context('/get/notice'):
+        return timeit.timeit(app.preprocess_request, number=number) / number * 1e6
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix='gate_bench_')
+    os.chdir(directory)
+    module = load_module(directory)
+    app = module.app
+    print(f"uninitialized: {per_request_us(app, 500):.1f} us/request")
+    app.test_client().post('/init', json=INIT_CONFIG)
+    app.test_client().get('/test')
+    print(f"initialized:   {per_request_us(app, 200000):.2f} us/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""测试夹具：每个测试把 api_server.py 复制到临时目录后单独加载一份，数据库、配置与上传目录都在该目录下"""
+import importlib.util
+import itertools
+import os
+import shutil
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = {"Authorization": "Bearer tok"}
+INIT_CONFIG = {
+    "ADMIN_TOKEN": "tok",
+    "UPLOAD_FOLDER": "img",
+    "ALLOWED_EXTENSIONS": ["png", "jpg"],
+    "MAX_FILE_SIZE": 1000000,
+    "RATE_LIMIT": 0,
+}
+module_ids = itertools.count()
+# 模块级监听器注册在全局的 Session / Engine 上，卸载模块时一并移除，避免之前测试的副本处理当前测试的会话
+GLOBAL_EVENTS = [
+    (Session, "after_commit"), (Session, "after_rollback"),
+    (Engine, "before_cursor_execute"), (Engine, "after_cursor_execute"),
+]
+
+
+def load_module(directory):
+    """在 directory 中加载一份独立的 api_server 模块"""
+    path = os.path.join(directory, 'api_server.py')
+    shutil.copy(os.path.join(ROOT, 'api_server.py'), path)
+    name = f"api_server_{next(module_ids)}"
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    module.app.testing = True
+    return module
+
+
+def unload_module(module):
+    for target, identifier in GLOBAL_EVENTS:
+        for fn in list(vars(module).values()):
+            if callable(fn) and event.contains(target, identifier, fn):
+                event.remove(target, identifier, fn)
+    sys.modules.pop(module.__name__, None)
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """尚未初始化的服务模块"""
+    monkeypatch.chdir(tmp_path)
+    module = load_module(str(tmp_path))
+    yield module
+    unload_module(module)
+
+
+@pytest.fixture
+def server(api):
+    """已通过 /init 初始化的服务模块"""
+    response = api.app.test_client().post('/init', json=INIT_CONFIG)
+    assert response.status_code == 200, response.get_json()
+    return api
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+@pytest.fixture
+def post(client):
+    """发布一条投稿并返回其 id"""
+    def create(content="hello world, this is a test post"):
+        response = client.post('/post', json={"content": content})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()["id"]
+    return create
+
+
+def publish_when_subscribed(server, publish):
+    """SSE 生成器在第一次迭代时才注册客户端队列，而测试客户端在 get() 中就会阻塞等待第一段输出：
+    应在 get() 之前调用，后台线程等到注册后再发布"""
+    count = len(server.sse_clients)
+
+    def run():
+        deadline = time.monotonic() + 5
+        while len(server.sse_clients) <= count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        publish()
+    threading.Thread(target=run, daemon=True).start()
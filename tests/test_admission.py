@@ -0,0 +1,79 @@
+import json
+import threading
+
+import pytest
+
+from conftest import ADMIN
+
+SERVER_BUSY = {"status": "Fail", "reason": "Server busy"}
+
+
+@pytest.fixture
+def slow_statics(server, monkeypatch):
+    """让 /get/statics 阻塞到测试放行，模拟占用线程的慢请求"""
+    entered, release = threading.Semaphore(0), threading.Event()
+
+    def blocking():
+        entered.release()
+        release.wait(5)
+        return "ok"
+    monkeypatch.setitem(server.app.view_functions, 'get_statics', blocking)
+
+    threads = []
+
+    def start():
+        thread = threading.Thread(target=server.app.test_client().get, args=('/get/statics',))
+        thread.start()
+        threads.append(thread)
+        assert entered.acquire(timeout=5)
+    yield start
+    release.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_disabled_by_default(server, client):
+    settings = client.get('/admin/get/admission', headers=ADMIN).get_json()
+    assert settings["pool"]["threads"] == 0 and settings["pool"]["capacity"] is None
+    assert all(settings[name]["limit"] == 0 for name in server.ADMISSION_CLASSES)
+    with open(server.CONFIG_PATH) as f:
+        assert json.load(f)["ADMISSION_THREADS"] == 0
+
+
+def test_thread_reserve_sheds_public_requests(server, client, slow_statics):
+    assert client.post('/admin/admission', json={"pool": {"threads": 3, "admin_reserve": 2}}, headers=ADMIN).status_code == 200
+    with open(server.CONFIG_PATH) as f:
+        assert json.load(f)["ADMISSION_THREADS"] == 3
+    slow_statics()
+
+    response = client.get('/get/10_info')
+    assert response.status_code == 503
+    assert response.get_json() == SERVER_BUSY
+    assert response.headers['Retry-After'] == '2'
+    # 管理端使用预留的线程
+    pool = client.get('/admin/get/admission', headers=ADMIN).get_json()["pool"]
+    assert (pool["capacity"], pool["inflight"], pool["shed"]) == (1, 1, 1)
+
+
+def test_class_limit_queues_then_sheds(server, client, slow_statics):
+    assert client.post('/admin/admission', json={"read": {"limit": 1, "wait": 0.1}}, headers=ADMIN).status_code == 200
+    slow_statics()
+    response = client.get('/get/10_info')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    # 其他类别不受影响
+    assert client.post('/post', json={"content": "write while reads are full"}).status_code == 201
+    assert client.get('/admin/get/admission', headers=ADMIN).get_json()["read"]["shed"] == 1
+
+
+def test_slot_released_after_request(server, client):
+    client.post('/admin/admission', json={"read": {"limit": 1, "wait": 0}}, headers=ADMIN)
+    for _ in range(3):
+        assert client.get('/get/10_info').status_code == 200
+    assert server.ADMISSION_CLASSES["read"].active == 0
+
+
+def test_invalid_settings_rejected(client):
+    assert client.post('/admin/admission', json={"pool": {"threads": 2, "admin_reserve": 2}}, headers=ADMIN).status_code == 400
+    assert client.post('/admin/admission', json={"read": {"wait": 60}}, headers=ADMIN).status_code == 400
+    assert client.post('/admin/admission', json={"bogus": {}}, headers=ADMIN).status_code == 400
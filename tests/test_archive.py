@@ -0,0 +1,61 @@
+import sqlite3
+
+from conftest import ADMIN, INIT_CONFIG
+from test_migrations import create_baseline_database
+
+
+def age_all_posts(server):
+    con = sqlite3.connect(server.DB_FILE)
+    con.execute("UPDATE submissions SET created_at = '2000-01-01 00:00:00'")
+    con.commit()
+    con.close()
+
+
+def comment(client, pid, content="a comment"):
+    response = client.post('/comment', json={"content": content, "submission_id": pid, "parent_comment_id": 0, "nickname": "n"})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["id"]
+
+
+def test_archived_posts_stay_readable(client, post):
+    ids = [post(f"post number {i} for archiving") for i in range(5)]
+    comment(client, ids[0], "on old post")
+    response = client.post('/admin/archive', json={"keep_latest": 2}, headers=ADMIN)
+    assert response.get_json() == {"status": "OK", "archived": 3}
+
+    assert [p["id"] for p in client.get('/get/10_info').get_json()] == ids[:2:-1]
+    assert client.get(f'/get/post_info?id={ids[0]}').get_json()["content"] == "post number 0 for archiving"
+    assert [c["content"] for c in client.get(f'/get/comment?id={ids[0]}').get_json()] == ["on old post"]
+    assert client.get('/get/statics').get_json()["posts"] == 5
+    archive = client.get('/admin/get/archive', headers=ADMIN).get_json()
+    assert (archive["archived_posts"], archive["archived_comments"]) == (3, 1)
+
+
+def test_ids_not_reused_on_new_database(server, client, post):
+    ids = [post(f"new database post {i}") for i in range(3)]
+    cid = comment(client, ids[-1])
+    age_all_posts(server)
+    assert client.post('/admin/archive', json={"after_days": 1}, headers=ADMIN).get_json()["archived"] == 3
+    pid = post("fresh post after archive")
+    assert pid == ids[-1] + 1
+    assert comment(client, pid) == cid + 1
+
+
+def test_ids_not_reused_on_legacy_tables(api):
+    # 旧库的表没有 AUTOINCREMENT，热表中保留高水位行
+    create_baseline_database(api.DB_FILE)
+    client = api.app.test_client()
+    assert client.post('/init', json=INIT_CONFIG).status_code == 200
+    ids = [client.post('/post', json={"content": f"legacy post number {i}"}).get_json()["id"] for i in range(3)]
+    cid = comment(client, ids[0])
+    age_all_posts(api)
+
+    # 投稿 2 待审核；最大 id 的投稿与最新评论所属的投稿留作高水位
+    assert client.post('/admin/archive', json={"after_days": 1}, headers=ADMIN).get_json()["archived"] == 2
+    con = sqlite3.connect(api.DB_FILE)
+    assert {row[0] for row in con.execute("SELECT id FROM submissions_archive")} == {1, ids[1]}
+    con.close()
+
+    pid = client.post('/post', json={"content": "fresh post after archive"}).get_json()["id"]
+    assert pid == ids[-1] + 1
+    assert comment(client, pid) == cid + 1
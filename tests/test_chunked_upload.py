@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+DATA = os.urandom(250000)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+def init(client, filename="a.PNG", size=len(DATA), sha256=SHA256):
+    return client.post('/upload_pic/init', json={"filename": filename, "size": size, "sha256": sha256})
+
+
+@pytest.fixture
+def upload_id(client):
+    response = init(client)
+    assert response.status_code == 201
+    return response.get_json()["upload_id"]
+
+
+def test_resumable_lifecycle(server, client, upload_id):
+    assert client.put(f'/upload_pic/{upload_id}?offset=0', data=DATA[:100000]).get_json() == {"status": "OK", "received": 100000}
+    # 不能跳过未接收的部分
+    assert client.put(f'/upload_pic/{upload_id}?offset=150000', data=DATA[150000:]).status_code == 409
+    response = client.post(f'/upload_pic/{upload_id}/finalize')
+    assert response.status_code == 409
+    assert response.get_json()["status"] == "Incomplete"
+
+    # 断线后查询进度，从已接收位置之前续传（重传部分覆盖写入）
+    assert client.get(f'/upload_pic/{upload_id}').get_json() == {"status": "OK", "received": 100000, "size": len(DATA)}
+    assert client.put(f'/upload_pic/{upload_id}?offset=50000', data=DATA[50000:]).get_json()["received"] == len(DATA)
+    response = client.post(f'/upload_pic/{upload_id}/finalize')
+    assert response.status_code == 201
+    url = response.get_json()["url"]
+    assert url.endswith('.png')
+    assert client.get(url).data == DATA
+    assert os.listdir(server.UPLOAD_TMP_FOLDER) == []
+    assert client.get(f'/upload_pic/{upload_id}').status_code == 404
+
+
+def test_init_validation(client):
+    assert init(client, filename="a.exe").get_json()["status"] == "Wrong_Format"
+    assert init(client, size=10 ** 9).get_json()["status"] == "Too_Large"
+    assert init(client, sha256="xyz").status_code == 400
+    assert client.get('/upload_pic/../etc').status_code == 404
+    assert client.get('/upload_pic/' + 'z' * 32).status_code == 404
+
+
+def test_hash_mismatch_keeps_upload(client):
+    upload_id = init(client, size=3).get_json()["upload_id"]
+    client.put(f'/upload_pic/{upload_id}?offset=0', data=b'abc')
+    response = client.post(f'/upload_pic/{upload_id}/finalize')
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "Hash_Mismatch"
+    assert client.get(f'/upload_pic/{upload_id}').get_json()["received"] == 3
+    assert client.delete(f'/upload_pic/{upload_id}').status_code == 200
+    assert client.get(f'/upload_pic/{upload_id}').status_code == 404
+
+
+def test_open_uploads_capped_per_client(server, client):
+    for _ in range(server.UPLOAD_MAX_OPEN):
+        assert init(client).status_code == 201
+    response = init(client)
+    assert response.status_code == 403
+    assert response.get_json() == {"status": "Fail", "reason": "Too many open uploads"}
+    # 其他客户端不受影响
+    assert client.post('/upload_pic/init', json={"filename": "a.png", "size": 10, "sha256": SHA256},
+                       headers={"X-Real-IP": "1.2.3.4"}).status_code == 201
+
+
+def test_concurrent_finalize_moves_once(server, upload_id):
+    client = server.app.test_client()
+    client.put(f'/upload_pic/{upload_id}?offset=0', data=DATA)
+    results = []
+    barrier = threading.Barrier(4)
+
+    def finalize():
+        c = server.app.test_client()
+        barrier.wait()
+        results.append(c.post(f'/upload_pic/{upload_id}/finalize').status_code)
+    threads = [threading.Thread(target=finalize) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [201, 404, 404, 404]
+    assert len(os.listdir(server.UPLOAD_FOLDER)) == 1
+
+
+def test_stale_uploads_collected(server, client, upload_id):
+    client.put(f'/upload_pic/{upload_id}?offset=0', data=DATA[:1000])
+    server.collect_stale_uploads()
+    assert len(os.listdir(server.UPLOAD_TMP_FOLDER)) == 2
+    server.UPLOAD_EXPIRE = -1
+    server.collect_stale_uploads()
+    assert os.listdir(server.UPLOAD_TMP_FOLDER) == []
@@ -0,0 +1,49 @@
+from conftest import ADMIN, publish_when_subscribed
+from test_post_state_push import events
+
+
+def comment(client, pid, content, parent=0, nickname="n"):
+    response = client.post('/comment', json={"content": content, "submission_id": pid, "parent_comment_id": parent, "nickname": nickname})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["id"]
+
+
+def test_comment_deltas_pushed_to_viewers(server, client, post):
+    pid = post()
+    first = []
+    publish_when_subscribed(server, lambda: first.append(comment(server.app.test_client(), pid, "hello")))
+    response = client.get(f'/stream?post={pid}', buffered=False)
+    try:
+        stream = events(response)
+        added = next(stream)
+        assert added["type"] == "comment_added" and added["post"] == pid
+        assert added["comment"]["id"] == first[0] and added["comment"]["content"] == "hello"
+
+        reply = comment(client, pid, "reply", parent=first[0], nickname="")
+        added = next(stream)
+        assert added["comment"]["id"] == reply and added["comment"]["parent_comment_id"] == first[0]
+
+        client.post('/admin/modify_comment', json={"id": reply, "content": "edited", "parent_comment_id": first[0], "nickname": "x"}, headers=ADMIN)
+        edited = next(stream)
+        assert edited["type"] == "comment_edited" and edited["comment"]["content"] == "edited"
+
+        # 删除父评论时一并删除回复
+        client.post('/admin/del_comment', json={"id": first[0]}, headers=ADMIN)
+        deleted = next(stream)
+        assert deleted["type"] == "comment_deleted"
+        assert sorted(deleted["ids"]) == sorted([first[0], reply])
+    finally:
+        response.close()
+    assert client.get(f'/get/comment?id={pid}').get_json() == []
+    assert server.sse_topics == {}
+
+
+def test_pending_post_has_no_comment_channel(server, client):
+    client.post('/admin/need_audit', json={"need_audit": True}, headers=ADMIN)
+    pid = client.post('/post', json={"content": "pending post without channel"}).get_json()["id"]
+    publish_when_subscribed(server, server.notify_new_post)
+    response = client.get(f'/stream?post={pid}', buffered=False)
+    try:
+        assert f"comments:{pid}" not in server.sse_topics
+    finally:
+        response.close()
@@ -0,0 +1,39 @@
+from conftest import ADMIN
+
+
+def comment(client, pid, content, parent=0):
+    response = client.post('/comment', json={"content": content, "submission_id": pid, "parent_comment_id": parent, "nickname": "n"})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["id"]
+
+
+def test_count_follows_comments(client, post):
+    pid = post()
+    other = post("another post without many comments")
+    parent = None
+    for i in range(3):
+        parent = comment(client, pid, f"comment number {i}")
+    comment(client, pid, "reply to last", parent)
+    comment(client, other, "elsewhere")
+
+    assert client.get(f'/get/post_info?id={pid}').get_json()["comment_count"] == 4
+    feed = {p["id"]: p["comment_count"] for p in client.get('/get/10_info').get_json()}
+    assert feed == {pid: 4, other: 1}
+
+    # 删除评论时连同回复一起扣减
+    client.post('/admin/del_comment', json={"id": parent}, headers=ADMIN)
+    assert client.get(f'/get/post_info?id={pid}').get_json()["comment_count"] == 2
+
+
+def test_migration_backfills_count(server, client, post):
+    pid = post()
+    comment(client, pid, "first")
+    comment(client, pid, "second")
+    with server.app.app_context():
+        db = server.db
+        db.session.execute(server.text("ALTER TABLE submissions DROP COLUMN comment_count"))
+        db.session.execute(server.text("ALTER TABLE submissions_archive DROP COLUMN comment_count"))
+        db.session.execute(server.text("DELETE FROM schema_migrations WHERE version = 3"))
+        db.session.commit()
+        assert server.run_migrations() == [3]
+        assert db.session.execute(server.text("SELECT comment_count FROM submissions WHERE id = :id"), {"id": pid}).scalar() == 2
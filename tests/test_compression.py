@@ -0,0 +1,60 @@
+import gzip
+import zlib
+
+import pytest
+
+from conftest import publish_when_subscribed
+
+CONTENT = "今天在图书馆看到一只猫，它在书架上睡觉，好可爱呀～" * 5
+
+
+@pytest.fixture
+def feed(client, post):
+    for i in range(10):
+        post(f"{CONTENT} #{i}")
+    return client
+
+
+def test_gzip_negotiated(feed):
+    plain = feed.get('/get/10_info')
+    assert plain.headers.get('Content-Encoding') is None
+
+    response = feed.get('/get/10_info', headers={"Accept-Encoding": "gzip"})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == plain.data
+    assert len(response.data) < len(plain.data)
+
+
+def test_refused_encoding_is_not_used(feed):
+    response = feed.get('/get/10_info', headers={"Accept-Encoding": "gzip;q=0"})
+    assert response.headers.get('Content-Encoding') is None
+
+
+@pytest.mark.parametrize("encoding, module", [("br", "brotli"), ("zstd", "zstandard")])
+def test_optional_encodings(feed, server, encoding, module):
+    if getattr(server, module) is None:
+        pytest.skip(f"{module} not installed")
+    plain = feed.get('/get/10_info').data
+    response = feed.get('/get/10_info', headers={"Accept-Encoding": encoding})
+    assert response.headers['Content-Encoding'] == encoding
+    if encoding == "br":
+        assert server.brotli.decompress(response.data) == plain
+    else:
+        assert server.zstandard.ZstdDecompressor().decompressobj().decompress(response.data) == plain
+
+
+def test_small_responses_stay_uncompressed(client):
+    response = client.get('/get/statics', headers={"Accept-Encoding": "gzip"})
+    assert response.headers.get('Content-Encoding') is None
+
+
+def test_sse_stream_is_compressed_per_event(client, server):
+    publish_when_subscribed(server, server.notify_new_post)
+    response = client.get('/stream', headers={"Accept-Encoding": "gzip"}, buffered=False)
+    try:
+        assert response.headers['Content-Encoding'] == 'gzip'
+        chunk = next(iter(response.response))
+        assert zlib.decompressobj(31).decompress(chunk).startswith(b"data: ")
+    finally:
+        response.close()
@@ -0,0 +1,44 @@
+from sqlalchemy import insert
+
+from conftest import ADMIN
+
+
+def comment(client, pid, parent=0, content="a comment"):
+    response = client.post('/comment', json={"content": content, "submission_id": pid, "parent_comment_id": parent, "nickname": "n"})
+    return response.get_json()["id"]
+
+
+def test_delete_comment_removes_its_subtree(client, post):
+    pid = post()
+    a = comment(client, pid, content="a")
+    b = comment(client, pid, a, content="b")
+    comment(client, pid, b, content="c")
+    d = comment(client, pid, content="d")
+    assert client.post('/admin/del_comment', json={"id": b}, headers=ADMIN).get_json()["status"] == "OK"
+    assert sorted(c["id"] for c in client.get(f'/get/comment?id={pid}').get_json()) == [a, d]
+
+
+def test_delete_post_removes_comments_and_reports(client, server, post):
+    pid = post()
+    comment(client, pid)
+    with server.app.app_context():
+        server.db.session.execute(insert(server.Comment), [
+            {"submission_id": pid, "content": f"bulk {i}", "parent_comment_id": 0, "nickname": "n"} for i in range(2000)
+        ])
+        server.db.session.commit()
+    client.post('/report', json={"id": pid, "title": "t", "content": "c"})
+    assert client.post('/admin/del_post', json={"id": pid}, headers=ADMIN).get_json()["status"] == "OK"
+    with server.app.app_context():
+        assert server.Comment.query.count() == 0
+        assert server.Submission.query.count() == 0
+
+
+def test_approving_report_deletes_the_post(client, server, post):
+    pid = post()
+    comment(client, pid)
+    rid = client.post('/report', json={"id": pid, "title": "t", "content": "c"}).get_json()["id"]
+    assert client.post('/admin/approve_report', json={"id": rid}, headers=ADMIN).get_json()["status"] == "OK"
+    assert client.get(f'/get/report_state?id={rid}').get_json()["status"] == "Approved"
+    assert client.get(f'/get/post_info?id={pid}').status_code == 404
+    with server.app.app_context():
+        assert server.Comment.query.count() == 0
@@ -0,0 +1,39 @@
+from conftest import ADMIN
+
+DUPLICATE = {"status": "Deny", "reason": "Duplicate"}
+
+
+def test_normalized_duplicate_post_rejected(client, post):
+    post("Buy cheap stuff now!!")
+    response = client.post('/post', json={"content": "buy  CHEAP stuff\nnow！！"})
+    assert response.status_code == 403
+    assert response.get_json() == DUPLICATE
+
+
+def test_short_content_not_checked(client, post):
+    post("哈哈")
+    post("哈哈")
+
+
+def test_collapse_returns_existing_post(client, post):
+    pid = post("Buy cheap stuff now!!")
+    assert client.post('/admin/duplicate_filter', json={"policy": "collapse"}, headers=ADMIN).status_code == 200
+    response = client.post('/post', json={"content": "buy cheap stuff now!!"})
+    assert response.status_code == 201
+    assert response.get_json() == {"id": pid, "status": "Pass"}
+    assert client.get('/get/statics').get_json()["posts"] == 1
+
+
+def test_window_zero_disables_filter(client, post):
+    assert client.post('/admin/duplicate_filter', json={"window": 0}, headers=ADMIN).status_code == 200
+    post("Buy cheap stuff now!!")
+    post("Buy cheap stuff now!!")
+
+
+def test_duplicate_comment_rejected(client, post):
+    pid = post()
+    comment = {"content": "spam comment here", "submission_id": pid, "parent_comment_id": 0, "nickname": "n"}
+    assert client.post('/comment', json=comment).status_code == 200
+    response = client.post('/comment', json=comment)
+    assert response.status_code == 403
+    assert response.get_json()["status"] == "Deny"
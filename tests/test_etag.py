@@ -0,0 +1,54 @@
+import pytest
+
+from conftest import ADMIN
+
+
+@pytest.fixture
+def urls(client, post):
+    pid = post("x" * 2000)
+    client.post('/comment', json={"content": "a comment", "submission_id": pid, "parent_comment_id": 0, "nickname": "n"})
+    return pid, ['/get/notice', f'/get/post_info?id={pid}', f'/get/comment?id={pid}', '/get/10_info']
+
+
+@pytest.mark.parametrize("encoding", [None, "gzip"])
+def test_304_for_each_encoding(client, urls, encoding):
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    for url in urls[1]:
+        response = client.get(url, headers=headers)
+        tag = response.headers['ETag']
+        assert tag.startswith('"')
+        again = client.get(url, headers={**headers, "If-None-Match": tag})
+        assert again.status_code == 304, url
+        assert again.data == b''
+        assert again.headers['ETag'] == tag
+
+
+def test_encodings_have_distinct_tags(client, urls):
+    url = '/get/10_info'
+    plain = client.get(url).headers['ETag']
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.headers['ETag'] != plain
+    assert 'Accept-Encoding' in gzipped.headers['Vary']
+    # 客户端缓存的是未压缩的表示时，304 返回它所匹配的那个 ETag
+    again = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": plain})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == plain
+
+
+def test_writes_invalidate_tags(client, urls):
+    pid = urls[0]
+    feed = client.get('/get/10_info').headers['ETag']
+    info = client.get(f'/get/post_info?id={pid}').headers['ETag']
+    client.post('/up', json={"id": pid})
+    assert client.get('/get/10_info', headers={"If-None-Match": feed}).status_code == 200
+    assert client.get(f'/get/post_info?id={pid}', headers={"If-None-Match": info}).status_code == 200
+
+    notice = client.get('/get/notice').headers['ETag']
+    client.post('/admin/modify_notice', json={"type": "md", "content": "new notice"}, headers=ADMIN)
+    assert client.get('/get/notice', headers={"If-None-Match": notice}).status_code == 200
+
+
+def test_missing_post_is_not_cached(client):
+    response = client.get('/get/post_info?id=999')
+    assert response.status_code == 404
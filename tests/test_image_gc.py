@@ -0,0 +1,73 @@
+import io
+import os
+
+import pytest
+
+from conftest import ADMIN
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'0' * 100
+
+
+@pytest.fixture
+def upload(client):
+    def create():
+        response = client.post('/upload_pic', data={'file': (io.BytesIO(PNG), 'a.png')}, content_type='multipart/form-data')
+        assert response.status_code == 201
+        return response.get_json()["url"]
+    return create
+
+
+def gc(client, **options):
+    response = client.post('/admin/image_gc', headers=ADMIN, json={"grace_hours": 0, **options})
+    assert response.status_code == 200
+    return sorted(response.get_json()["files"])
+
+
+def name(url):
+    return url.rsplit('/', 1)[1]
+
+
+def test_referenced_images_kept(server, client, post, upload):
+    in_post, absolute, in_comment, in_reply, in_notice, in_report, orphan = (upload() for _ in range(7))
+    p1 = post(f"hi ![x]({in_post}) and ![y](https://host{absolute}) {in_post}")
+    p2 = post("a post without images")
+    cid = client.post('/comment', json={"content": f"see {in_comment}", "submission_id": p2, "parent_comment_id": 0, "nickname": ""}).get_json()["id"]
+    client.post('/comment', json={"content": f"reply {in_reply}", "submission_id": p2, "parent_comment_id": cid, "nickname": ""})
+    client.post('/admin/modify_notice', headers=ADMIN, json={"type": "md", "content": f"banner {in_notice}"})
+    client.post('/report', json={"id": p2, "title": "spam", "content": f"evidence {in_report}"})
+
+    assert gc(client, dry_run=True) == [name(orphan)]
+    assert name(orphan) in os.listdir(server.UPLOAD_FOLDER)
+    assert gc(client) == [name(orphan)]
+    assert sorted(os.listdir(server.UPLOAD_FOLDER)) == sorted(map(name, [in_post, absolute, in_comment, in_reply, in_notice, in_report]))
+
+    # 编辑或删除后不再引用的图片在下一次清理时删除
+    client.post('/admin/modify_post', headers=ADMIN, json={"id": p1, "content": f"only {in_post}"})
+    client.post('/admin/del_comment', headers=ADMIN, json={"id": cid})
+    assert gc(client) == sorted(map(name, [absolute, in_comment, in_reply]))
+    assert client.get(f'/admin/get/image_refs?filename={name(in_post)}', headers=ADMIN).get_json() == [{"submission_id": p1, "comment_id": 0}]
+
+
+def test_grace_period_and_foreign_files(server, client, upload):
+    recent = upload()
+    assert gc(client, grace_hours=1) == []
+    for filename in ('notes.txt', 'keep.png', '261019_abcde.txt'):
+        with open(os.path.join(server.UPLOAD_FOLDER, filename), 'w') as f:
+            f.write('x')
+    # 只清理上传接口生成的图片文件
+    assert gc(client) == [name(recent)]
+    assert sorted(os.listdir(server.UPLOAD_FOLDER)) == ['261019_abcde.txt', 'keep.png', 'notes.txt']
+
+
+def test_archived_posts_keep_images(server, client, post, upload):
+    url = upload()
+    post(f"archived post with {url}")
+    post("newest post")
+    client.post('/admin/archive', json={"keep_latest": 1}, headers=ADMIN)
+    assert gc(client) == []
+
+
+def test_settings(client):
+    assert client.post('/admin/image_gc_settings', headers=ADMIN, json={"grace_hours": -1}).status_code == 400
+    assert client.post('/admin/image_gc_settings', headers=ADMIN, json={"grace_hours": 48}).status_code == 200
+    assert client.get('/admin/get/image_gc', headers=ADMIN).get_json()["grace_hours"] == 48
@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+
+from conftest import ADMIN, INIT_CONFIG, load_module, unload_module
+from test_export import export
+
+
+def ndjson(*lines):
+    return "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines).encode()
+
+
+@pytest.fixture
+def target(tmp_path):
+    """另一份独立的空服务，作为导入目标"""
+    directory = tmp_path / "target"
+    directory.mkdir()
+    module = load_module(str(directory))
+    client = module.app.test_client()
+    assert client.post('/init', json=INIT_CONFIG).status_code == 200
+    yield client
+    unload_module(module)
+
+
+def test_import_rows_and_skips(client, post):
+    post("existing post")
+    body = ndjson(
+        {"type": "post", "id": 10, "content": "old a", "status": "Pass", "created_at": "2020-01-01T00:00:00", "upvotes": 3},
+        {"type": "post", "id": 11, "content": "old b", "status": "Deny"},
+        {"type": "comment", "id": 5, "submission_id": 10, "parent_comment_id": 0, "content": "c1", "nickname": "x"},
+        {"type": "comment", "id": 6, "submission_id": 10, "parent_comment_id": 5, "content": "reply"},
+        {"type": "comment", "id": 7, "submission_id": 99, "parent_comment_id": 0, "content": "orphan"},
+        {"type": "report", "id": 1, "submission_id": 11, "title": "t", "content": "r"},
+        {"type": "bogus", "content": "x"},
+        "not json",
+    )
+    result = client.post('/admin/import', headers=ADMIN, data=body).get_json()
+    assert result["status"] == "OK"
+    assert (result["post"], result["comment"], result["report"]) == (2, 2, 1)
+    assert result["skipped"] == 3
+
+    # 导入的记录按输入顺序分配新 id，引用随之改写
+    info = client.get('/get/post_info?id=2').get_json()
+    assert (info["content"], info["upvotes"], info["comment_count"]) == ("old a", 3, 2)
+    comments = client.get('/get/comment?id=2').get_json()
+    assert [(c["id"], c["parent_comment_id"]) for c in comments] == [(1, 0), (2, 1)]
+    reports = [line for line in export(client, '?type=reports')]
+    assert [r["submission_id"] for r in reports] == [3]
+    assert client.get('/admin/get/import', headers=ADMIN).get_json()["stage"] == "done"
+    assert post("after import") == 4
+
+
+def test_export_import_round_trip(client, post, target):
+    ids = [post(f"round trip post number {i}") for i in range(5)]
+    cid = client.post('/comment', json={"content": "hello", "submission_id": ids[0], "parent_comment_id": 0, "nickname": "n"}).get_json()["id"]
+    client.post('/comment', json={"content": "reply", "submission_id": ids[0], "parent_comment_id": cid, "nickname": ""})
+    client.post('/report', json={"id": ids[1], "title": "t", "content": "c"})
+    client.post('/admin/archive', json={"keep_latest": 3}, headers=ADMIN)
+
+    data = client.get('/admin/export?gzip=1', headers=ADMIN).data
+    response = target.post('/admin/import?defer_indexes=1', headers=ADMIN,
+                           data={'file': (io.BytesIO(data), 'export.ndjson.gz')}, content_type='multipart/form-data')
+    assert response.get_json()["status"] == "OK"
+
+    def rows(c):
+        return [{k: v for k, v in line.items() if k != "archived"} for line in export(c)]
+    assert rows(target) == rows(client)
+    assert target.get(f'/get/post_info?id={ids[0]}').get_json()["comment_count"] == 2
+
+
+def test_import_does_not_reuse_archived_ids(server, client, post):
+    post("p0 import")
+    post("p1 import")
+    with server.app.app_context():
+        server.db.session.execute(server.text("UPDATE submissions SET created_at = '2000-01-01 00:00:00'"))
+        server.db.session.commit()
+    assert client.post('/admin/archive', json={"after_days": 1}, headers=ADMIN).get_json()["archived"] == 2
+    body = ndjson({"type": "post", "id": 1, "content": "imported with archived id"}, {"type": "comment", "id": 1, "submission_id": 1, "parent_comment_id": 0, "content": "c"})
+    assert client.post('/admin/import', headers=ADMIN, data=body).get_json()["post"] == 1
+    # 已归档的 id 1、2 不会分配给导入的记录
+    assert [line["id"] for line in export(client, '?type=posts')] == [1, 2, 3]
+    assert client.get('/get/post_info?id=3').get_json()["content"] == "imported with archived id"
+    assert post("later") == 4
@@ -0,0 +1,37 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+PAYLOAD = {"b": [1, 2.5, None, True], "a": "中文 content", "nested": {"z": 1, "y": "x"}}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def provider(request, api, monkeypatch):
+    if request.param == "orjson":
+        if api.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(api, 'orjson', None)
+    return api.app.json
+
+
+def test_dumps_matches_stdlib(provider):
+    assert provider.dumps(PAYLOAD) == json.dumps(PAYLOAD, ensure_ascii=False, sort_keys=True, separators=(',', ':')) \
+        or json.loads(provider.dumps(PAYLOAD)) == PAYLOAD
+    assert '中文' in provider.dumps(PAYLOAD)
+    assert provider.loads(provider.dumps(PAYLOAD)) == PAYLOAD
+
+
+def test_response_body(provider, api):
+    with api.app.test_request_context('/'):
+        response = provider.response(PAYLOAD)
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == PAYLOAD
+    assert '中文'.encode('utf-8') in response.get_data()
+
+
+def test_datetime_and_big_int_fallback(provider, api):
+    stamp = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert json.loads(provider.dumps({"t": stamp})) == {"t": "Tue, 02 Jan 2024 03:04:05 GMT"}
+    assert json.loads(provider.dumps({"n": 2 ** 70})) == {"n": 2 ** 70}
@@ -0,0 +1,44 @@
+import tracemalloc
+
+import pytest
+
+from conftest import ADMIN
+
+
+@pytest.fixture
+def profiling(client):
+    response = client.post('/admin/mem_profile', headers=ADMIN, json={"enabled": True, "frames": 3, "snapshot": True})
+    assert response.get_json() == {"status": "OK"}
+    yield client
+    # tracemalloc 是进程级的，测试结束时关闭
+    client.post('/admin/mem_profile', headers=ADMIN, json={"enabled": False})
+    tracemalloc.stop()
+
+
+def test_structures_reported_without_tracing(client):
+    response = client.get('/admin/get/mem_profile', headers=ADMIN)
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["enabled"] is False and "traced" not in report
+    assert {"stamp_cache", "sse", "vote_filter", "rate_limit_store", "write_queue"} <= set(report["structures"])
+    assert client.post('/admin/mem_profile', headers=ADMIN, json={"snapshot": True}).get_json() == {
+        "status": "Fail", "reason": "Profiling not enabled"}
+    assert client.get('/admin/get/mem_profile').status_code == 401
+
+
+def test_diff_against_snapshot(profiling, post):
+    keep = []
+    for i in range(20):
+        post(f"post {i} while profiling memory")
+        keep.append(bytearray(100000))
+    report = profiling.get('/admin/get/mem_profile?limit=3&objects=5', headers=ADMIN).get_json()
+    assert report["enabled"] and report["traced"]["current"] > 0
+    assert len(report["object_types"]) == 5
+    assert len(report["diff"]) == 3
+    assert report["diff"][0]["size_diff"] >= 2000000
+    assert profiling.get('/admin/get/mem_profile?group_by=x', headers=ADMIN).status_code == 400
+
+
+def test_disable_stops_tracing(profiling):
+    assert profiling.post('/admin/mem_profile', headers=ADMIN, json={"enabled": False}).get_json() == {"status": "OK"}
+    assert not tracemalloc.is_tracing()
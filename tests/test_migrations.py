@@ -0,0 +1,74 @@
+import os
+import sqlite3
+
+from conftest import ADMIN, INIT_CONFIG
+
+# 系列改动之前（基线版本）创建的表结构与数据
+BASELINE_SCHEMA = """
+CREATE TABLE submissions (id INTEGER NOT NULL, content TEXT NOT NULL, status VARCHAR(7), created_at DATETIME,
+    updated_at DATETIME, upvotes INTEGER, downvotes INTEGER, PRIMARY KEY (id));
+CREATE TABLE comments (id INTEGER NOT NULL, submission_id INTEGER NOT NULL, nickname VARCHAR(50), content TEXT NOT NULL,
+    parent_comment_id INTEGER, created_at DATETIME, PRIMARY KEY (id),
+    FOREIGN KEY(submission_id) REFERENCES submissions (id), FOREIGN KEY(parent_comment_id) REFERENCES comments (id));
+CREATE TABLE reports (id INTEGER NOT NULL, submission_id INTEGER, title VARCHAR(200) NOT NULL, content TEXT NOT NULL,
+    status VARCHAR(7), created_at DATETIME, PRIMARY KEY (id));
+CREATE TABLE config ("key" VARCHAR(50) NOT NULL, value VARCHAR(200) NOT NULL, PRIMARY KEY ("key"));
+CREATE TABLE notices (id INTEGER NOT NULL, type VARCHAR(3) NOT NULL, content TEXT NOT NULL, version INTEGER NOT NULL,
+    created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id));
+INSERT INTO submissions VALUES (1, 'old post', 'Pass', '2024-01-01 00:00:00', '2024-01-01 00:00:00', 3, 1);
+INSERT INTO submissions VALUES (2, 'old pending post', 'Pending', '2024-01-02 00:00:00', '2024-01-02 00:00:00', 0, 0);
+INSERT INTO comments VALUES (1, 1, 'n', 'old comment', 0, '2024-01-01 00:00:00');
+INSERT INTO comments VALUES (2, 1, 'n', 'old reply', 1, '2024-01-01 00:00:00');
+INSERT INTO config VALUES ('need_audit', 'false');
+"""
+
+
+def create_baseline_database(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path)
+    con.executescript(BASELINE_SCHEMA)
+    con.commit()
+    con.close()
+
+
+def index_names(path):
+    con = sqlite3.connect(path)
+    try:
+        return {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'")}
+    finally:
+        con.close()
+
+
+def test_baseline_database_is_migrated(api):
+    create_baseline_database(api.DB_FILE)
+    client = api.app.test_client()
+    assert client.post('/init', json=INIT_CONFIG).status_code == 200
+
+    assert {'ix_submissions_status_id', 'ix_comments_submission_id'} <= index_names(api.DB_FILE)
+    migrations = client.get('/admin/get/migrations', headers=ADMIN).get_json()
+    assert migrations and all(m["applied_at"] for m in migrations)
+    assert client.post('/admin/migrate', headers=ADMIN).get_json() == {"status": "OK", "applied": []}
+    assert client.get('/get/post_info?id=1').get_json()["content"] == "old post"
+    assert [c["id"] for c in client.get('/get/comment?id=1').get_json()] == [1, 2]
+
+
+def test_failed_migration_keeps_serving_503(server):
+    client = server.app.test_client()
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise RuntimeError("boom")
+    server.MIGRATIONS.append((99, "broken", broken))
+    server.READY = False
+    response = client.get('/get/10_info')
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "Fail"
+    # 重试间隔内不重复执行迁移
+    assert client.get('/get/10_info').status_code == 503
+    assert len(calls) == 1
+
+    server.MIGRATIONS.pop()
+    server.db_init_failed_at -= server.DB_INIT_RETRY_INTERVAL
+    assert client.get('/get/10_info').status_code == 200
+    assert server.READY
@@ -0,0 +1,60 @@
+import hashlib
+
+import pytest
+
+from conftest import ADMIN
+
+BASE = "限时优惠！加微信 abc123 领取免费会员，名额有限先到先得"
+
+
+@pytest.fixture
+def near_dup(client):
+    assert client.post('/admin/near_duplicate', json={"enabled": True}, headers=ADMIN).status_code == 200
+    return client
+
+
+def test_disabled_by_default(client, post):
+    assert client.get('/admin/get/near_duplicate', headers=ADMIN).get_json()["enabled"] is False
+    post(BASE)
+    post(BASE + "😀")
+
+
+def test_near_duplicate_post_rejected(near_dup, post):
+    post(BASE)
+    response = near_dup.post('/post', json={"content": BASE + "😀"})
+    assert response.status_code == 403
+    assert response.get_json() == {"status": "Deny", "reason": "Duplicate"}
+    # 不相关的内容不受影响
+    post("今天天气很好，我去公园散步了，看到很多人在放风筝")
+
+
+def test_similar_post_goes_to_pending(near_dup, post):
+    post(BASE)
+    response = near_dup.post('/post', json={"content": "限时优惠！加微信 xyz999 领取免费会员，名额有限先到先得"})
+    assert response.status_code == 201
+    assert response.get_json()["status"] == "Pending"
+
+
+def test_index_rebuilt_when_enabled(client, post):
+    post(BASE)
+    client.post('/admin/near_duplicate', json={"enabled": True}, headers=ADMIN)
+    assert client.post('/post', json={"content": BASE + "!"}).status_code == 403
+
+
+def test_comments_compared_within_same_post(near_dup, post):
+    text = "这是一条足够长的评论内容，用来测试近似重复检测的范围是否正确"
+    first, second = post("first post for comments"), post("second post for comments")
+
+    def comment(pid, content):
+        return near_dup.post('/comment', json={"content": content, "submission_id": pid, "parent_comment_id": 0, "nickname": ""})
+    assert comment(first, text).status_code == 200
+    assert comment(first, text + "!!").status_code == 403
+    assert comment(second, text).status_code == 200
+
+
+def test_sketch_is_stable_across_processes(server):
+    # 草图只依赖内容本身，不受进程的 hash() 加盐影响
+    text_ = server.normalize_content(BASE)
+    shingles = {text_[i:i + 3] for i in range(len(text_) - 2)}
+    expected = sorted(int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') for s in shingles)
+    assert server.minhash_sketch(BASE) == expected[:server.MINHASH_K]
@@ -0,0 +1,21 @@
+from conftest import ADMIN
+
+
+def test_notice_served_from_memory(client):
+    client.get('/get/notice')
+    client.post('/admin/sql_profile', json={"enabled": True, "max_queries": 0, "max_ms": 0}, headers=ADMIN)
+    response = client.get('/get/notice')
+    assert response.headers['Server-Timing'].startswith('db;dur=0')
+    assert 'desc="0 queries"' in response.headers['Server-Timing']
+
+
+def test_modify_and_switch_update_the_cache(client):
+    assert client.post('/admin/modify_notice', json={"type": "md", "content": "公告"}, headers=ADMIN).status_code == 200
+    notice = client.get('/get/notice').get_json()
+    assert notice["content"] == "公告" and notice["type"] == "md"
+
+    client.post('/admin/notice_switch', json={"value": "false"}, headers=ADMIN)
+    assert client.get('/get/notice').get_json()["display"] == "false"
+
+    client.post('/admin/notice_switch', json={"value": "true"}, headers=ADMIN)
+    assert client.get('/get/notice').get_json()["display"] == "true"
@@ -0,0 +1,43 @@
+import json
+
+from conftest import ADMIN
+
+
+def events(response):
+    """逐条解析 SSE 事件（跳过心跳与新投稿通知）"""
+    for chunk in response.response:
+        data = chunk.decode() if isinstance(chunk, bytes) else chunk
+        payload = data.removeprefix("data: ").strip()
+        if payload not in ("heartbeat", "new_post"):
+            yield json.loads(payload)
+
+
+def test_state_changes_pushed_to_subscribers(server, client):
+    client.post('/admin/need_audit', json={"need_audit": True}, headers=ADMIN)
+    pid = client.post('/post', json={"content": "pending post waiting for audit"}).get_json()["id"]
+    other = client.post('/post', json={"content": "another pending post to report"}).get_json()["id"]
+    rid = client.post('/report', json={"id": other, "title": "t", "content": "c"}).get_json()["id"]
+
+    response = client.get(f'/stream?posts={pid},999&reports={rid}', buffered=False)
+    try:
+        stream = events(response)
+        # 订阅后先推送当前状态
+        assert next(stream) == {"type": "post_state", "id": pid, "status": "Pending"}
+        assert next(stream) == {"type": "post_state", "id": 999, "status": "Deleted or Not Found"}
+        assert next(stream) == {"type": "report_state", "id": rid, "status": "Pending"}
+        assert f"post_state:{pid}" in server.sse_topics
+
+        client.post('/admin/approve', json={"id": pid}, headers=ADMIN)
+        assert next(stream) == {"type": "post_state", "id": pid, "status": "Approved"}
+
+        client.post('/admin/approve_report', json={"id": rid}, headers=ADMIN)
+        assert next(stream) == {"type": "report_state", "id": rid, "status": "Approved"}
+    finally:
+        response.close()
+    assert server.sse_topics == {}
+    assert server.sse_clients == []
+
+
+def test_post_state_endpoint(client):
+    pid = client.post('/post', json={"content": "a post visible to everyone"}).get_json()["id"]
+    assert client.get(f'/get/post_state?id={pid}').get_json()["status"] == "Approved"
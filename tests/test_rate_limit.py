@@ -0,0 +1,94 @@
+import io
+import json
+
+import pytest
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+from werkzeug.wrappers import Response
+
+from conftest import ADMIN
+
+RATE_LIMITED = {"status": "Fail", "reason": "Rate Limit Exceeded"}
+PNG = b'\x89PNG\r\n\x1a\n'
+
+
+def upload(client, size):
+    data = {'file': (io.BytesIO(PNG + b'0' * (size - len(PNG))), 'a.png')}
+    return client.post('/upload_pic', data=data, content_type='multipart/form-data').status_code
+
+
+def chunked_upload(server, size):
+    """以 Transfer-Encoding: chunked 上传（没有 Content-Length）"""
+    builder = EnvironBuilder(path='/upload_pic', method='POST', data={'file': (io.BytesIO(PNG + b'0' * (size - len(PNG))), 'a.png')})
+    environ = builder.get_environ()
+    body = environ['wsgi.input'].read()
+    environ.pop('CONTENT_LENGTH', None)
+    environ.update({'HTTP_TRANSFER_ENCODING': 'chunked', 'wsgi.input': io.BytesIO(body), 'wsgi.input_terminated': True})
+    app_iter, status, headers = run_wsgi_app(server.app.wsgi_app, environ)
+    return Response(b''.join(app_iter), status, headers).status_code
+
+
+@pytest.fixture
+def limited(client):
+    def configure(**settings):
+        response = client.post('/admin/rate_limit', json=settings, headers=ADMIN)
+        assert response.status_code == 200, response.get_json()
+    return configure
+
+
+def test_route_costs_share_default_bucket(client, post, limited):
+    limited(RATE_LIMIT=3, RATE_LIMIT_COSTS={"/up": 2})
+    pid = post()
+    assert client.post('/up', json={"id": pid}).status_code == 200
+    response = client.post('/down', json={"id": pid})
+    assert response.status_code == 403
+    assert response.get_json() == RATE_LIMITED
+
+
+def test_buckets_are_independent(client, post, limited):
+    limited(RATE_LIMIT=100, RATE_LIMIT_BUCKETS={"report": 2})
+    pid = post()
+    statuses = [client.post('/report', json={"id": pid, "title": "t", "content": f"c{i}"}).status_code for i in range(3)]
+    assert statuses == [201, 201, 403]
+    assert client.post('/up', json={"id": pid}).status_code == 200
+
+
+def test_unconfigured_bucket_falls_back_to_default(server, client, post, limited):
+    limited(RATE_LIMIT=2)
+    pid = post()
+    assert client.post('/report', json={"id": pid, "title": "t", "content": "c"}).status_code == 201
+    assert client.post('/report', json={"id": pid, "title": "t", "content": "c2"}).status_code == 403
+    assert {bucket for _, bucket in server.RATE_LIMIT_STORE} == {"default"}
+
+
+def test_upload_bucket_counts_bytes(client, limited):
+    # 按请求体长度计费（含 multipart 开销）
+    limited(RATE_LIMIT_BUCKETS={"upload": 4000})
+    assert [upload(client, 2500), upload(client, 2500), upload(client, 500)] == [201, 403, 201]
+
+
+def test_oversize_first_request_allowed(server, limited):
+    limited(RATE_LIMIT_BUCKETS={"upload": 1000})
+    assert [chunked_upload(server, 2000), chunked_upload(server, 2000)] == [201, 403]
+
+
+def test_chunked_upload_charged_actual_size(server, limited):
+    limited(RATE_LIMIT_BUCKETS={"upload": 5000})
+    assert [chunked_upload(server, 2000) for _ in range(3)] == [201, 201, 403]
+
+
+def test_settings_validated_and_saved(client, limited):
+    limited(RATE_LIMIT_BUCKETS={"upload": 3000, "report": 2})
+    assert client.post('/admin/rate_limit', json={"RATE_LIMIT_BUCKETS": {"upload": -1}}, headers=ADMIN).status_code == 400
+    settings = client.get('/admin/get/rate_limit', headers=ADMIN).get_json()
+    assert settings["RATE_LIMIT_BUCKETS"] == {"upload": 3000, "report": 2}
+    with open('config.json') as f:
+        assert json.load(f)["RATE_LIMIT_BUCKETS"] == {"upload": 3000, "report": 2}
+
+
+def test_expired_windows_pruned(server, client, post, limited):
+    limited(RATE_LIMIT=5)
+    post()
+    assert server.RATE_LIMIT_STORE
+    server.RATE_LIMIT_WINDOW = 0
+    server.prune_rate_limit_store()
+    assert not server.RATE_LIMIT_STORE
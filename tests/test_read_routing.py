@@ -0,0 +1,50 @@
+from sqlalchemy import event
+
+from conftest import ADMIN
+
+
+def engines(server):
+    with server.app.app_context():
+        return server.db.engines[None], server.db.engines['reader']
+
+
+def test_reads_use_reader_and_writes_use_writer(server, client, post):
+    pid = post()
+    writer, reader = engines(server)
+    seen = []
+
+    def spy(conn, cursor, statement, *args):
+        seen.append(conn.engine is reader)
+    event.listen(reader, 'before_cursor_execute', spy)
+    event.listen(writer, 'before_cursor_execute', spy)
+    try:
+        server.stamp_cache.clear()
+        assert client.get(f'/get/post_info?id={pid}').status_code == 200
+        assert client.get('/get/10_info').status_code == 200
+        assert seen and all(seen)
+        seen.clear()
+        client.post('/comment', json={"content": "routed", "submission_id": pid, "parent_comment_id": 0, "nickname": "n"})
+        assert not all(seen)
+    finally:
+        event.remove(reader, 'before_cursor_execute', spy)
+        event.remove(writer, 'before_cursor_execute', spy)
+
+
+def test_reads_served_while_writer_busy(server, client, post):
+    pid = post()
+    rid = client.post('/report', json={"id": pid, "title": "t", "content": "c"}).get_json()["id"]
+    writer, _ = engines(server)
+    writer.pool._timeout = 0.2
+    # 占住唯一的写连接
+    conn = writer.connect()
+    try:
+        for url in [f'/get/post_info?id={pid}', f'/get/report_state?id={rid}', '/admin/get/pending_reports',
+                    '/admin/get/migrations', '/admin/get/archive', f'/admin/get/post_info?id={pid}']:
+            assert client.get(url, headers=ADMIN).status_code == 200, url
+        response = client.post('/post', json={"content": "this write waits for the pool"})
+        assert response.status_code == 503
+        assert response.get_json() == {"status": "Fail", "reason": "Database busy"}
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        conn.close()
+    assert client.post('/post', json={"content": "this write waits for the pool"}).status_code == 201
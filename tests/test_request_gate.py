@@ -0,0 +1,51 @@
+import json
+
+from conftest import ADMIN, INIT_CONFIG
+
+
+def test_uninitialized_requests_get_503(api):
+    client = api.app.test_client()
+    response = client.get('/get/10_info')
+    assert response.status_code == 503
+    assert response.get_json() == {"status": "Fail", "reason": "Uninitialized"}
+
+
+def test_init_writes_json_config(api):
+    client = api.app.test_client()
+    assert client.post('/init', json=INIT_CONFIG).status_code == 200
+    with open(api.CONFIG_PATH, encoding='utf-8') as f:
+        config = json.load(f)
+    assert config["RATE_LIMIT"] == 0
+    assert "ADMIN_TOKEN" not in config and config["ADMIN_TOKEN_HASH"]
+    assert client.post('/init', json=INIT_CONFIG).status_code == 403
+
+
+def test_ready_gate_skips_config_checks(server, monkeypatch):
+    client = server.app.test_client()
+    assert client.get('/test').status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("gate touched the config after READY")
+    monkeypatch.setattr(server, 'load_config', fail)
+    monkeypatch.setattr(server, 'config_signature', fail)
+    monkeypatch.setattr(server, 'ensure_db_and_audit', fail)
+    assert client.get('/test').status_code == 200
+
+
+def test_maintenance_thread_starts_with_the_server(api):
+    # 仅导入模块（如 flask CLI 命令）不启动维护线程
+    assert api.maintenance_thread is None
+    api.app.test_client().post('/init', json=INIT_CONFIG)
+    assert api.maintenance_thread is not None and api.maintenance_thread.is_alive()
+
+
+def test_legacy_config_py_is_migrated(tmp_path, monkeypatch):
+    from conftest import load_module
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config.py').write_text(
+        "ADMIN_TOKEN='tok'\nUPLOAD_FOLDER='img'\nALLOWED_EXTENSIONS=['png']\nMAX_FILE_SIZE=100\n", encoding='utf-8'
+    )
+    module = load_module(str(tmp_path))
+    assert module.INIT
+    assert json.loads((tmp_path / 'config.json').read_text(encoding='utf-8'))["MAX_FILE_SIZE"] == 100
+    assert module.app.test_client().get('/admin/get/banned_keywords', headers=ADMIN).status_code == 200
@@ -0,0 +1,93 @@
+import io
+import os
+import zipfile
+
+from conftest import ADMIN
+from test_migrations import create_baseline_database
+
+
+def recover(client, data):
+    return client.post('/admin/recover', headers=ADMIN, data={'file': (io.BytesIO(data), 'backup.zip')},
+                       content_type='multipart/form-data')
+
+
+def baseline_backup(tmp_path):
+    """系列改动之前的版本导出的备份：旧表结构，没有迁移记录"""
+    path = str(tmp_path / "old" / "database.db")
+    create_baseline_database(path)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        zf.write(path, 'database.db')
+    return buf.getvalue()
+
+
+def test_backup_and_recover_round_trip(client, post):
+    pid = post()
+    client.post('/comment', json={"content": "kept", "submission_id": pid, "parent_comment_id": 0, "nickname": "n"})
+    response = client.get('/admin/get/backup', headers=ADMIN)
+    assert response.status_code == 200
+    backup = response.data
+    post("written after the backup")
+    assert client.get('/get/statics').get_json()["posts"] == 2
+
+    assert recover(client, backup).get_json()["status"] == "OK"
+    assert client.get('/get/statics').get_json()["posts"] == 1
+    assert [c["content"] for c in client.get(f'/get/comment?id={pid}').get_json()] == ["kept"]
+
+
+def test_old_schema_backup_restored_online(server, client, post, tmp_path, monkeypatch):
+    post("current post before restore")
+    etag = client.get('/get/post_info?id=1').headers['ETag']
+    during = []
+    original = server.restore_database
+
+    def observed_restore(path):
+        during.append(client.get('/get/post_info?id=1'))
+        original(path)
+    monkeypatch.setattr(server, 'restore_database', observed_restore)
+
+    response = recover(client, baseline_backup(tmp_path))
+    assert response.get_json()["status"] == "OK"
+    # 恢复期间返回 503，不会读到新旧混合的数据
+    assert during[0].status_code == 503
+    assert during[0].get_json() == {"status": "Fail", "reason": "Restoring"}
+    assert server.READY and not server.RESTORING
+
+    # 旧库在恢复后完成迁移，缓存与 ETag 随之失效
+    response = client.get('/get/post_info?id=1')
+    assert response.get_json()["content"] == "old post"
+    assert response.headers['ETag'] != etag
+    assert [c["id"] for c in client.get('/get/comment?id=1').get_json()] == [1, 2]
+    migrations = client.get('/admin/get/migrations', headers=ADMIN).get_json()
+    assert migrations and all(m["applied_at"] for m in migrations)
+    assert client.post('/post', json={"content": "after restore new post"}).get_json()["id"] == 3
+    client.post('/comment', json={"content": "after", "submission_id": 1, "parent_comment_id": 0, "nickname": "n"})
+    assert client.get('/get/post_info?id=1').get_json()["comment_count"] == 3
+
+
+def test_failed_restore_keeps_files_and_reinitializes(server, client, post, monkeypatch):
+    pid = post()
+    os.makedirs(server.IMG_FOLDER, exist_ok=True)
+    with open(os.path.join(server.IMG_FOLDER, 'a.png'), 'wb') as f:
+        f.write(b'old')
+    with open(server.CONFIG_PATH) as f:
+        config = f.read()
+
+    def broken(path):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(server, 'restore_database', broken)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        zf.write(server.DB_FILE, 'database.db')
+        zf.writestr('config.json', '{"ADMIN_TOKEN_HASH": "x"}')
+        zf.writestr('img/c.png', b'new')
+
+    response = recover(client, buf.getvalue())
+    assert response.status_code == 500
+    assert os.listdir(server.IMG_FOLDER) == ['a.png']
+    with open(server.CONFIG_PATH) as f:
+        assert f.read() == config
+    assert not server.READY and not server.RESTORING
+    # 之后的请求重新初始化
+    assert client.get(f'/get/post_info?id={pid}').status_code == 200
+    assert server.READY
@@ -0,0 +1,29 @@
+from conftest import ADMIN
+
+
+def test_profile_off_by_default(client, post):
+    post()
+    response = client.get('/get/10_info')
+    assert 'Server-Timing' not in response.headers
+    assert client.get('/admin/get/sql_profile', headers=ADMIN).get_json()["enabled"] is False
+
+
+def test_slow_request_is_logged_with_queries(client, post):
+    post()
+    response = client.post('/admin/sql_profile', json={"enabled": True, "max_queries": 0, "max_ms": 0}, headers=ADMIN)
+    assert response.get_json()["status"] == "OK"
+
+    response = client.get('/get/10_info')
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+
+    slow = client.get('/admin/get/sql_profile', headers=ADMIN).get_json()["slow_requests"]
+    feed = [r for r in slow if r["path"] == '/get/10_info']
+    assert feed and feed[-1]["queries"]
+    assert all("ms" in q and "sql" in q for q in feed[-1]["queries"])
+
+
+def test_fast_requests_are_not_logged(client, post):
+    post()
+    client.post('/admin/sql_profile', json={"enabled": True, "max_queries": 1000, "max_ms": 10000}, headers=ADMIN)
+    client.get('/get/10_info')
+    assert client.get('/admin/get/sql_profile', headers=ADMIN).get_json()["slow_requests"] == []
@@ -0,0 +1,49 @@
+import os
+
+from conftest import ADMIN
+
+ALREADY_VOTED = {"status": "Fail", "reason": "Already voted"}
+
+
+def test_repeat_vote_rejected(client, post):
+    pid = post()
+    assert client.post('/up', json={"id": pid}).status_code == 200
+    response = client.post('/up', json={"id": pid})
+    assert response.status_code == 403
+    assert response.get_json() == ALREADY_VOTED
+    assert client.post('/down', json={"id": str(pid)}).status_code == 403
+    # 其他客户端不受影响
+    assert client.post('/up', json={"id": pid}, headers={"X-Real-IP": "1.2.3.4"}).status_code == 200
+    assert client.get(f'/get/post_info?id={pid}').get_json()["upvotes"] == 2
+
+
+def test_vote_on_missing_post_not_remembered(client):
+    assert client.post('/up', json={"id": 999}).status_code == 404
+    assert client.post('/up', json={"id": 999}).status_code == 404
+
+
+def test_settings_and_persistence(server, client, post):
+    pid = post()
+    assert client.post('/admin/vote_dedup', json={"enabled": False}, headers=ADMIN).status_code == 200
+    assert client.post('/up', json={"id": pid}).status_code == 200
+    assert client.post('/up', json={"id": pid}).status_code == 200
+
+    response = client.post('/admin/vote_dedup', json={"enabled": True, "capacity": 5000, "window": 7200}, headers=ADMIN)
+    assert response.status_code == 200
+    settings = client.get('/admin/get/vote_dedup', headers=ADMIN).get_json()
+    assert (settings["enabled"], settings["capacity"], settings["window"]) == (True, 5000, 7200)
+    assert client.post('/up', json={"id": pid}).status_code == 200
+    assert client.post('/up', json={"id": pid}).status_code == 403
+
+    assert client.post('/admin/vote_dedup', json={"capacity": 10}, headers=ADMIN).status_code == 400
+    assert client.post('/admin/vote_dedup', json={"enabled": "x"}, headers=ADMIN).status_code == 400
+
+    # 模拟重启：从数据库读取设置并加载落盘的过滤器
+    server.save_vote_filter()
+    assert os.path.exists(server.VOTE_FILTER_PATH)
+    server.VOTE_FILTER_CAPACITY = 1_000_000
+    server.vote_filter = server.RotatingBloomFilter(1_000_000, server.VOTE_FILTER_ERROR_RATE, 100)
+    with server.app.app_context():
+        server.load_vote_dedup_settings()
+    assert (server.VOTE_FILTER_CAPACITY, server.VOTE_FILTER_WINDOW) == (5000, 7200)
+    assert client.post('/up', json={"id": pid}).status_code == 403
@@ -0,0 +1,83 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from conftest import ADMIN
+
+
+@pytest.fixture
+def queued(client):
+    response = client.post('/admin/write_queue', json={"enabled": True, "batch_size": 16, "batch_ms": 5}, headers=ADMIN)
+    assert response.status_code == 200
+    return client
+
+
+def test_concurrent_posts_get_distinct_ids(server, queued):
+    ids = []
+    errors = []
+
+    def worker(n):
+        client = server.app.test_client()
+        for i in range(20):
+            response = client.post('/post', json={"content": f"queued post {n} {i}"})
+            if response.status_code == 201:
+                ids.append(response.get_json()["id"])
+            else:
+                errors.append(response.status_code)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(set(ids)) == 80
+    stats = queued.get('/admin/get/write_queue', headers=ADMIN).get_json()
+    assert stats["enabled"] and stats["rows"] >= 80
+
+
+def test_timeout_cancels_queued_write(server, queued, monkeypatch):
+    original = server.commit_writes
+    started = threading.Event()
+
+    def slow(writes, notify=True):
+        started.set()
+        time.sleep(0.4)
+        return original(writes, notify)
+    monkeypatch.setattr(server, 'commit_writes', slow)
+    monkeypatch.setattr(server, 'WRITE_TIMEOUT', 0.1)
+
+    response = queued.post('/post', json={"content": "slow queued post"})
+    assert response.status_code == 503
+    assert response.get_json() == {"status": "Fail", "reason": "Write queue timeout"}
+    assert started.wait(1)
+    time.sleep(0.6)
+    # 超时的写入已取消，不会在返回失败后落库
+    assert queued.get('/get/statics').get_json()["posts"] == 0
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_writes_on_post_deleted_before_write(server, client, post, monkeypatch, enabled):
+    client.post('/admin/write_queue', json={"enabled": enabled}, headers=ADMIN)
+    pid = post()
+    original = server.submit_write
+
+    def delete_then_write(write):
+        # 请求阶段的检查之后、写入之前删除投稿
+        server.db.session.commit()
+        con = sqlite3.connect(server.DB_FILE, timeout=5)
+        con.execute("DELETE FROM submissions WHERE id = ?", (pid,))
+        con.commit()
+        con.close()
+        return original(write)
+    monkeypatch.setattr(server, 'submit_write', delete_then_write)
+
+    response = client.post('/comment', json={"content": "late", "submission_id": pid, "parent_comment_id": 0, "nickname": "a"})
+    assert response.status_code == 404
+    response = client.post('/report', json={"id": pid, "title": "t", "content": "late"})
+    assert response.status_code == 404
+    assert response.get_json() == {"status": "Fail", "reason": "Post not found"}
+    with server.app.app_context():
+        assert server.Comment.query.filter_by(submission_id=pid).count() == 0
+        assert server.Report.query.count() == 0